@@ -1,41 +1,57 @@
+from typing import Any
+
 import pandas as pd
 import plotly.express as px
 import streamlit as st
+from dashboard_aggregates import SOURCE_PATH, file_hash, load_aggregates
+from genre_analytics import GenreAnalytics, load_genre_analytics
+from matplotlib.figure import Figure
 from notebook_functions import (
-    average_per_person,
-    count_all_items,
     create_2d_scatter_plot,
     create_boxplot,
     create_wordcloud_from_series,
-    sort_dataframe,
-    top_items_added_by,
     transform_track_duration,
 )
 
-df_stats = pd.read_csv("./data/playlist_stats_clean.csv")
+
+@st.cache_data
+def load_dashboard_aggregates(source_hash: str) -> dict[str, Any]:  # noqa: ARG001
+    """Load the precomputed aggregates, which are only recomputed when the source data changes."""
+    return load_aggregates()
+
+
+@st.cache_resource
+def load_dashboard_genre_analytics(source_hash: str) -> GenreAnalytics:  # noqa: ARG001
+    """Load the genre analytics, which are only rebuilt when the source data changes."""
+    return load_genre_analytics(pd.read_csv(SOURCE_PATH))
+
+
+@st.cache_resource
+def create_wordcloud(_counts: pd.Series, source_hash: str, title: str) -> Figure:  # noqa: ARG001
+    """Create a word cloud once per source data and title."""
+    return create_wordcloud_from_series(_counts, title=title)
+
+
+source_hash = file_hash(SOURCE_PATH)
+aggregates = load_dashboard_aggregates(source_hash)
+df_tracks = aggregates["tracks"]
 
 st.title("Pallen 2023")
 
 # Total number of tracks
-st.metric(label="Number of Tracks in Pallen 2023", value=len(df_stats))
+st.metric(label="Number of Tracks in Pallen 2023", value=aggregates["n_tracks"])
 
 # Tracks added by each person
-added_by_count = df_stats["added_by"].value_counts()
 fig = px.bar(
-    added_by_count,
+    aggregates["added_by_count"],
     title="Number of Tracks Added by Each Person",
     labels={"index": "Added By", "value": "Number of Tracks"},
 )
 st.plotly_chart(fig)
 
-# Tracks added per month
-df_stats["added_at"] = pd.to_datetime(df_stats["added_at"])
-df_stats["month_added"] = df_stats["added_at"].dt.month
-# Group by month and added_by, then count the number of tracks
-grouped_df = df_stats.groupby(["month_added", "added_by"]).size().reset_index(name="tracks")
-# Creating a stacked bar chart
+# Tracks added per month, stacked by person
 fig = px.bar(
-    grouped_df,
+    aggregates["added_per_month"],
     x="month_added",
     y="tracks",
     color="added_by",
@@ -46,13 +62,8 @@ fig = px.bar(
 st.plotly_chart(fig)
 
 # Tracks per release date
-df_stats["release_date"] = pd.to_datetime(df_stats["release_date"])
-df_stats["month_released"] = df_stats["release_date"].dt.month
-# Group by 'year_month' and count the number of tracks
-grouped_df = df_stats.groupby("month_released").size().reset_index(name="tracks")
-# Creating a bar chart
 fig = px.bar(
-    grouped_df,
+    aggregates["released_per_month"],
     x="month_released",
     y="tracks",
     title="Number of Tracks Released Per Month/Year",
@@ -60,149 +71,64 @@ fig = px.bar(
 )
 st.plotly_chart(fig)
 
-# Artists
-total_artist_counts = count_all_items(df_stats, count_what="artist_names")
-st.metric(label="Total unique artists", value=len(total_artist_counts))
-
-# Artists Wordcloud
-fig = create_wordcloud_from_series(total_artist_counts[:40], title="TOP ARTISTS")
-st.pyplot(fig)
-
-# Artists Wordcloud per person
-total_artist_counts_by = top_items_added_by(df_stats, count_what="artist_names")
-for name in df_stats["added_by"].unique():
-    st.metric(
-        label=f"Total unique artists added by {name}",
-        value=total_artist_counts_by[name]["total_items"],
-    )
-    fig = create_wordcloud_from_series(
-        total_artist_counts_by[name]["top_items_all"][:20],  # type: ignore  # noqa: PGH003
-        title=f"TOP ARTISTS\n({name})",
-    )
-    st.pyplot(fig)
+# Artists and genres, in total and per person
+for items, label in (("artists", "ARTISTS"), ("genres", "GENRES")):
+    item_counts = aggregates[items]
+    st.metric(label=f"Total unique {items}", value=item_counts["total_items"])
 
-# Genres
-total_genres_counts = count_all_items(df_stats, count_what="artists_genres")
-st.metric(label="Total unique genres", value=len(total_genres_counts))
-
-fig = create_wordcloud_from_series(total_genres_counts[:40], title="TOP GENRES")
-st.pyplot(fig)
-
-# Genres Wordcloud per person
-total_genres_counts_by = top_items_added_by(df_stats, count_what="artists_genres")
-for name in df_stats["added_by"].unique():
-    st.metric(
-        label=f"Total unique genres added by {name}",
-        value=total_genres_counts_by[name]["total_items"],
-    )
-    fig = create_wordcloud_from_series(
-        total_genres_counts_by[name]["top_items_all"][:20],  # type: ignore  # noqa: PGH003
-        title=f"TOP GENRES\n({name})",
-    )
+    # Wordcloud
+    fig = create_wordcloud(item_counts["counts"][:40], source_hash, title=f"TOP {label}")
     st.pyplot(fig)
 
-# Track Duration
-fig = create_boxplot(df_stats, "duration_ms")
-st.plotly_chart(fig)
-# Average
-avg = average_per_person(df_stats, "duration_ms")
-for name, value in avg.items():
-    st.metric(
-        label=f"Average track duration added by {name}",
-        value=transform_track_duration(float(value)),
-    )
-# Depict head/tail of dataframe
-df_stats_sorted = sort_dataframe(df_stats, "duration_ms", "duration")
-st.dataframe(df_stats_sorted)
-
-
-# Track popularity
-fig = create_boxplot(df_stats, "track_popularity")
-st.plotly_chart(fig)
-# Average
-avg = average_per_person(df_stats, "track_popularity")
-for name, value in avg.items():
-    st.metric(
-        label=f"Average track popularity added by {name}",
-        value=value,
-    )
-# Depict head/tail of dataframe
-df_stats_sorted = sort_dataframe(df_stats, "track_popularity")
-st.dataframe(df_stats_sorted)
-
-# Artist popularity
-fig = create_boxplot(df_stats, "artists_avg_popularity")
-st.plotly_chart(fig)
-# Average
-avg = average_per_person(df_stats, "artists_avg_popularity")
-for name, value in avg.items():
-    st.metric(
-        label=f"Average artist popularity added by {name}",
-        value=value,
-    )
-# Depict head/tail of dataframe
-df_stats_sorted = sort_dataframe(df_stats, "artists_avg_popularity")
-st.dataframe(df_stats_sorted)
-
-# Energy
-fig = create_boxplot(df_stats, "energy")
-st.plotly_chart(fig)
-# Average
-avg = average_per_person(df_stats, "energy")
-for name, value in avg.items():
-    st.metric(
-        label=f"Average track energy added by {name}",
-        value=value,
-    )
-# Depict head/tail of dataframe
-df_stats_sorted = sort_dataframe(df_stats, "energy")
-st.dataframe(df_stats_sorted)
-
-# Acousticness
-fig = create_boxplot(df_stats, "acousticness")
-st.plotly_chart(fig)
-# Average
-avg = average_per_person(df_stats, "acousticness")
-for name, value in avg.items():
-    st.metric(
-        label=f"Average track acousticness added by {name}",
-        value=value,
-    )
-# Depict head/tail of dataframe
-df_stats_sorted = sort_dataframe(df_stats, "acousticness")
-st.dataframe(df_stats_sorted)
-
-# Instrumentalness
-fig = create_boxplot(df_stats, "instrumentalness")
-st.plotly_chart(fig)
-# Average
-avg = average_per_person(df_stats, "instrumentalness")
-for name, value in avg.items():
-    st.metric(
-        label=f"Average track instrumentalness added by {name}",
-        value=value,
-    )
-# Depict head/tail of dataframe
-df_stats_sorted = sort_dataframe(df_stats, "instrumentalness")
-st.dataframe(df_stats_sorted)
-
-# Tempo
-fig = create_boxplot(df_stats, "tempo")
+    # Wordcloud per person
+    for name in df_tracks["added_by"].unique():
+        st.metric(
+            label=f"Total unique {items} added by {name}",
+            value=item_counts["total_items_by"].get(name, 0),
+        )
+        # Skip people without any counted items (e.g. who only added local or unavailable tracks)
+        top_items_by = item_counts["top_items_by"]
+        if name not in top_items_by.index.get_level_values("added_by"):
+            continue
+        top_items = top_items_by.xs(name, level="added_by")
+        fig = create_wordcloud(top_items, source_hash, title=f"TOP {label}\n({name})")
+        st.pyplot(fig)
+
+# Genres that most often share a track, and the taste similarity of each pair of people
+genre_analytics = load_dashboard_genre_analytics(source_hash)
+st.dataframe(genre_analytics.top_genre_pairs(20))
+fig = px.imshow(
+    genre_analytics.contributor_similarity().round(2),
+    text_auto=True,
+    title="Taste Similarity (Genres) of Each Pair of People",
+    labels={"x": "Added By", "y": "Added By", "color": "Similarity"},
+)
 st.plotly_chart(fig)
-# Average
-avg = average_per_person(df_stats, "tempo")
-for name, value in avg.items():
-    st.metric(
-        label=f"Average track tempo added by {name}",
-        value=value,
-    )
-# Depict head/tail of dataframe
-df_stats_sorted = sort_dataframe(df_stats, "tempo")
-st.dataframe(df_stats_sorted)
+
+# Track features per person
+for column, label in (
+    ("duration_ms", "track duration"),
+    ("track_popularity", "track popularity"),
+    ("artists_avg_popularity", "artist popularity"),
+    ("energy", "track energy"),
+    ("acousticness", "track acousticness"),
+    ("instrumentalness", "track instrumentalness"),
+    ("tempo", "track tempo"),
+):
+    fig = create_boxplot(df_tracks, column)
+    st.plotly_chart(fig)
+    # Average
+    for name, value in aggregates["averages"][column].items():
+        st.metric(
+            label=f"Average {label} added by {name}",
+            value=transform_track_duration(float(value)) if column == "duration_ms" else value,
+        )
+    # Depict head/tail of dataframe
+    st.dataframe(aggregates["head_tail"][column])
 
 # 2D Scatter plot
 fig = create_2d_scatter_plot(
-    df_stats, "artists_avg_popularity", "duration_ms", "track_info", "added_by"
+    df_tracks, "artists_avg_popularity", "duration_ms", "track_info", "added_by"
 )
 st.plotly_chart(fig)
 
@@ -213,5 +139,4 @@ st.metric(
 )
 
 # 3voor12 overlap table
-df_overlap = pd.read_csv("./data/3voor12_overlap.csv", index_col="Unnamed: 0")
-st.dataframe(df_overlap)
+st.dataframe(aggregates["overlap"])
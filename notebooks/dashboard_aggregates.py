@@ -0,0 +1,104 @@
+"""Precompute the aggregates shown by the dashboard into a single artifact.
+
+Run from the root of the repository after cleaning the dataset:
+
+    python notebooks/dashboard_aggregates.py
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from notebook_functions import average_per_person, count_items, sort_dataframe
+
+# Location of the cleaned dataset shown by the dashboard
+SOURCE_PATH = "./data/playlist_stats_clean.csv"
+# Location of the precomputed aggregates
+ARTIFACT_PATH = "./data/dashboard_aggregates.pkl"
+# Location of the tracks that overlap with the 3voor12 Song van het Jaar list
+OVERLAP_PATH = "./data/3voor12_overlap.csv"
+# Number of top artists and genres shown per person
+TOP_N = 20
+# Columns shown as boxplots, mapped to the column shown in their head/tail table
+BOXPLOT_COLUMNS = {
+    "duration_ms": "duration",
+    "track_popularity": "track_popularity",
+    "artists_avg_popularity": "artists_avg_popularity",
+    "energy": "energy",
+    "acousticness": "acousticness",
+    "instrumentalness": "instrumentalness",
+    "tempo": "tempo",
+}
+
+
+def file_hash(path: str | Path) -> str:
+    """Calculate the SHA-256 hash of a file."""
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_aggregates(
+    df_stats: pd.DataFrame, overlap_path: str | Path = OVERLAP_PATH
+) -> dict[str, Any]:
+    """Compute all aggregates shown by the dashboard."""
+    df_stats = df_stats.copy()
+    df_stats["track_info"] = df_stats["name"] + " by " + df_stats["artist"]
+    # Tracks added per month and person
+    df_stats["month_added"] = pd.to_datetime(df_stats["added_at"]).dt.month
+    added_per_month = (
+        df_stats.groupby(["month_added", "added_by"]).size().reset_index(name="tracks")
+    )
+    # Tracks per release month
+    df_stats["month_released"] = pd.to_datetime(df_stats["release_date"]).dt.month
+    released_per_month = df_stats.groupby("month_released").size().reset_index(name="tracks")
+    # Tracks that overlap with the 3voor12 list
+    overlap_path = Path(overlap_path)
+    df_overlap = (
+        pd.read_csv(overlap_path, index_col="Unnamed: 0") if overlap_path.exists() else None
+    )
+    return {
+        "n_tracks": len(df_stats),
+        "added_by_count": df_stats["added_by"].value_counts(),
+        "added_per_month": added_per_month,
+        "released_per_month": released_per_month,
+        "artists": count_items(df_stats, "artist_names", TOP_N),
+        "genres": count_items(df_stats, "artists_genres", TOP_N),
+        "averages": {column: average_per_person(df_stats, column) for column in BOXPLOT_COLUMNS},
+        "head_tail": {
+            column: sort_dataframe(df_stats, column, show_column)
+            for column, show_column in BOXPLOT_COLUMNS.items()
+        },
+        # Only the columns that are plotted per track
+        "tracks": df_stats[["name", "artist", "added_by", "track_info", *BOXPLOT_COLUMNS]],
+        "overlap": df_overlap,
+    }
+
+
+def write_aggregates(
+    source_path: str | Path = SOURCE_PATH, artifact_path: str | Path = ARTIFACT_PATH
+) -> dict[str, Any]:
+    """Compute the aggregates of the source data and write them to the artifact."""
+    aggregates = compute_aggregates(pd.read_csv(source_path))
+    aggregates["source_hash"] = file_hash(source_path)
+    pd.to_pickle(aggregates, artifact_path)
+    return aggregates
+
+
+def load_aggregates(
+    source_path: str | Path = SOURCE_PATH, artifact_path: str | Path = ARTIFACT_PATH
+) -> dict[str, Any]:
+    """Load the aggregates from the artifact, recomputing them when the source data changed."""
+    if Path(artifact_path).exists():
+        aggregates: dict[str, Any] = pd.read_pickle(artifact_path)  # noqa: S301
+        if aggregates.get("source_hash") == file_hash(source_path):
+            return aggregates
+    return write_aggregates(source_path, artifact_path)
+
+
+if __name__ == "__main__":
+    write_aggregates()
+    print(f"Wrote the dashboard aggregates of {SOURCE_PATH} to {ARTIFACT_PATH}")
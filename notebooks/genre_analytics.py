@@ -0,0 +1,221 @@
+"""Genre and artist co-occurrence analytics, derived from sparse incidence matrices.
+
+The (track x artist) and (artist x genre) incidence matrices of a dataset are built once, from
+which the co-occurrence of genres and artists, the genre profiles of the contributors and their
+taste similarity follow as sparse matrix products. The analytics are cached per dataset hash.
+
+Run from the root of the repository to precompute the analytics of the cleaned dataset:
+
+    python notebooks/genre_analytics.py
+"""
+
+import ast
+import hashlib
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, Self
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from scipy import sparse
+
+# Location of the cleaned dataset
+SOURCE_PATH = "./data/playlist_stats_clean.csv"
+# Location of the cached analytics, one artifact per dataset hash
+ANALYTICS_PATH = "./data/genre_analytics"
+# Columns of the playlist stats from which the analytics are derived
+SOURCE_COLUMNS = ["artist_uris", "artist_names", "artists_genres"]
+
+
+def parse_list(value: Any) -> Any:  # noqa: ANN401
+    """Parse the string representation of a list (as loaded from CSV) to a list."""
+    return ast.literal_eval(value) if isinstance(value, str) else value
+
+
+def dataset_hash(df_stats: pd.DataFrame) -> str:
+    """Calculate the SHA-256 hash of the columns of a dataset from which the analytics follow."""
+    df_source = df_stats[SOURCE_COLUMNS].assign(added_by=contributors(df_stats))
+    hashes = pd.util.hash_pandas_object(df_source.astype(str), index=False)
+    return hashlib.sha256(hashes.to_numpy().tobytes()).hexdigest()
+
+
+def contributors(df_stats: pd.DataFrame) -> pd.Series:
+    """Get the contributor of each track: their name if resolved, or else their user ID."""
+    added_by_id = df_stats.get("added_by_id", pd.Series(index=df_stats.index, dtype=object))
+    return df_stats.get("added_by", added_by_id).fillna(added_by_id).astype(str)
+
+
+def incidence_matrix(
+    rows: npt.NDArray[np.int64], columns: npt.NDArray[np.int64], shape: tuple[int, int]
+) -> sparse.csr_matrix:
+    """Build a binary sparse incidence matrix from the (row, column) pairs of its nonzeros."""
+    incidence = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, columns)), shape=shape
+    )
+    # Count pairs that occur multiple times once
+    incidence.data[:] = 1
+    return incidence
+
+
+def top_pairs(cooccurrence: sparse.csr_matrix, labels: pd.Index, n: int) -> pd.DataFrame:
+    """Select the `n` pairs that co-occur most often from a symmetric co-occurrence matrix."""
+    upper = sparse.triu(cooccurrence, k=1).tocoo()
+    top = np.argsort(-upper.data, kind="stable")[:n]
+    return pd.DataFrame(
+        {
+            "first": labels[upper.row[top]],
+            "second": labels[upper.col[top]],
+            "tracks": upper.data[top],
+        }
+    )
+
+
+class GenreAnalytics:
+    """Sparse incidence matrices of a dataset, and the co-occurrence analytics derived from them.
+
+    Tracks are rows of the dataset, so a track that is added to multiple playlists of a merged
+    dataset counts once per playlist. The genres of a track are the genres of all of its artists.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: "GenreAnalytics",
+        track_artists: sparse.csr_matrix,
+        artist_genres: sparse.csr_matrix,
+        contributor_tracks: sparse.csr_matrix,
+        artists: pd.Index,
+        genres: pd.Index,
+        contributors: pd.Index,
+    ) -> None:
+        """Initialize the analytics from the incidence matrices and their labels."""
+        self.track_artists = track_artists
+        self.artist_genres = artist_genres
+        self.contributor_tracks = contributor_tracks
+        self.artists = artists
+        self.genres = genres
+        self.contributors = contributors
+        # Tracks with a genre if any of their artists has it
+        self.track_genres = (track_artists @ artist_genres).tocsr()
+        self.track_genres.data[:] = 1
+        self.genre_cooccurrence = (self.track_genres.T @ self.track_genres).tocsr()
+        self.artist_cooccurrence = (track_artists.T @ track_artists).tocsr()
+        self.genre_profiles = (contributor_tracks @ self.track_genres).tocsr()
+
+    @classmethod
+    def from_playlist_stats(cls: type[Self], frames: pd.DataFrame | Iterable[pd.DataFrame]) -> Self:
+        """Build the incidence matrices of the playlist stats of one or more playlists."""
+        frames = [frames] if isinstance(frames, pd.DataFrame) else list(frames)
+        df_stats = pd.concat(frames, ignore_index=True)
+        df_artists = df_stats[SOURCE_COLUMNS].map(parse_list).rename_axis("track").reset_index()
+        # Artists of each track, identified by URI and labeled by their first name
+        df_track_artists = (
+            df_artists[["track", "artist_uris", "artist_names"]]
+            .explode(["artist_uris", "artist_names"])
+            .dropna(subset=["artist_uris"])
+        )
+        artist_codes, artist_uris = pd.factorize(df_track_artists["artist_uris"])
+        artist_names = df_track_artists.drop_duplicates(subset=["artist_uris"])["artist_names"]
+        track_artists = incidence_matrix(
+            df_track_artists["track"].to_numpy(),
+            artist_codes,
+            (len(df_stats), len(artist_uris)),
+        )
+        # Genres of each artist, as listed with the tracks of which the artist details are known
+        has_genres = df_artists["artists_genres"].map(lambda x: isinstance(x, list))
+        df_artist_genres = (
+            df_artists.loc[has_genres, ["artist_uris", "artists_genres"]]
+            .explode(["artist_uris", "artists_genres"])
+            .explode("artists_genres")
+            .dropna()
+        )
+        genre_codes, genres = pd.factorize(df_artist_genres["artists_genres"], sort=True)
+        artist_genres = incidence_matrix(
+            artist_uris.get_indexer(df_artist_genres["artist_uris"]),
+            genre_codes,
+            (len(artist_uris), len(genres)),
+        )
+        # Tracks added by each contributor
+        contributor_codes, contributor_names = pd.factorize(contributors(df_stats), sort=True)
+        contributor_tracks = incidence_matrix(
+            contributor_codes, np.arange(len(df_stats)), (len(contributor_names), len(df_stats))
+        )
+        return cls(
+            track_artists,
+            artist_genres,
+            contributor_tracks,
+            pd.Index(artist_names.to_numpy(), name="artist"),
+            pd.Index(genres, name="genre"),
+            pd.Index(contributor_names, name="added_by"),
+        )
+
+    def genre_counts(self: "GenreAnalytics") -> pd.Series:
+        """Count the tracks of each genre, most frequent first."""
+        counts = pd.Series(self.genre_cooccurrence.diagonal(), index=self.genres, name="tracks")
+        return counts.sort_values(ascending=False, kind="stable")
+
+    def cooccurring_genres(self: "GenreAnalytics", genre: str, n: int = 10) -> pd.Series:
+        """Find the `n` genres that most often share a track with the given genre."""
+        position = self.genres.get_loc(genre)
+        row = self.genre_cooccurrence.getrow(position)
+        counts = pd.Series(row.data, index=self.genres[row.indices], name="tracks")
+        counts = counts.drop(genre).sort_values(ascending=False, kind="stable")
+        return counts.head(n)
+
+    def top_genre_pairs(self: "GenreAnalytics", n: int = 20) -> pd.DataFrame:
+        """Find the `n` pairs of genres that most often share a track."""
+        return top_pairs(self.genre_cooccurrence, self.genres, n)
+
+    def top_artist_pairs(self: "GenreAnalytics", n: int = 20) -> pd.DataFrame:
+        """Find the `n` pairs of artists that most often share a track (i.e. collaborate)."""
+        return top_pairs(self.artist_cooccurrence, self.artists, n)
+
+    def contributor_genre_profiles(self: "GenreAnalytics", normalize: bool = False) -> pd.DataFrame:
+        """Count the tracks of each genre added by each contributor.
+
+        With `normalize`, the counts are divided by the number of tracks of each contributor.
+        """
+        profiles = pd.DataFrame(
+            self.genre_profiles.toarray(), index=self.contributors, columns=self.genres
+        )
+        if normalize:
+            n_tracks = np.asarray(self.contributor_tracks.sum(axis=1)).ravel()
+            profiles = profiles.div(np.maximum(n_tracks, 1), axis=0)
+        return profiles
+
+    def contributor_similarity(self: "GenreAnalytics") -> pd.DataFrame:
+        """Calculate the taste similarity of all pairs of contributors.
+
+        The similarity is the cosine similarity of the genre profiles of both contributors.
+        """
+        norms = np.sqrt(np.asarray(self.genre_profiles.multiply(self.genre_profiles).sum(axis=1)))
+        normalized = sparse.csr_matrix(self.genre_profiles.multiply(1 / np.maximum(norms, 1e-12)))
+        similarity = (normalized @ normalized.T).toarray()
+        return pd.DataFrame(similarity, index=self.contributors, columns=self.contributors)
+
+
+def load_genre_analytics(
+    frames: pd.DataFrame | Iterable[pd.DataFrame], path: str | Path = ANALYTICS_PATH
+) -> GenreAnalytics:
+    """Load the analytics of a dataset from the cache, building them when the dataset is new.
+
+    A dataset may be the playlist stats of one or more playlists (e.g. of multiple years).
+    """
+    frames = [frames] if isinstance(frames, pd.DataFrame) else list(frames)
+    df_stats = pd.concat(frames, ignore_index=True)
+    artifact_path = Path(path) / f"{dataset_hash(df_stats)}.pkl"
+    if artifact_path.exists():
+        analytics: GenreAnalytics = pd.read_pickle(artifact_path)  # noqa: S301
+        return analytics
+    analytics = GenreAnalytics.from_playlist_stats(df_stats)
+    artifact_path.parent.mkdir(parents=True, exist_ok=True)
+    # Replace the artifact atomically, so concurrent readers never load a partial artifact
+    pd.to_pickle(analytics, artifact_path.with_suffix(".pkl.tmp"))
+    artifact_path.with_suffix(".pkl.tmp").replace(artifact_path)
+    return analytics
+
+
+if __name__ == "__main__":
+    genre_analytics = load_genre_analytics(pd.read_csv(SOURCE_PATH))
+    print(f"Cached the genre analytics of {SOURCE_PATH} in {ANALYTICS_PATH}")
+    print(genre_analytics.top_genre_pairs(10))
+    print(genre_analytics.contributor_similarity().round(2))
@@ -1,5 +1,5 @@
 import ast
-from collections import Counter
+from typing import Any
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -7,6 +7,7 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objs as go
 from IPython.display import display
+from matplotlib.figure import Figure
 from wordcloud import WordCloud
 
 
@@ -26,55 +27,68 @@ def show(
     df_display = df_stats[column_list]
     if sort_values:
         df_display = df_display.sort_values(by=column, ascending=False)
-    display(df_display.head(n)) if n else display(df_display)
+    display(df_display.head(n)) if n else display(df_display)  # type: ignore[no-untyped-call]
+
+
+def explode_items(df_stats: pd.DataFrame, count_what: str) -> pd.DataFrame:
+    """Explode a (nested) list column of items (artists or genres) to one row per item."""
+    items = df_stats[count_what].reset_index(drop=True)
+    items = items.map(lambda x: ast.literal_eval(x) if isinstance(x, str) else x).explode()
+    # Explode nested lists (e.g. the genres of each artist) once more
+    if items.map(lambda x: isinstance(x, list)).any():
+        items = items.explode()
+    added_by = df_stats["added_by"].reset_index(drop=True)
+    return pd.DataFrame({"added_by": added_by[items.index].to_numpy(), "item": items.to_numpy()})
+
+
+def count_items(df_stats: pd.DataFrame, count_what: str, n: int = 5) -> dict[str, Any]:
+    """Count the items (artists or genres) in total and per contributor in a single pass.
+
+    Returns the counts of all items, the counts per contributor, the number of unique items in
+    total and per contributor, and the top N items per contributor.
+    """
+    df_items = explode_items(df_stats, count_what).dropna(subset=["item"])
+    counts_by = df_items.groupby(["added_by", "item"], dropna=False).size()
+    counts_by = counts_by.sort_values(ascending=False, kind="stable")
+    counts = counts_by.groupby(level="item").sum().sort_values(ascending=False, kind="stable")
+    return {
+        "counts": counts.rename_axis(None),
+        "counts_by": counts_by,
+        "total_items": len(counts),
+        "total_items_by": counts_by.groupby(level="added_by", dropna=False).size(),
+        "top_items_by": counts_by.groupby(level="added_by", dropna=False).head(n),
+    }
 
 
 def count_all_items(df_stats: pd.DataFrame, count_what: str) -> pd.Series:
     """Count the occurrences of each item (artists or genres) in the DataFrame."""
-    df_stats_copy = df_stats.copy()
-    df_stats_copy[count_what] = df_stats_copy[count_what].apply(
-        lambda x: ast.literal_eval(x) if isinstance(x, str) else x
-    )
-    all_items = []
-    for sublist in df_stats_copy[count_what]:
-        for item in sublist:
-            if isinstance(item, list):  # Nested list
-                all_items.extend(item)
-            else:
-                all_items.append(item)
-    item_counts = Counter(all_items)
-    return pd.Series(item_counts).sort_values(ascending=False)
+    return count_items(df_stats, count_what)["counts"]
 
 
 def top_items_added_by(
     df_stats: pd.DataFrame, count_what: str, n: int = 5
 ) -> dict[str, dict[str, int | pd.Series]]:
     """Get the top N items (artists or genres) added by each contributor."""
-    contributors_stats = {}
-    for person in df_stats["added_by"].unique():
-        person_df_copy = df_stats[df_stats["added_by"] == person].copy()
-        person_df_copy[count_what] = person_df_copy[count_what].apply(
-            lambda x: ast.literal_eval(x) if isinstance(x, str) else x
-        )
-        all_person_items = []
-        for sublist in person_df_copy[count_what]:
-            for item in sublist:
-                if isinstance(item, list):
-                    all_person_items.extend(item)
-                else:
-                    all_person_items.append(item)
-        items_count = Counter(all_person_items)
-        top_items = pd.Series(items_count).sort_values(ascending=False)
-        total_unique_items = len(set(all_person_items))
+    counts_by = count_items(df_stats, count_what, n)["counts_by"]
+    contributors_stats: dict[str, dict[str, int | pd.Series]] = {
+        person: {
+            "total_items": 0,
+            "top_items": pd.Series(dtype="int64"),
+            "top_items_all": pd.Series(dtype="int64"),
+        }
+        for person in df_stats["added_by"].unique()
+    }
+    for person, person_counts in counts_by.groupby(level="added_by", sort=False):
+        top_items = person_counts.droplevel("added_by").rename_axis(None)
         contributors_stats[person] = {
-            "total_items": total_unique_items,
+            "total_items": len(top_items),
             "top_items": top_items.head(n),
             "top_items_all": top_items,
         }
     return contributors_stats
 
 
-def create_wordcloud_from_series(data: pd.Series, title: str | None = None) -> plt.Figure:
+def create_wordcloud_from_series(data: pd.Series, title: str | None = None) -> Figure:
     """Generate a word cloud from a pandas Series where each value is a count."""
     # Creating a word cloud
     wordcloud = WordCloud(
@@ -0,0 +1,91 @@
+"""Compare the memory and pickling cost of the compact model with the playlist stats dataframe.
+
+Run from the root of the repository, to compare both on the exports in `data/`:
+
+    python scripts/benchmark_compact_playlist_stats.py
+"""
+
+import pickle
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "spotify"))
+
+from compact import CompactPlaylistStats  # noqa: E402
+from storage import read_playlist_stats  # noqa: E402
+
+# Columns that identify an export of playlist stats
+REQUIRED_COLUMNS = {"track_id", "artist_uris", "artist_names"}
+
+
+def object_size(obj: Any, seen: set[int]) -> int:  # noqa: ANN401
+    """Get the size of an object, including the items of (nested) lists not seen before."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, list):
+        size += sum(object_size(item, seen) for item in obj)
+    return size
+
+
+def frame_memory_usage(df_stats: pd.DataFrame) -> int:
+    """Get the memory used by a dataframe, including the nested lists of its object columns.
+
+    `DataFrame.memory_usage(deep=True)` only counts the list objects themselves, not their items.
+    """
+    seen: set[int] = set()
+    size = int(df_stats.index.memory_usage())
+    for column in df_stats:
+        if df_stats[column].dtype == object:
+            size += sum(object_size(value, seen) for value in df_stats[column])
+        else:
+            size += int(df_stats[column].memory_usage(index=False))
+    return size
+
+
+def pickle_cost(obj: Any) -> tuple[int, float]:  # noqa: ANN401
+    """Pickle an object, returning the size of the pickle and the time to pickle and unpickle."""
+    start = time.perf_counter()
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    pickle.loads(data)  # noqa: S301
+    return len(data), time.perf_counter() - start
+
+
+def main() -> None:
+    """Compare both models on each export of playlist stats in `data/`."""
+    print(
+        f"{'export':<28} {'tracks':>7} {'frame (MB)':>11} {'compact (MB)':>13} {'ratio':>6} "
+        f"{'pickle (MB)':>12} {'compact':>8} {'pickle (ms)':>12} {'compact':>8} "
+        f"{'decode (ms)':>12}"
+    )
+    for path in sorted(Path("./data").glob("playlist_stats*.csv")):
+        if not REQUIRED_COLUMNS.issubset(pd.read_csv(path, nrows=0).columns):
+            continue
+        df_stats = read_playlist_stats(path.stem, file_format="csv")
+        if df_stats is None:
+            continue
+        df_stats = df_stats.reset_index(drop=True)
+        compact = CompactPlaylistStats.from_playlist_stats(df_stats)
+        start = time.perf_counter()
+        compact.to_playlist_stats()
+        duration_decode = time.perf_counter() - start
+        frame_size = frame_memory_usage(df_stats)
+        compact_size = compact.memory_usage()
+        pickle_size, duration_pickle = pickle_cost(df_stats)
+        compact_pickle_size, compact_duration_pickle = pickle_cost(compact)
+        print(
+            f"{path.stem:<28} {len(df_stats):>7} {frame_size / 1e6:>11.2f} "
+            f"{compact_size / 1e6:>13.2f} {frame_size / compact_size:>6.1f} "
+            f"{pickle_size / 1e6:>12.2f} {compact_pickle_size / 1e6:>8.2f} "
+            f"{duration_pickle * 1000:>12.1f} {compact_duration_pickle * 1000:>8.1f} "
+            f"{duration_decode * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark the scaling of `initialize_playlist_stats` on synthetic playlists.
+
+Run from the root of the repository:
+
+    python scripts/benchmark_initialize_playlist_stats.py
+"""
+
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "spotify"))
+
+from utils import initialize_playlist_stats, parse_track_details  # noqa: E402
+
+# Number of synthetic playlist items per benchmark run
+SIZES = [100, 1_000, 5_000, 20_000, 50_000]
+# The previous (quadratic) implementation is only benchmarked up to this size
+MAX_SIZE_CONCAT = 5_000
+
+
+def create_synthetic_tracks(n: int) -> list[dict[str, Any]]:
+    """Create a synthetic playlist of n items, based on the track in `data/json/track.json`."""
+    with Path("./data/json/track.json").open() as f:
+        template = json.load(f)
+    tracks = []
+    for i in range(n):
+        track = copy.deepcopy(template)
+        track["track"]["id"] = f"{i:022d}"
+        track["track"]["uri"] = f"spotify:track:{i:022d}"
+        track["track"]["duration_ms"] = 120_000 + i % 180_000
+        tracks.append(track)
+    return tracks
+
+
+def initialize_playlist_stats_concat(tracks: list[dict[str, Any]]) -> pd.DataFrame:
+    """Parse all tracks by concatenating a series per track (the previous implementation)."""
+    df_playlist = pd.DataFrame()
+    for track in tracks:
+        df_playlist = pd.concat([df_playlist, pd.Series(parse_track_details(track))], axis=1)
+    return df_playlist.T.reset_index().drop(["index"], axis=1)
+
+
+def main() -> None:
+    """Time both implementations for increasing playlist sizes."""
+    print(f"{'items':>8} {'columnar (s)':>14} {'per item (us)':>14} {'concat (s)':>12}")
+    for size in SIZES:
+        tracks = create_synthetic_tracks(size)
+        start = time.perf_counter()
+        initialize_playlist_stats(tracks)
+        duration = time.perf_counter() - start
+        duration_concat = "-"
+        if size <= MAX_SIZE_CONCAT:
+            start = time.perf_counter()
+            initialize_playlist_stats_concat(tracks)
+            duration_concat = f"{time.perf_counter() - start:.3f}"
+        print(f"{size:>8} {duration:>14.3f} {duration / size * 1e6:>14.1f} {duration_concat:>12}")
+
+
+if __name__ == "__main__":
+    main()
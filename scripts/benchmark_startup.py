@@ -0,0 +1,83 @@
+"""Benchmark the cold start of the command line scripts, each in a fresh interpreter.
+
+Run from the root of the repository:
+
+    python scripts/benchmark_startup.py
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Root of the repository
+ROOT_PATH = Path(__file__).parent.parent
+# Number of runs per scenario, of which the median is reported
+N_RUNS = 10
+# Code run per scenario, after adding the spotify folder and the repository to the path
+SCENARIOS = {
+    "interpreter": "pass",
+    "heavy imports (deferred)": "import numpy, pandas, pyarrow.parquet, scipy.sparse",
+    "import main": "import main",
+    "import batch": "import batch",
+    "unchanged snapshot check": (
+        "from sync import sync_playlist\n"
+        "from tests.fake_spotify import FakeSpotify, create_synthetic_tracks\n"
+        "sync_playlist(FakeSpotify(create_synthetic_tracks(10)), 'playlist', 'playlist_stats')"
+    ),
+    "cached token": (
+        "import time\n"
+        "from engine import TokenCache\n"
+        "from spotipy.oauth2 import SpotifyClientCredentials\n"
+        "cache = TokenCache('client-id', '.cache/tokens')\n"
+        "cache.save_token_to_cache({'access_token': 'token', 'token_type': 'Bearer',"
+        " 'expires_at': int(time.time()) + 3600})\n"
+        "SpotifyClientCredentials('client-id', 'client-secret', cache_handler=cache)"
+        ".get_access_token(as_dict=False)"
+    ),
+}
+
+
+def run(code: str, cwd: Path) -> tuple[float, bool]:
+    """Run code in a fresh interpreter, returning its wall time and whether pandas was imported."""
+    code = (
+        "import sys\n"
+        f"sys.path[:0] = [{str(ROOT_PATH / 'spotify')!r}, {str(ROOT_PATH)!r}]\n"
+        f"{code}\n"
+        "print('pandas' in sys.modules)"
+    )
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code],  # noqa: S603
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - start, result.stdout.strip() == "True"
+
+
+def main() -> None:
+    """Time each scenario, in a temporary directory holding an unchanged playlist export."""
+    sys.path[:0] = [str(ROOT_PATH / "spotify"), str(ROOT_PATH)]
+    from tests.fake_spotify import FakeSpotify, create_synthetic_tracks
+
+    snapshot_id = FakeSpotify(create_synthetic_tracks(10)).playlist("playlist")["snapshot_id"]
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = Path(tmp)
+        (cwd / "data").mkdir()
+        with (cwd / "data" / "playlist_stats.sync.json").open("w") as f:
+            json.dump({"snapshot_id": snapshot_id, "added_at": None}, f)
+        print(f"{'scenario':<26} {'median (ms)':>12} {'pandas':>7}")
+        for scenario, code in SCENARIOS.items():
+            runs = [run(code, cwd) for _ in range(N_RUNS)]
+            duration = statistics.median(duration for duration, _ in runs)
+            imports_pandas = any(imports_pandas for _, imports_pandas in runs)
+            print(f"{scenario:<26} {duration * 1000:>12.0f} {imports_pandas!s:>7}")
+
+
+if __name__ == "__main__":
+    main()
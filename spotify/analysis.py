@@ -0,0 +1,181 @@
+"""Columnar, memory-mapped store for the segments of audio analyses."""
+
+import json
+import logging
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+from spotipy.client import Spotify
+from utils import BatchMapper
+
+# Location of the audio analysis store
+ANALYSIS_PATH = "./data/audio_analysis"
+# Scalar attributes of each segment, stored as the columns of the segments array
+SEGMENT_FIELDS = [
+    "start",
+    "duration",
+    "confidence",
+    "loudness_start",
+    "loudness_max_time",
+    "loudness_max",
+    "loudness_end",
+]
+# Number of pitch classes and timbre coefficients of each segment
+SEGMENT_DIMENSIONS = 12
+# Arrays of the store, with their number of columns
+SEGMENT_ARRAYS = {
+    "segments": len(SEGMENT_FIELDS),
+    "pitches": SEGMENT_DIMENSIONS,
+    "timbre": SEGMENT_DIMENSIONS,
+}
+# Index of the store: the segment offsets of each track
+INDEX_DTYPE = np.dtype([("track_id", "U32"), ("start", "i8"), ("stop", "i8")])
+
+
+def parse_segments(audio_analysis: dict[str, Any]) -> dict[str, npt.NDArray[np.float32]]:
+    """Parse the segments of an audio analysis to float32 arrays, one row per segment."""
+    segments = audio_analysis["segments"]
+    return {
+        "segments": np.array(
+            [[segment[field] for field in SEGMENT_FIELDS] for segment in segments],
+            dtype=np.float32,
+        ).reshape(-1, len(SEGMENT_FIELDS)),
+        "pitches": np.array([segment["pitches"] for segment in segments], dtype=np.float32).reshape(
+            -1, SEGMENT_DIMENSIONS
+        ),
+        "timbre": np.array([segment["timbre"] for segment in segments], dtype=np.float32).reshape(
+            -1, SEGMENT_DIMENSIONS
+        ),
+    }
+
+
+def iter_audio_analysis_files(paths: Iterable[str | Path]) -> Iterator[tuple[str, dict[str, Any]]]:
+    """Yield the audio analyses stored as JSON files (named by track ID), one document at a time."""
+    for path in map(Path, paths):
+        with path.open() as f:
+            yield path.stem, json.load(f)
+
+
+def fetch_audio_analyses(
+    sp: Spotify, track_ids: list[str], map_batches: BatchMapper = map
+) -> Iterator[tuple[str, dict[str, Any]]]:
+    """Yield the audio analyses of tracks, fetched with `map_batches` and yielded in order."""
+    yield from zip(track_ids, map_batches(sp.audio_analysis, track_ids), strict=True)
+
+
+class AudioAnalysisStore:
+    """Store of audio analysis segments as contiguous float32 arrays in memory-mapped files.
+
+    The segments of all tracks are appended to one file per array, and an index holds the offsets
+    of the segments of each track. Reading the segments of a track (or of all tracks) is a
+    zero-copy slice of the memory-mapped arrays.
+    """
+
+    def __init__(self: "AudioAnalysisStore", path: str | Path = ANALYSIS_PATH) -> None:
+        """Open (or create) the store."""
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self: "AudioAnalysisStore") -> None:
+        """Load the index of the store."""
+        index_path = self.path / "index.npy"
+        if index_path.exists():
+            self.index = np.load(index_path, mmap_mode="r")
+        else:
+            self.index = np.empty(0, dtype=INDEX_DTYPE)
+        self._positions = {str(track_id): i for i, track_id in enumerate(self.index["track_id"])}
+        self._arrays: dict[str, npt.NDArray[np.float32]] = {}
+
+    def __len__(self: "AudioAnalysisStore") -> int:
+        """Return the number of tracks in the store."""
+        return len(self.index)
+
+    def __contains__(self: "AudioAnalysisStore", track_id: object) -> bool:
+        """Check whether the audio analysis of a track is in the store."""
+        return track_id in self._positions
+
+    @property
+    def n_segments(self: "AudioAnalysisStore") -> int:
+        """Total number of segments in the store."""
+        return int(self.index["stop"][-1]) if len(self.index) else 0
+
+    def append(self: "AudioAnalysisStore", analyses: Iterable[tuple[str, dict[str, Any]]]) -> int:
+        """Append the segments of audio analyses, skipping tracks that are already stored.
+
+        Analyses are parsed and written one at a time. The index is replaced once all analyses
+        are written, so a crash leaves the store as it was before the append.
+        """
+        logger = logging.getLogger("spotify")
+        # Release the memory-mapped files, which cannot be resized or replaced on all platforms
+        self.index = np.array(self.index)
+        self._arrays.clear()
+        offset = self.n_segments
+        entries = []
+        track_ids = set(self._positions)
+        files = {name: (self.path / f"{name}.f32").open("ab") for name in SEGMENT_ARRAYS}
+        try:
+            # Drop segments that were written after the last index update (e.g. by a crash)
+            for name, f in files.items():
+                f.truncate(offset * SEGMENT_ARRAYS[name] * np.dtype(np.float32).itemsize)
+            for track_id, audio_analysis in analyses:
+                if track_id in track_ids or audio_analysis is None:
+                    continue
+                arrays = parse_segments(audio_analysis)
+                for name, f in files.items():
+                    f.write(arrays[name].tobytes())
+                n_segments = len(arrays["segments"])
+                entries.append((track_id, offset, offset + n_segments))
+                track_ids.add(track_id)
+                offset += n_segments
+        finally:
+            for f in files.values():
+                f.close()
+        if entries:
+            index = np.concatenate([self.index, np.array(entries, dtype=INDEX_DTYPE)])
+            with (self.path / "index.npy.tmp").open("wb") as f:
+                np.save(f, index)
+            (self.path / "index.npy.tmp").replace(self.path / "index.npy")
+            self._load_index()
+            logger.info(f"Stored the audio analyses of {len(entries)} tracks.")
+        return len(entries)
+
+    def array(self: "AudioAnalysisStore", name: str) -> npt.NDArray[np.float32]:
+        """Memory-map an array (`segments`, `pitches` or `timbre`) of all tracks."""
+        if name not in self._arrays:
+            n_columns = SEGMENT_ARRAYS[name]
+            if self.n_segments:
+                self._arrays[name] = np.memmap(
+                    self.path / f"{name}.f32",
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(self.n_segments, n_columns),
+                )
+            else:
+                self._arrays[name] = np.empty((0, n_columns), dtype=np.float32)
+        return self._arrays[name]
+
+    def get(
+        self: "AudioAnalysisStore", track_id: str, name: str = "timbre"
+    ) -> npt.NDArray[np.float32]:
+        """Get an array (`segments`, `pitches` or `timbre`) of a single track, without copying."""
+        entry = self.index[self._positions[track_id]]
+        return self.array(name)[entry["start"] : entry["stop"]]
+
+    def offsets(self: "AudioAnalysisStore") -> npt.NDArray[np.int64]:
+        """Get the segment offsets of all tracks, track `i` spanning `offsets[i]:offsets[i + 1]`."""
+        return np.append(self.index["start"], self.n_segments).astype(np.int64)
+
+
+def ingest_audio_analyses(
+    sp: Spotify,
+    store: AudioAnalysisStore,
+    track_ids: list[str],
+    map_batches: BatchMapper = map,
+) -> int:
+    """Fetch and store the audio analyses of the tracks that are not yet in the store."""
+    missing_track_ids = [track_id for track_id in dict.fromkeys(track_ids) if track_id not in store]
+    return store.append(fetch_audio_analyses(sp, missing_track_ids, map_batches))
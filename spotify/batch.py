@@ -0,0 +1,237 @@
+"""Batch runner that exports the stats of multiple playlists, sharing one working set.
+
+Run from the root of the repository with a manifest of playlists and export file names:
+
+    python spotify/batch.py playlists.json
+
+Spread the requests across multiple app registrations with `--credentials spotify spotify-2`.
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from cache import CachedSpotify, ResponseCache, parse_id
+from engine import EnrichmentEngine, create_clients
+from metrics import METRICS_PATH, InstrumentedSpotify, Metrics
+from spotipy.client import Spotify
+from storage import FILE_FORMAT, FileFormat
+from store import TrackStore
+from sync import sync_playlist
+from utils import BatchMapper, create_logger
+
+# Location of the manifest of playlists
+MANIFEST_PATH = "./playlists.json"
+# Number of playlists that are processed concurrently
+MAX_PLAYLISTS = 4
+
+
+class WorkingSet:
+    """Responses of the Spotify API shared by all playlists in a run, keyed by endpoint and ID.
+
+    Every response is held as a future, so an ID that is being fetched for one playlist is
+    awaited by the others instead of being fetched again.
+    """
+
+    def __init__(self: "WorkingSet") -> None:
+        """Initialize an empty working set."""
+        self.responses: dict[tuple[str, str], Future[Any]] = {}
+        self.lock = threading.Lock()
+
+
+class SharedSpotify:
+    """Wrapper around the Spotify client that serves artists and audio features from a working set.
+
+    Only IDs that are not yet in the working set are requested, so a batch of IDs costs an API call
+    only when at least one of its IDs is new. All other attributes are passed through to the
+    wrapped client.
+    """
+
+    def __init__(self: "SharedSpotify", sp: Spotify, working_set: WorkingSet) -> None:
+        """Initialize the wrapper and its counters."""
+        self.sp = sp
+        self.working_set = working_set
+        self.n_fetched: Counter[str] = Counter()
+        self.n_shared: Counter[str] = Counter()
+        self.n_calls: Counter[str] = Counter()
+        self.n_calls_saved: Counter[str] = Counter()
+
+    def __getattr__(self: "SharedSpotify", name: str) -> Any:  # noqa: ANN401
+        """Pass unshared attributes through to the Spotify client."""
+        return getattr(self.sp, name)
+
+    def _get_many(self: "SharedSpotify", endpoint: str, ids: list[str]) -> list[Any]:
+        """Get the responses for multiple IDs, fetching the IDs that are not yet in the working set."""
+        ids = [parse_id(id_) for id_ in ids]
+        # Claim the IDs that are not yet in the working set
+        with self.working_set.lock:
+            claimed: dict[str, Future[Any]] = {}
+            for id_ in dict.fromkeys(ids):
+                if (endpoint, id_) not in self.working_set.responses:
+                    claimed[id_] = self.working_set.responses[(endpoint, id_)] = Future()
+            futures = {id_: self.working_set.responses[(endpoint, id_)] for id_ in ids}
+        self.n_shared[endpoint] += len(futures) - len(claimed)
+        if not claimed and ids:
+            # The whole batch is served by the working set, which saves an API call
+            self.n_calls_saved[endpoint] += 1
+        if claimed:
+            self.n_calls[endpoint] += 1
+            try:
+                if endpoint == "artists":
+                    fetched = self.sp.artists(list(claimed))["artists"]
+                else:
+                    fetched = self.sp.audio_features(list(claimed))
+            except BaseException as e:
+                # Release the claimed IDs, so they are fetched again when requested again
+                with self.working_set.lock:
+                    for id_, future in claimed.items():
+                        del self.working_set.responses[(endpoint, id_)]
+                        future.set_exception(e)
+                raise
+            for future, response in zip(claimed.values(), fetched, strict=True):
+                future.set_result(response)
+            self.n_fetched[endpoint] += len(claimed)
+        return [futures[id_].result() for id_ in ids]
+
+    def artists(self: "SharedSpotify", artists: list[str]) -> dict[str, Any]:
+        """Get the details of multiple artists."""
+        return {"artists": self._get_many("artists", artists)}
+
+    def audio_features(self: "SharedSpotify", tracks: str | list[str]) -> list[Any]:
+        """Get the audio features of one or multiple tracks."""
+        return self._get_many("audio_features", [tracks] if isinstance(tracks, str) else tracks)
+
+
+def load_manifest(path: str | Path = MANIFEST_PATH) -> list[dict[str, str]]:
+    """Load the manifest of playlists, as a list of `playlist_uri` and `file_name` pairs."""
+    with Path(path).open() as f:
+        manifest = json.load(f)
+    for playlist in manifest:
+        if "playlist_uri" not in playlist or "file_name" not in playlist:
+            msg = f"Playlist {playlist} in {path} lacks a `playlist_uri` or `file_name`!"
+            raise ValueError(msg)
+    return list(manifest)
+
+
+def sync_playlists(  # noqa: PLR0913
+    sp: Spotify,
+    manifest: list[dict[str, str]],
+    file_format: FileFormat = FILE_FORMAT,
+    max_playlists: int = MAX_PLAYLISTS,
+    map_batches: BatchMapper = map,
+    metrics: Metrics | None = None,
+    store: TrackStore | None = None,
+) -> list[dict[str, Any]]:
+    """Export the stats of all playlists in the manifest concurrently, sharing one working set.
+
+    Returns a summary per playlist, with the number of exported tracks (None when unchanged or
+    failed), the duration, the number of artist and audio feature IDs that were fetched or served
+    by the working set, and the number of API calls that were made or saved by the working set. The time spent in each stage is recorded in `metrics`, if given.
+    The playlist stats are kept in the `store`, as one dataset per playlist.
+    """
+    logger = logging.getLogger("spotify")
+    working_set = WorkingSet()
+
+    def sync(playlist: dict[str, str]) -> dict[str, Any]:
+        """Export the stats of a single playlist."""
+        client = SharedSpotify(sp, working_set)
+        started_at = time.perf_counter()
+        n_tracks, failed = None, False
+        try:
+            n_tracks = sync_playlist(
+                client,
+                playlist["playlist_uri"],
+                playlist["file_name"],
+                file_format,
+                map_batches,
+                metrics,
+                store,
+            )
+        except Exception:
+            msg = f"{playlist['file_name']}: failed to export the playlist stats."
+            logger.exception(msg)
+            failed = True
+        return {
+            "file_name": playlist["file_name"],
+            "n_tracks": n_tracks,
+            "failed": failed,
+            "seconds": time.perf_counter() - started_at,
+            "n_fetched": client.n_fetched.total(),
+            "n_shared": client.n_shared.total(),
+            "n_calls": client.n_calls.total(),
+            "n_calls_saved": client.n_calls_saved.total(),
+        }
+
+    with ThreadPoolExecutor(max_workers=max_playlists) as executor:
+        return list(executor.map(sync, manifest))
+
+
+def main() -> None:
+    """Export the stats of all playlists in a manifest."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", nargs="?", default=MANIFEST_PATH, help="manifest of playlists")
+    parser.add_argument("--format", default=FILE_FORMAT, choices=["parquet", "csv"])
+    parser.add_argument(
+        "--credentials", nargs="+", default=["spotify"], help="sections in config.ini"
+    )
+    parser.add_argument("--max-playlists", type=int, default=MAX_PLAYLISTS)
+    parser.add_argument("--metrics", default=METRICS_PATH, help="JSON summary of the run")
+    parser.add_argument("--prometheus", help="Prometheus text file of the run (optional)")
+    args = parser.parse_args()
+    logger = create_logger("spotify")
+
+    # Load credentials and authenticate with Spotify, spreading requests across the credentials
+    clients = create_clients(args.credentials)
+
+    # Share the rate limiters, cache, store, working set and metrics across all playlists
+    metrics = Metrics()
+    cache = ResponseCache()
+    store = TrackStore()
+    instrumented_clients = [InstrumentedSpotify(sp, metrics) for sp in clients]
+    try:
+        with EnrichmentEngine(
+            instrumented_clients, metrics=metrics, names=args.credentials
+        ) as engine:
+            client = CachedSpotify(engine.client, cache)
+            summaries = sync_playlists(
+                client,
+                load_manifest(args.manifest),
+                args.format,
+                args.max_playlists,
+                engine.map,
+                metrics,
+                store,
+            )
+            for summary in summaries:
+                status = f"{summary['n_tracks']} tracks"
+                if summary["n_tracks"] is None:
+                    status = "failed" if summary["failed"] else "unchanged"
+                logger.info(
+                    f"{summary['file_name']}: {status} in {summary['seconds']:.1f}s, "
+                    f"{summary['n_calls']} calls made, {summary['n_calls_saved']} saved "
+                    f"({summary['n_shared']} IDs shared)."
+                )
+            n_calls_saved = sum(summary["n_calls_saved"] for summary in summaries)
+            logger.info(f"Saved {n_calls_saved} calls in total.")
+            logger.info(engine.report())
+            logger.info(f"Cache: {cache.report()}")
+    finally:
+        cache.close()
+        store.close()
+
+        # Export the metrics of the run, also when it failed, to track its performance over time
+        metrics.record_cache(cache.hits, cache.misses)
+        metrics.write_json(args.metrics)
+        if args.prometheus:
+            metrics.write_prometheus(args.prometheus)
+        logger.info(f"Metrics: {metrics.report()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Persistent on-disk cache for responses of the Spotify API."""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from spotipy.client import Spotify
+from spotipy.exceptions import SpotifyException
+
+# Location of the cache database
+CACHE_PATH = "./.cache/spotify.sqlite"
+# Time-to-live (in seconds) of cached responses per endpoint, None meaning they never expire.
+# The popularity of artists changes daily, while their other details (e.g. genres) rarely change.
+CACHE_TTLS: dict[str, float | None] = {
+    "artists": 30 * 24 * 60 * 60,
+    "artist_popularity": 24 * 60 * 60,
+    "audio_features": None,
+    "user": 30 * 24 * 60 * 60,
+    "track": 24 * 60 * 60,
+}
+# Time-to-live (in seconds) of IDs for which the API returned nothing
+NEGATIVE_TTL = 7 * 24 * 60 * 60
+# Maximum number of cached responses, the least recently used responses are evicted first
+MAX_ENTRIES = 500_000
+# Marker for IDs for which the API returned nothing
+NOT_FOUND = None
+# Status code of responses for IDs that do not (or no longer) exist, e.g. deleted users
+HTTP_NOT_FOUND = 404
+# Fields of an artist that change often, cached apart from the other details of the artist
+ARTIST_POPULARITY_FIELDS = ("popularity", "followers")
+
+
+def parse_id(uri: str) -> str:
+    """Parse the ID from a Spotify URI (e.g. `spotify:artist:<id>`) or return the ID as is."""
+    return uri.split(":")[-1]
+
+
+def split_artist(
+    artist: dict[str, Any] | None,
+) -> tuple[dict[str, Any] | None, dict[str, Any] | None]:
+    """Split the details of an artist from its popularity, keeping `NOT_FOUND` as is."""
+    if artist is NOT_FOUND:
+        return NOT_FOUND, NOT_FOUND
+    details = {key: value for key, value in artist.items() if key not in ARTIST_POPULARITY_FIELDS}
+    popularity = {key: artist[key] for key in ARTIST_POPULARITY_FIELDS if key in artist}
+    return details, popularity
+
+
+class ResponseCache:
+    """SQLite store of API responses keyed by endpoint and ID, with TTLs and LRU eviction."""
+
+    def __init__(
+        self: "ResponseCache",
+        path: str | Path = CACHE_PATH,
+        ttls: dict[str, float | None] | None = None,
+        max_entries: int = MAX_ENTRIES,
+    ) -> None:
+        """Open (or create) the cache database."""
+        self.ttls = CACHE_TTLS if ttls is None else ttls
+        self.max_entries = max_entries
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                endpoint TEXT NOT NULL,
+                id TEXT NOT NULL,
+                response TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (endpoint, id)
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        )
+        # Keep track of the number of cached responses, rather than counting them on every write
+        (self._n_entries,) = self._connection.execute("SELECT count(*) FROM responses").fetchone()
+        self._lock = threading.Lock()
+
+    def get_many(self: "ResponseCache", endpoint: str, ids: list[str]) -> dict[str, Any]:
+        """Get the fresh cached responses for the given IDs (`NOT_FOUND` for negative entries)."""
+        now = time.time()
+        ttl = self.ttls.get(endpoint)
+        placeholders = ", ".join("?" * len(ids))
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, response, fetched_at FROM responses "  # noqa: S608
+                f"WHERE endpoint = ? AND id IN ({placeholders})",
+                [endpoint, *ids],
+            ).fetchall()
+            responses = {}
+            for id_, response, fetched_at in rows:
+                # Skip expired responses
+                expires_after = NEGATIVE_TTL if response is None else ttl
+                if expires_after is not None and fetched_at + expires_after < now:
+                    continue
+                responses[id_] = NOT_FOUND if response is None else json.loads(response)
+            # Mark the cached responses as recently used
+            self._connection.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE endpoint = ? AND id = ?",
+                [(now, endpoint, id_) for id_ in responses],
+            )
+            self._connection.commit()
+        self.hits[endpoint] += len(responses)
+        self.misses[endpoint] += len(ids) - len(responses)
+        return responses
+
+    def put_many(self: "ResponseCache", endpoint: str, responses: dict[str, Any]) -> None:
+        """Cache the responses for the given IDs, caching `NOT_FOUND` as a negative entry."""
+        now = time.time()
+        placeholders = ", ".join("?" * len(responses))
+        with self._lock:
+            # Only responses for IDs that are not cached yet add to the number of cached responses
+            (n_replaced,) = self._connection.execute(
+                "SELECT count(*) FROM responses "  # noqa: S608
+                f"WHERE endpoint = ? AND id IN ({placeholders})",
+                [endpoint, *responses],
+            ).fetchone()
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                [
+                    (endpoint, id_, None if response is None else json.dumps(response), now, now)
+                    for id_, response in responses.items()
+                ],
+            )
+            self._n_entries += len(responses) - n_replaced
+            # Evict the least recently used responses
+            if self._n_entries > self.max_entries:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE rowid IN "
+                    "(SELECT rowid FROM responses ORDER BY accessed_at LIMIT ?)",
+                    [self._n_entries - self.max_entries],
+                )
+                self._n_entries = self.max_entries
+            self._connection.commit()
+
+    def close(self: "ResponseCache") -> None:
+        """Close the cache database."""
+        self._connection.close()
+
+    def report(self: "ResponseCache") -> str:
+        """Summarize the cache hits and misses per endpoint."""
+        return ", ".join(
+            f"{endpoint}: {self.hits[endpoint]} hits/{self.misses[endpoint]} misses"
+            for endpoint in sorted(self.hits | self.misses)
+        )
+
+
+class CachedSpotify:
+    """Wrapper around the Spotify client that serves responses from a response cache.
+
+    Artists, audio features, users and tracks are cached, and only the IDs that are not (or no
+    longer) cached are requested. The popularity of artists is cached apart from their other
+    details, so it expires sooner. Users and tracks that do not exist are returned as
+    `NOT_FOUND`. All other attributes are passed through to the wrapped client.
+    """
+
+    def __init__(self: "CachedSpotify", sp: Spotify, cache: ResponseCache) -> None:
+        """Initialize the wrapper."""
+        self.sp = sp
+        self.cache = cache
+
+    def __getattr__(self: "CachedSpotify", name: str) -> Any:  # noqa: ANN401
+        """Pass uncached attributes through to the Spotify client."""
+        return getattr(self.sp, name)
+
+    def _get_many(self: "CachedSpotify", endpoint: str, ids: list[str]) -> list[Any]:
+        """Get the responses for multiple IDs, fetching the missing ones in a single request."""
+        ids = [parse_id(id_) for id_ in ids]
+        responses = self.cache.get_many(endpoint, ids)
+        missing_ids = list(dict.fromkeys(id_ for id_ in ids if id_ not in responses))
+        if missing_ids:
+            logging.getLogger("spotify").debug(f"Fetching {len(missing_ids)} {endpoint}...")
+            fetched = self.sp.audio_features(missing_ids)
+            fetched_responses = dict(zip(missing_ids, fetched, strict=True))
+            self.cache.put_many(endpoint, fetched_responses)
+            responses.update(fetched_responses)
+        return [responses[id_] for id_ in ids]
+
+    def _get(self: "CachedSpotify", endpoint: str, id_: str) -> Any:  # noqa: ANN401
+        """Get the response for a single ID, or `NOT_FOUND` if the ID does not exist (anymore)."""
+        id_ = parse_id(id_)
+        responses = self.cache.get_many(endpoint, [id_])
+        if id_ not in responses:
+            try:
+                responses[id_] = getattr(self.sp, endpoint)(id_)
+            except SpotifyException as e:
+                # Cache a negative entry for deleted users and tracks, rather than refetching them
+                if e.http_status != HTTP_NOT_FOUND:
+                    raise
+                responses[id_] = NOT_FOUND
+            self.cache.put_many(endpoint, responses)
+        return responses[id_]
+
+    def _get_artists(
+        self: "CachedSpotify", ids: list[str], with_popularity: bool = True
+    ) -> list[dict[str, Any] | None]:
+        """Get the details of multiple artists, fetching the missing ones in a single request.
+
+        Artists are fetched again when their details expired, or when their popularity expired and
+        `with_popularity` is set. The details and popularity of fetched artists are cached apart.
+        """
+        ids = [parse_id(id_) for id_ in ids]
+        details = self.cache.get_many("artists", ids)
+        popularities = self.cache.get_many("artist_popularity", ids) if with_popularity else {}
+        missing_ids = list(
+            dict.fromkeys(
+                id_
+                for id_ in ids
+                if id_ not in details
+                or (with_popularity and details[id_] is not NOT_FOUND and id_ not in popularities)
+            )
+        )
+        if missing_ids:
+            logging.getLogger("spotify").debug(f"Fetching {len(missing_ids)} artists...")
+            fetched = dict(zip(missing_ids, self.sp.artists(missing_ids)["artists"], strict=True))
+            fetched_details, fetched_popularities = {}, {}
+            for id_, artist in fetched.items():
+                fetched_details[id_], fetched_popularities[id_] = split_artist(artist)
+            self.cache.put_many("artists", fetched_details)
+            self.cache.put_many("artist_popularity", fetched_popularities)
+            details.update(fetched_details)
+            popularities.update(fetched_popularities)
+        return [
+            NOT_FOUND
+            if details[id_] is NOT_FOUND
+            else {**details[id_], **(popularities[id_] if with_popularity else {})}
+            for id_ in ids
+        ]
+
+    def artists(self: "CachedSpotify", artists: list[str]) -> dict[str, Any]:
+        """Get the details of multiple artists."""
+        return {"artists": self._get_artists(artists)}
+
+    def artist_genres(self: "CachedSpotify", artists: list[str]) -> list[list[str] | None]:
+        """Get the genres of multiple artists, which are cached longer than their popularity."""
+        return [
+            NOT_FOUND if artist is NOT_FOUND else list(artist["genres"])
+            for artist in self._get_artists(artists, with_popularity=False)
+        ]
+
+    def artist(self: "CachedSpotify", artist_id: str) -> dict[str, Any] | None:
+        """Get the details of a single artist."""
+        return self.artists([artist_id])["artists"][0]  # type: ignore[no-any-return]
+
+    def audio_features(self: "CachedSpotify", tracks: str | list[str]) -> list[Any]:
+        """Get the audio features of one or multiple tracks."""
+        return self._get_many("audio_features", [tracks] if isinstance(tracks, str) else tracks)
+
+    def user(self: "CachedSpotify", user: str) -> dict[str, Any] | None:
+        """Get the profile of a user."""
+        return self._get("user", user)  # type: ignore[no-any-return]
+
+    def track(self: "CachedSpotify", track_id: str) -> dict[str, Any] | None:
+        """Get the details of a single track."""
+        return self._get("track", track_id)  # type: ignore[no-any-return]
@@ -0,0 +1,372 @@
+"""Dictionary-encoded, compact in-memory model of playlist stats.
+
+Instead of holding Python lists of artist URIs, names, genres and popularities per track, the
+artists and genres are interned once, and linked to the tracks by integer codes with CSR offsets.
+Repeated strings (albums, album types, contributors) are stored as categoricals. Converting back
+to the playlist stats gives the same dataframe, so the model can hold any playlist stats.
+"""
+
+import itertools
+import logging
+from collections.abc import Iterable
+from typing import Any, Self, TypeVar
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from spotipy.client import Spotify
+from storage import FILE_FORMAT, FileFormat, parse_list_columns, read_playlist_stats
+from utils import (
+    ARTIST_DETAILS,
+    AUDIO_FEATURES,
+    BatchMapper,
+    fetch_artists,
+    fetch_audio_features,
+    initialize_playlist_stats,
+)
+
+T = TypeVar("T", bound=np.generic)
+
+# Columns holding one of a few repeated strings per track, stored as categoricals
+CATEGORICAL_COLUMNS = [
+    "album",
+    "album_type",
+    "release_date",
+    "duration",
+    "added_at",
+    "added_by_id",
+    "added_by",
+]
+# Prefix of the URI of a track, followed by its ID
+TRACK_URI_PREFIX = "spotify:track:"
+# Columns of the playlist stats derived from the artist tables, instead of stored per track
+ARTIST_COLUMNS = ["artist", "artist_uris", "artist_names", "artists_genres", "artists_popularities"]
+# Popularity of artists of tracks of which the artist details have not been fetched
+UNKNOWN_POPULARITY = -1
+# Code of the genres of artists of tracks of which the artist details have not been fetched
+UNKNOWN_GENRES = -1
+
+
+class CompactPlaylistStats:
+    """Playlist stats with interned artists and genres, linked to the tracks by CSR offsets.
+
+    The artists of track `i` are `track_artists[track_artist_offsets[i]:track_artist_offsets[i + 1]]`
+    (codes into `artists`). The popularity and genres of each of these artists, as fetched when the
+    track was enriched, are stored alongside: `track_artist_popularities` holds the popularities,
+    and `track_artist_genres` holds codes into the interned lists of genres, of which list `j` is
+    `genre_list_genres[genre_list_offsets[j]:genre_list_offsets[j + 1]]` (codes into `genres`).
+    Artists are interned by URI and name, so renamed artists are kept apart.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: "CompactPlaylistStats",
+        tracks: pd.DataFrame,
+        artists: pd.DataFrame,
+        genres: npt.NDArray[np.object_],
+        track_artists: npt.NDArray[np.int32],
+        track_artist_offsets: npt.NDArray[np.int64],
+        track_artist_popularities: npt.NDArray[np.int16],
+        track_artist_genres: npt.NDArray[np.int32],
+        genre_list_genres: npt.NDArray[np.int32],
+        genre_list_offsets: npt.NDArray[np.int64],
+        columns: list[str],
+    ) -> None:
+        """Initialize the model from its tables, and the columns of the playlist stats."""
+        self.tracks = tracks
+        self.artists = artists
+        self.genres = genres
+        self.track_artists = track_artists
+        self.track_artist_offsets = track_artist_offsets
+        self.track_artist_popularities = track_artist_popularities
+        self.track_artist_genres = track_artist_genres
+        self.genre_list_genres = genre_list_genres
+        self.genre_list_offsets = genre_list_offsets
+        self.columns = columns
+
+    def __len__(self: "CompactPlaylistStats") -> int:
+        """Return the number of tracks."""
+        return len(self.tracks)
+
+    @classmethod
+    def from_tracks(cls: type[Self], tracks: list[dict[str, Any]]) -> Self:
+        """Parse all tracks in a playlist (see `initialize_playlist_stats`) to the compact model."""
+        return cls.from_playlist_stats(initialize_playlist_stats(tracks))
+
+    @classmethod
+    def read(cls: type[Self], file_name: str, file_format: FileFormat = FILE_FORMAT) -> Self:
+        """Read previously exported playlist stats (see `read_playlist_stats`) to the compact model."""
+        df_stats = read_playlist_stats(file_name, file_format=file_format)
+        if df_stats is None:
+            msg = f"No exported playlist stats found for {file_name}!"
+            raise FileNotFoundError(msg)
+        return cls.from_playlist_stats(df_stats)
+
+    @classmethod
+    def from_playlist_stats(cls: type[Self], df_stats: pd.DataFrame) -> Self:
+        """Encode playlist stats, as built by `enrich_playlist_stats` or read from an export."""
+        df_stats = parse_list_columns(df_stats).reset_index(drop=True)
+        # Intern the artists of all tracks by URI and name
+        uris = [uri for artist_uris in df_stats["artist_uris"] for uri in artist_uris]
+        names = [name for artist_names in df_stats["artist_names"] for name in artist_names]
+        codes, artists = pd.MultiIndex.from_arrays([uris, names]).factorize()
+        lengths = df_stats["artist_uris"].map(len).to_numpy()
+        track_artist_offsets = np.zeros(len(df_stats) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=track_artist_offsets[1:])
+        # Keep the details of each artist of the enriched tracks, as fetched for that track
+        popularities = np.full(len(uris), UNKNOWN_POPULARITY, dtype=np.int16)
+        genre_codes = np.full(len(uris), UNKNOWN_GENRES, dtype=np.int32)
+        genre_lists: dict[tuple[str, ...], int] = {}
+        artists_genres = df_stats.get("artists_genres", pd.Series()).to_numpy()
+        artists_popularities = df_stats.get("artists_popularities", pd.Series()).to_numpy()
+        for i in np.flatnonzero(enriched_with_artist_details(df_stats)):
+            start, stop = track_artist_offsets[i], track_artist_offsets[i + 1]
+            popularities[start:stop] = artists_popularities[i]
+            genre_codes[start:stop] = [
+                genre_lists.setdefault(tuple(genres), len(genre_lists))
+                for genres in artists_genres[i]
+            ]
+        # Intern the genres of all lists of genres
+        genre_list_genres, genre_list_offsets, genres = encode_lists(genre_lists)
+        return cls(
+            encode_tracks(df_stats),
+            artists.to_frame(index=False, name=["uri", "name"]),
+            genres,
+            codes.astype(np.int32),
+            track_artist_offsets,
+            popularities,
+            genre_codes,
+            genre_list_genres,
+            genre_list_offsets,
+            df_stats.columns.tolist(),
+        )
+
+    def enrich(
+        self: "CompactPlaylistStats",
+        sp: Spotify,
+        artists: dict[str, dict[str, Any]] | None = None,
+        map_batches: BatchMapper = map,
+    ) -> "CompactPlaylistStats":
+        """Enrich the tracks with artist details and audio features (see `enrich_playlist_stats`).
+
+        Only the artists of tracks that have not yet been enriched are fetched, and their details
+        are stored for those tracks. Tracks of which the artist details could not be fetched are
+        dropped, as by `enrich_playlist_stats`.
+        """
+        logger = logging.getLogger("spotify")
+        to_enrich = ~self.tracks["enriched"].isin([True]).to_numpy()
+        if not to_enrich.any():
+            logger.info("All tracks have been enriched.")
+            return self
+        logger.info(f"Enriching {to_enrich.sum()}/{len(self)} tracks...")
+        # Fetch the details of the artists, and the audio features, of the tracks to enrich
+        lengths = np.diff(self.track_artist_offsets)
+        entries = np.flatnonzero(np.repeat(to_enrich, lengths))
+        entry_uris = self.artists["uri"].to_numpy()[self.track_artists]
+        uris = list(dict.fromkeys(entry_uris[entries].tolist()))
+        artists = fetch_artists(sp, uris, artists, map_batches)
+        df_audio_features = fetch_audio_features(sp, self.tracks[to_enrich], map_batches)
+        # Store the fetched artist details for each artist of the tracks to enrich
+        popularities = self.track_artist_popularities.copy()
+        genre_codes = self.track_artist_genres.copy()
+        genre_lists = {tuple(genres): i for i, genres in enumerate(self.genre_lists())}
+        unknown = np.zeros(len(self.track_artists), dtype=bool)
+        for entry, uri in zip(entries, entry_uris[entries], strict=True):
+            if uri not in artists:
+                unknown[entry] = True
+                continue
+            popularities[entry] = artists[uri]["popularity"]
+            artist_genres = tuple(artists[uri]["genres"])
+            genre_codes[entry] = genre_lists.setdefault(artist_genres, len(genre_lists))
+        genre_list_genres, genre_list_offsets, genres = encode_lists(genre_lists)
+        # Skip tracks of which the artist details could not be fetched
+        artists_found = sum_per_track(unknown, self.track_artist_offsets) == 0
+        for i in np.flatnonzero(to_enrich & ~artists_found):
+            track = self.tracks.iloc[i]
+            artist = ", ".join(self.artists["name"].to_numpy()[self.artist_codes(i)])
+            logger.info(f"Artist details not found for: {track['name']} - {artist}")
+        # Join the audio features and add an `enriched` tag, preserving the playlist order
+        sums = sum_per_track(popularities.astype(np.int64), self.track_artist_offsets)
+        averages = np.divide(sums, lengths, out=np.full(len(self), np.nan), where=lengths > 0)
+        enriched = to_enrich & artists_found
+        df_enriched = (
+            self.tracks[enriched]
+            .drop(columns=[*AUDIO_FEATURES, "artists_avg_popularity"], errors="ignore")
+            .join(df_audio_features)
+            .assign(enriched=True, artists_avg_popularity=averages[enriched])
+        )
+        df_frames = [df for df in (self.tracks[~to_enrich], df_enriched) if not df.empty]
+        tracks = pd.concat(df_frames).sort_index()
+        positions = tracks.index.to_numpy()
+        track_artists, track_artist_offsets = take_lists(
+            self.track_artists, self.track_artist_offsets, positions
+        )
+        popularities, _ = take_lists(popularities, self.track_artist_offsets, positions)
+        genre_codes, _ = take_lists(genre_codes, self.track_artist_offsets, positions)
+        # Order the columns as `enrich_playlist_stats` does
+        enriched_columns = [*AUDIO_FEATURES, *ARTIST_DETAILS]
+        columns = [column for column in self.columns if column not in enriched_columns]
+        columns = [*columns, *enriched_columns]
+        if (~to_enrich).any():
+            columns = list(dict.fromkeys([*self.columns, *columns]))
+        return CompactPlaylistStats(
+            tracks.reset_index(drop=True),
+            self.artists,
+            genres,
+            track_artists,
+            track_artist_offsets,
+            popularities,
+            genre_codes,
+            genre_list_genres,
+            genre_list_offsets,
+            columns,
+        )
+
+    def artist_codes(self: "CompactPlaylistStats", position: int) -> npt.NDArray[np.int32]:
+        """Get the codes of the artists of a single track."""
+        start, stop = self.track_artist_offsets[position], self.track_artist_offsets[position + 1]
+        return self.track_artists[start:stop]
+
+    def genre_lists(self: "CompactPlaylistStats") -> list[list[str]]:
+        """Decode the interned lists of genres."""
+        genres = self.genres[self.genre_list_genres]
+        offsets = self.genre_list_offsets
+        return [genres[start:stop].tolist() for start, stop in itertools.pairwise(offsets)]
+
+    def has_artist_details(self: "CompactPlaylistStats") -> npt.NDArray[np.bool_]:
+        """Determine which tracks are enriched, with the details of all of their artists."""
+        unknown = self.track_artist_popularities == UNKNOWN_POPULARITY
+        artists_found = sum_per_track(unknown, self.track_artist_offsets) == 0
+        has_details: npt.NDArray[np.bool_] = (
+            self.tracks["enriched"].isin([True]).to_numpy() & artists_found
+        )
+        return has_details
+
+    def column(self: "CompactPlaylistStats", column: str) -> pd.Series:
+        """Decode a single column of the playlist stats, as built by `enrich_playlist_stats`."""
+        if column in self.tracks:
+            series = self.tracks[column]
+            return (
+                series.astype(object) if isinstance(series.dtype, pd.CategoricalDtype) else series
+            )
+        if column == "track_uri":
+            return (TRACK_URI_PREFIX + self.tracks["track_id"].astype(object)).rename(column)
+        spans = list(itertools.pairwise(self.track_artist_offsets))
+        if column in ("artist", "artist_uris", "artist_names"):
+            key = "name" if column in ("artist", "artist_names") else "uri"
+            values = self.artists[key].to_numpy()[self.track_artists]
+            lists = [values[start:stop].tolist() for start, stop in spans]
+            if column == "artist":
+                return pd.Series([", ".join(names) for names in lists], name=column)
+            return pd.Series(lists, name=column)
+        # Artist details are only set on enriched tracks
+        if column == "artists_popularities":
+            popularities = self.track_artist_popularities.astype(np.int64)
+            lists = [popularities[start:stop].tolist() for start, stop in spans]
+        elif column == "artists_genres":
+            genre_lists = self.genre_lists()
+            lists = [
+                [list(genre_lists[code]) for code in self.track_artist_genres[start:stop]]
+                for start, stop in spans
+            ]
+        else:
+            msg = f"Unknown column: {column}"
+            raise KeyError(msg)
+        values = [
+            value if found else np.nan
+            for value, found in zip(lists, self.has_artist_details(), strict=True)
+        ]
+        return pd.Series(values, name=column, dtype=object)
+
+    def to_playlist_stats(
+        self: "CompactPlaylistStats", columns: Iterable[str] | None = None
+    ) -> pd.DataFrame:
+        """Convert back to the playlist stats dataframe, decoding only the given columns."""
+        columns = self.columns if columns is None else list(columns)
+        return pd.DataFrame({column: self.column(column) for column in columns}, columns=columns)
+
+    def memory_usage(self: "CompactPlaylistStats") -> int:
+        """Get the number of bytes used by the tables, including the interned strings."""
+        arrays: list[npt.NDArray[Any]] = [
+            self.track_artists,
+            self.track_artist_offsets,
+            self.track_artist_popularities,
+            self.track_artist_genres,
+            self.genre_list_genres,
+            self.genre_list_offsets,
+        ]
+        return int(
+            self.tracks.memory_usage(deep=True).sum()
+            + self.artists.memory_usage(deep=True).sum()
+            + pd.Series(self.genres, dtype=object).memory_usage(deep=True, index=False)
+            + sum(array.nbytes for array in arrays)
+        )
+
+
+def encode_lists(
+    lists: Iterable[Iterable[str]],
+) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int64], npt.NDArray[np.object_]]:
+    """Intern the items of lists, returning their codes, CSR offsets and the unique items."""
+    items: list[str] = []
+    offsets = [0]
+    for items_of_list in lists:
+        items.extend(items_of_list)
+        offsets.append(len(items))
+    codes, uniques = pd.factorize(np.array(items, dtype=object))
+    return (
+        codes.astype(np.int32),
+        np.array(offsets, dtype=np.int64),
+        np.asarray(uniques, dtype=object),
+    )
+
+
+def take_lists(
+    codes: npt.NDArray[T], offsets: npt.NDArray[np.int64], positions: npt.NDArray[np.int64]
+) -> tuple[npt.NDArray[T], npt.NDArray[np.int64]]:
+    """Select the lists at the given positions from CSR-encoded lists (of codes or values)."""
+    lengths = np.diff(offsets)[positions]
+    new_offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    # Shift the items of each selected list from its old to its new start
+    shifts = np.repeat(offsets[:-1][positions] - new_offsets[:-1], lengths)
+    return codes[np.arange(new_offsets[-1]) + shifts], new_offsets
+
+
+def sum_per_track(
+    values: npt.NDArray[np.bool_] | npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]
+) -> npt.NDArray[np.float64]:
+    """Sum the values of the items of each track, given their CSR offsets."""
+    tracks = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    return np.bincount(tracks, weights=values, minlength=len(offsets) - 1).astype(np.float64)
+
+
+def enriched_with_artist_details(df_stats: pd.DataFrame) -> npt.NDArray[np.bool_]:
+    """Determine which tracks are enriched, with a list of details of each of their artists."""
+    if not set(ARTIST_DETAILS).issubset(df_stats):
+        return np.zeros(len(df_stats), dtype=bool)
+    enriched = df_stats["enriched"].isin([True]).to_numpy()
+    has_details: npt.NDArray[np.bool_] = (
+        enriched & df_stats["artists_genres"].map(lambda x: isinstance(x, list)).to_numpy()
+    )
+    return has_details
+
+
+def encode_tracks(df_stats: pd.DataFrame) -> pd.DataFrame:
+    """Drop the columns derived from the artist tables, and store repeated strings as categoricals.
+
+    Track URIs and the joined artist names are dropped too, when all of them can be derived.
+    """
+    df_tracks = df_stats.drop(columns=ARTIST_COLUMNS, errors="ignore")
+    if (
+        "track_uri" in df_tracks
+        and (df_tracks["track_uri"] == TRACK_URI_PREFIX + df_tracks["track_id"].astype(str)).all()
+    ):
+        df_tracks = df_tracks.drop(columns=["track_uri"])
+    if (
+        "artist" in df_stats
+        and not (df_stats["artist"] == df_stats["artist_names"].str.join(", ")).all()
+    ):
+        df_tracks.insert(df_stats.columns.get_loc("artist"), "artist", df_stats["artist"])
+    for column in CATEGORICAL_COLUMNS:
+        if column in df_tracks and df_tracks[column].dtype == object:
+            df_tracks[column] = df_tracks[column].astype("category")
+    return df_tracks
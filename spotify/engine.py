@@ -0,0 +1,377 @@
+"""Concurrent enrichment engine with shared, Retry-After-aware rate limiters per credential."""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Self
+
+import requests
+import spotipy
+from metrics import Metrics
+from spotipy.cache_handler import CacheFileHandler
+from spotipy.client import Spotify
+from spotipy.exceptions import SpotifyException
+from spotipy.oauth2 import SpotifyClientCredentials
+from urllib3.util.retry import Retry
+from utils import enrich_playlist_stats, load_credentials
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Number of concurrent workers sending requests to the Spotify API, per credential
+MAX_WORKERS = 4
+# Sustained number of requests per second shared by all workers, per credential
+REQUESTS_PER_SECOND = 10.0
+# Number of times a request is retried after a 429 response
+MAX_RETRIES = 5
+# Back-off (in seconds) when a 429 response does not include a `Retry-After` header
+DEFAULT_RETRY_AFTER = 1.0
+# Status codes retried by the HTTP session of the Spotify client itself
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+# Number of times the HTTP session retries a request after a server error
+STATUS_RETRIES = 3
+# Back-off factor (in seconds) of the HTTP session between retries after a server error
+STATUS_BACKOFF_FACTOR = 0.3
+# Location of the cached access tokens (with their expiry), one file per client ID
+TOKEN_CACHE_PATH = "./.cache/tokens"  # noqa: S105
+
+
+class RateLimiter:
+    """Token bucket rate limiter that is shared by all workers.
+
+    Tokens are refilled at `rate` tokens per second, up to `burst` tokens. After a 429 response,
+    `pause` halts all workers until the `Retry-After` period has passed.
+    """
+
+    def __init__(self: "RateLimiter", rate: float = REQUESTS_PER_SECOND, burst: int = 1) -> None:
+        """Initialize a full bucket."""
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self: "RateLimiter", now: float) -> None:
+        """Refill the bucket for the time passed since the last update."""
+        if now >= self._paused_until:
+            elapsed = now - self._updated_at
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+
+    @property
+    def budget(self: "RateLimiter") -> float:
+        """Number of tokens that are available now, which is zero while paused."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return self._tokens if now >= self._paused_until else 0.0
+
+    def try_acquire(self: "RateLimiter") -> float:
+        """Take a token if one is available, returning 0, or return the time to wait for one."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self: "RateLimiter") -> None:
+        """Block until a request may be sent."""
+        while wait := self.try_acquire():
+            time.sleep(wait)
+
+    def pause(self: "RateLimiter", seconds: float) -> None:
+        """Pause all workers for the given number of seconds, and empty the bucket."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._updated_at = self._paused_until
+            self._tokens = 0.0
+
+
+class CredentialPool:
+    """Pool of Spotify clients, each authenticated with its own credentials and rate limiter.
+
+    Every request is sent by the client with the most remaining budget. After a 429 response,
+    only the client that received it is quarantined for the `Retry-After` period, while the
+    other clients carry the load.
+    """
+
+    def __init__(
+        self: "CredentialPool",
+        clients: list[Spotify],
+        rate: float = REQUESTS_PER_SECOND,
+        burst: int = 1,
+        names: list[str] | None = None,
+    ) -> None:
+        """Initialize a rate limiter and request counters per client."""
+        self.clients = clients
+        self.names = names or [str(i) for i in range(len(clients))]
+        self.limiters = [RateLimiter(rate, burst) for _ in clients]
+        self.n_requests = [0] * len(clients)
+        self.n_rate_limited = [0] * len(clients)
+        self._lock = threading.Lock()
+
+    def __len__(self: "CredentialPool") -> int:
+        """Return the number of clients in the pool."""
+        return len(self.clients)
+
+    def acquire(self: "CredentialPool") -> int:
+        """Block until one of the clients may send a request, returning its index."""
+        while True:
+            # Try the clients with the most remaining budget first, and of those the client that
+            # sent the fewest requests, so a full budget does not favour the first client
+            budgets = [limiter.budget for limiter in self.limiters]
+            waits = []
+            for i in sorted(range(len(self)), key=lambda i: (-budgets[i], self.n_requests[i])):
+                wait = self.limiters[i].try_acquire()
+                if not wait:
+                    with self._lock:
+                        self.n_requests[i] += 1
+                    return i
+                waits.append(wait)
+            time.sleep(min(waits))
+
+    def quarantine(self: "CredentialPool", i: int, seconds: float) -> None:
+        """Stop sending requests with a client for the given number of seconds."""
+        with self._lock:
+            self.n_rate_limited[i] += 1
+        self.limiters[i].pause(seconds)
+
+    def report(self: "CredentialPool") -> str:
+        """Summarize the requests sent with each client."""
+        return ", ".join(
+            f"{name}: {n_requests} requests/{n_rate_limited} rate limited"
+            for name, n_requests, n_rate_limited in zip(
+                self.names, self.n_requests, self.n_rate_limited, strict=True
+            )
+        )
+
+
+class TokenCache(CacheFileHandler):  # type: ignore[misc]
+    """Cache of the access token of a client on disk, reused by later runs until it expires.
+
+    The token is written atomically to a file that only the user can read, so concurrent runs
+    never read a partially written token.
+    """
+
+    def __init__(self: "TokenCache", client_id: str, path: str | Path = TOKEN_CACHE_PATH) -> None:
+        """Initialize the cache file of the client."""
+        super().__init__(cache_path=str(Path(path) / f"{client_id}.json"))
+
+    def save_token_to_cache(self: "TokenCache", token_info: dict[str, Any]) -> None:
+        """Write the token (including its expiry) to the cache file."""
+        path = Path(self.cache_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path_tmp = path.with_suffix(".json.tmp")
+        with os.fdopen(os.open(path_tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            json.dump(token_info, f)
+        path_tmp.replace(path)
+
+
+def create_session() -> requests.Session:
+    """Create an HTTP session that retries server errors, but not 429 responses.
+
+    urllib3 retries a 429 response with a `Retry-After` header by default, even when 429 is not
+    one of the retried status codes, so every worker would sleep on its own. Instead, 429
+    responses are raised to the rate limiter of the enrichment engine, which quarantines the
+    credential for all workers.
+    """
+    retry = Retry(
+        total=STATUS_RETRIES,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+        status=STATUS_RETRIES,
+        backoff_factor=STATUS_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        respect_retry_after_header=False,
+    )
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def create_clients(sections: list[str], token_path: str | Path = TOKEN_CACHE_PATH) -> list[Spotify]:
+    """Create a separately authenticated Spotify client per section of `config.ini`.
+
+    Access tokens are cached on disk per client ID, so reruns within the hour skip the token
+    exchange.
+    """
+    clients = []
+    for section in sections:
+        credentials = load_credentials(section)
+        client_credentials_manager = SpotifyClientCredentials(
+            client_id=credentials["SPOTIPY_CLIENT_ID"],
+            client_secret=credentials["SPOTIPY_CLIENT_SECRET"],
+            cache_handler=TokenCache(credentials["SPOTIPY_CLIENT_ID"], token_path),
+        )
+        # Leave 429 responses to the rate limiter of the enrichment engine
+        clients.append(
+            spotipy.Spotify(
+                client_credentials_manager=client_credentials_manager,
+                requests_session=create_session(),
+            )
+        )
+    return clients
+
+
+class RateLimitedSpotify:
+    """Wrapper around a pool of Spotify clients that sends every API call through a rate limiter.
+
+    Each call is sent by the client with the most remaining budget. A 429 response quarantines
+    that client for the `Retry-After` period, after which the call is retried (by any client),
+    instead of every request backing off on its own. Retries are recorded in `metrics`, if given.
+    """
+
+    def __init__(
+        self: "RateLimitedSpotify",
+        pool: CredentialPool,
+        max_retries: int = MAX_RETRIES,
+        metrics: Metrics | None = None,
+    ) -> None:
+        """Initialize the wrapper and its request counters."""
+        self.pool = pool
+        self.max_retries = max_retries
+        self.metrics = metrics
+        self.n_requests = 0
+        self.n_rate_limited = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self: "RateLimitedSpotify", name: str) -> Any:  # noqa: ANN401
+        """Wrap the API methods of the Spotify clients."""
+        attribute = getattr(self.pool.clients[0], name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def call(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            """Call the API method once a client is available, retrying after a 429 response."""
+            logger = logging.getLogger("spotify")
+            retries = 0
+            while True:
+                i = self.pool.acquire()
+                with self._lock:
+                    self.n_requests += 1
+                try:
+                    return getattr(self.pool.clients[i], name)(*args, **kwargs)
+                except SpotifyException as e:
+                    if e.http_status != 429 or retries == self.max_retries:  # noqa: PLR2004
+                        raise
+                    with self._lock:
+                        self.n_rate_limited += 1
+                    if self.metrics is not None:
+                        self.metrics.record_retry(name)
+                    retry_after = float(e.headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+                    logger.warning(
+                        f"Rate limited on {name} ({self.pool.names[i]}), "
+                        f"quarantining it for {retry_after}s..."
+                    )
+                    self.pool.quarantine(i, retry_after)
+                    retries += 1
+
+        return call
+
+
+class EnrichmentEngine:
+    """Enrich playlist stats with concurrent API calls, sharing one rate limiter per credential.
+
+    Batches of artists and audio features are fetched by a pool of `max_workers` threads per
+    client. Results are collected in submission order, so the output is identical to the serial
+    path. With multiple clients (e.g. from `create_clients`), requests are spread across their
+    credentials, each allowing `requests_per_second`.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: "EnrichmentEngine",
+        sp: Spotify | list[Spotify],
+        max_workers: int = MAX_WORKERS,
+        requests_per_second: float = REQUESTS_PER_SECOND,
+        metrics: Metrics | None = None,
+        names: list[str] | None = None,
+    ) -> None:
+        """Initialize the rate limited client and the thread pool."""
+        clients = sp if isinstance(sp, list) else [sp]
+        self.max_workers = max_workers * len(clients)
+        self.pool = CredentialPool(clients, requests_per_second, burst=max_workers, names=names)
+        self.client = RateLimitedSpotify(self.pool, metrics=metrics)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._started_at = time.monotonic()
+
+    def __enter__(self: Self) -> Self:
+        """Enter the context manager."""
+        return self
+
+    def __exit__(
+        self: "EnrichmentEngine",
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Shut down the thread pool."""
+        self.close()
+
+    def close(self: "EnrichmentEngine") -> None:
+        """Shut down the thread pool."""
+        self._executor.shutdown()
+
+    def map(  # noqa: A003
+        self: "EnrichmentEngine", fn: Callable[[Any], Any], batches: Iterable[Any]
+    ) -> Iterator[Any]:
+        """Apply `fn` to all batches (or pages) concurrently, yielding the results in order.
+
+        At most `max_workers` batches are in flight at any time, and the next batch is submitted
+        as each result is yielded, so a slow consumer does not cause all batches to be fetched
+        (and held in memory) up front.
+        """
+        batches = iter(batches)
+        futures: deque[Future[Any]] = deque(
+            self._executor.submit(fn, batch) for batch in islice(batches, self.max_workers)
+        )
+        try:
+            while futures:
+                result = futures.popleft().result()
+                futures.extend(self._executor.submit(fn, batch) for batch in islice(batches, 1))
+                yield result
+        finally:
+            # Cancel the batches that were not started yet when the consumer stops early
+            for future in futures:
+                future.cancel()
+
+    def enrich_playlist_stats(
+        self: "EnrichmentEngine",
+        df_playlist: "pd.DataFrame",
+        artists: dict[str, dict[str, Any]] | None = None,
+    ) -> "pd.DataFrame":
+        """Enrich dataset with artist details and audio features, fetching batches concurrently."""
+        return enrich_playlist_stats(self.client, df_playlist, artists, self.map)
+
+    @property
+    def requests_per_second(self: "EnrichmentEngine") -> float:
+        """Achieved number of requests per second since the engine was started."""
+        return self.client.n_requests / (time.monotonic() - self._started_at)
+
+    def report(self: "EnrichmentEngine") -> str:
+        """Summarize the requests sent by the engine, per credential when using multiple."""
+        report = (
+            f"Sent {self.client.n_requests} requests with {self.max_workers} workers "
+            f"({self.requests_per_second:.1f} requests/s, "
+            f"{self.client.n_rate_limited} rate limited)."
+        )
+        if len(self.pool) > 1:
+            report += f" Credentials: {self.pool.report()}."
+        return report
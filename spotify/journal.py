@@ -0,0 +1,136 @@
+"""Crash-safe, append-only journal of enriched tracks, from which interrupted runs resume."""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Self
+
+from spotipy.client import Spotify
+from utils import (
+    ARTIST_DETAILS,
+    AUDIO_FEATURES,
+    BatchMapper,
+    LazyModule,
+    apply_enrichment,
+    enrich_playlist_stats,
+    to_json_records,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+else:
+    pd = LazyModule("pandas")
+
+# Columns of the playlist stats that are journaled once a track has been enriched
+JOURNAL_COLUMNS = ["track_id", "enriched", *AUDIO_FEATURES, *ARTIST_DETAILS]
+# Minimum time (in seconds) between two flushes of the journal to disk
+FSYNC_INTERVAL = 2.0
+
+
+class EnrichmentJournal:
+    """JSON Lines journal of the enrichment of tracks, appended to as soon as tracks are enriched.
+
+    Each line holds the audio features and artist details of one track. Lines are flushed to the
+    operating system as they are written, and to disk at most every `fsync_interval` seconds, so
+    an interrupted run loses at most the last few seconds of work. A next run resumes by taking
+    the enrichment of tracks from the journal, which is discarded once the export is written.
+    """
+
+    def __init__(
+        self: "EnrichmentJournal", file_name: str, fsync_interval: float = FSYNC_INTERVAL
+    ) -> None:
+        """Open (or create) the journal of an export, loading the tracks journaled before."""
+        self.path = Path(f"./data/{file_name}.journal.jsonl")
+        self.fsync_interval = fsync_interval
+        self.records = self._load()
+        self._file = self.path.open("a", encoding="utf-8")
+        self._synced_at = time.monotonic()
+        if self.records:
+            logger = logging.getLogger("spotify")
+            logger.info(f"Resuming from {len(self.records)} journaled tracks in {self.path}.")
+
+    def __enter__(self: Self) -> Self:
+        """Return the journal itself."""
+        return self
+
+    def __exit__(
+        self: "EnrichmentJournal",
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Flush the journal to disk and close it, keeping it for the next run."""
+        self.close()
+
+    def _load(self: "EnrichmentJournal") -> dict[str, dict[str, Any]]:
+        """Load the journaled records by track ID, dropping a line that was cut off by a crash."""
+        if not self.path.exists():
+            return {}
+        data = self.path.read_bytes()
+        complete = data[: data.rfind(b"\n") + 1]
+        # Truncate a partially written last line, so that appended lines start on a new line
+        if len(complete) < len(data):
+            with self.path.open("r+b") as f:
+                f.truncate(len(complete))
+        records = (json.loads(line) for line in complete.decode("utf-8").splitlines())
+        return {record["track_id"]: record for record in records}
+
+    def append(self: "EnrichmentJournal", df_enriched: "pd.DataFrame") -> None:
+        """Append enriched tracks to the journal, flushing it to disk when it is due."""
+        if df_enriched.empty:
+            return
+        lines = []
+        for record in to_json_records(df_enriched, JOURNAL_COLUMNS):
+            self.records[record["track_id"]] = record
+            lines.append(json.dumps(record, allow_nan=False) + "\n")
+        self._file.write("".join(lines))
+        self._file.flush()
+        if time.monotonic() - self._synced_at >= self.fsync_interval:
+            self.sync()
+
+    def sync(self: "EnrichmentJournal") -> None:
+        """Flush the journal to disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._synced_at = time.monotonic()
+
+    def resume(self: "EnrichmentJournal", df_playlist: "pd.DataFrame") -> "pd.DataFrame":
+        """Take the enrichment of tracks that are not yet enriched from the journal, if any."""
+        is_pending = ~df_playlist["enriched"].isin([True])
+        track_ids = df_playlist.loc[is_pending, "track_id"].drop_duplicates()
+        records = [self.records[track_id] for track_id in track_ids if track_id in self.records]
+        if not records:
+            return df_playlist
+        return apply_enrichment(df_playlist, pd.DataFrame(records, columns=JOURNAL_COLUMNS))
+
+    def enrich(
+        self: "EnrichmentJournal",
+        sp: Spotify,
+        df_playlist: "pd.DataFrame",
+        artists: dict[str, dict[str, Any]] | None = None,
+        map_batches: BatchMapper = map,
+    ) -> "pd.DataFrame":
+        """Enrich playlist stats (see `enrich_playlist_stats`), resuming from the journal.
+
+        Tracks that were journaled are not enriched again, and newly enriched tracks are appended
+        to the journal as soon as they are enriched.
+        """
+        df_playlist = self.resume(df_playlist)
+        to_enrich = df_playlist.loc[~df_playlist["enriched"].isin([True]), "track_id"]
+        df_enriched = enrich_playlist_stats(sp, df_playlist, artists, map_batches)
+        self.append(df_enriched[df_enriched["track_id"].isin(to_enrich)])
+        return df_enriched
+
+    def close(self: "EnrichmentJournal") -> None:
+        """Flush the journal to disk and close it."""
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def discard(self: "EnrichmentJournal") -> None:
+        """Close and remove the journal, once its tracks are part of the export."""
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -1,27 +1,24 @@
 """Main file for the spotify package."""
 
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-from utils import (
-    create_logger,
-    enrich_playlist_stats,
-    fetch_playlist_tracks,
-    initialize_playlist_stats,
-    load_credentials,
-    update_playlist_stats,
-)
+from typing import TYPE_CHECKING
+
+from cache import CachedSpotify, ResponseCache
+from engine import EnrichmentEngine, create_clients
+from metrics import METRICS_PATH, PROMETHEUS_PATH, InstrumentedSpotify, Metrics
+from storage import write_deduplicated_playlist_stats
+from store import TrackStore
+from sync import sync_playlist
+from utils import create_logger
+
+if TYPE_CHECKING:
+    from storage import FileFormat
 
 
 def main() -> None:
     """Extract song statistics from Spotify playlist."""
-    # Load credentials and authenticate with Spotify
-    credentials = load_credentials("spotify")  # "spotify" / "spotify-2" / "spotify-sandra"
-    print(credentials["SPOTIPY_CLIENT_ID"])
-    client_credentials_manager = SpotifyClientCredentials(
-        client_id=credentials["SPOTIPY_CLIENT_ID"],
-        client_secret=credentials["SPOTIPY_CLIENT_SECRET"],
-    )
-    sp = spotipy.Spotify(client_credentials_manager=client_credentials_manager)
+    # Load credentials and authenticate with Spotify, spreading requests across the credentials
+    sections = ["spotify"]  # sections in config.ini, e.g. ["spotify", "spotify-2"]
+    clients = create_clients(sections)
 
     # Playlist: Pallen 2023
     playlist_uri = "https://open.spotify.com/playlist/2flYqzsxSNSIHjCNCphCMw?si=6408cf90576944be"  # Pallen 2023
@@ -35,26 +32,51 @@ def main() -> None:
     # file_name = "playlist_stats_2023_tracks"
     # file_name = "playlist_stats_top_2000"
 
-    # Fetch playlist stats
-    logger.info("Fetching playlist tracks...")
-    tracks = fetch_playlist_tracks(sp, playlist_uri)
-    logger.info(f"Fetched {len(tracks)} tracks.")
+    # Set export format
+    file_format: FileFormat = "parquet"  # "parquet" / "csv"
+
+    # Set export without duplicate tracks (e.g. re-releases and remasters), which is optional
+    deduplicated_file_name: str | None = f"{file_name}_deduplicated"  # None to skip
 
-    # Initialize dataframe of playlist stats
-    logger.info("Initializing dataframe of playlist stats...")
-    df_playlist = initialize_playlist_stats(tracks)
-    logger.info(f"Initialized dataframe with {len(df_playlist)} tracks.")
+    # Set metrics export, the Prometheus text file being optional
+    prometheus_path: str | None = PROMETHEUS_PATH  # PROMETHEUS_PATH / None
 
-    # Update playlist stats with previously exported data
-    logger.info("Updating dataframe with previously loaded data...")
-    df_playlist = update_playlist_stats(df_playlist, file_name)
+    # Record the API calls and the time spent per stage
+    metrics = Metrics()
+    # Serve unchanged artists, audio features and users from the on-disk cache
+    cache = ResponseCache()
+    # Keep the playlist stats in the local track store, of which the export is a view
+    store = TrackStore()
+    instrumented_clients = [InstrumentedSpotify(sp, metrics) for sp in clients]
+    try:
+        with EnrichmentEngine(instrumented_clients, metrics=metrics, names=sections) as engine:
+            client = CachedSpotify(engine.client, cache)
+            n_tracks = sync_playlist(
+                client,
+                playlist_uri,
+                file_name,
+                file_format,
+                map_batches=engine.map,
+                metrics=metrics,
+                store=store,
+            )
+            logger.info(engine.report())
+            logger.info(f"Cache: {cache.report()}")
 
-    # Enrich playlist stats (e.g. audio features) - iterative -> slow
-    df_playlist = enrich_playlist_stats(sp, df_playlist)
+        # Export the playlist stats without duplicate tracks, when the playlist changed
+        if n_tracks is not None and deduplicated_file_name:
+            with metrics.stage("deduplicate"):
+                write_deduplicated_playlist_stats(file_name, deduplicated_file_name, file_format)
+    finally:
+        cache.close()
+        store.close()
 
-    # Export playlist stats
-    df_playlist.to_csv(f"./data/{file_name}.csv", index=False)
-    logger.info(f"Exported playlist stats to ./data/{file_name}.csv")
+        # Export the metrics of the run, also when it failed, to track its performance over time
+        metrics.record_cache(cache.hits, cache.misses)
+        metrics.write_json(METRICS_PATH)
+        if prometheus_path:
+            metrics.write_prometheus(prometheus_path)
+        logger.info(f"Metrics: {metrics.report()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,246 @@
+"""Per-endpoint instrumentation of the Spotify API calls and per-stage timings of a run."""
+
+import contextlib
+import functools
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+from spotipy.client import Spotify
+from spotipy.exceptions import SpotifyException
+
+# Location of the JSON summary of the last run
+METRICS_PATH = "./data/metrics.json"
+# Location of the Prometheus text file of the last run (e.g. for the node exporter)
+PROMETHEUS_PATH = "./data/metrics.prom"
+# Upper bounds (in seconds) of the latency histogram buckets, the last bucket being unbounded
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Counters that are recorded per endpoint
+ENDPOINT_COUNTERS = [
+    "calls",
+    "errors",
+    "rate_limited",
+    "retries",
+    "bytes_received",
+    "cache_hits",
+    "cache_misses",
+]
+
+
+class Metrics:
+    """Thread-safe registry of per-endpoint API metrics and per-stage wall time.
+
+    Per endpoint, the calls, errors, 429 responses, retries, bytes received and cache hits are
+    counted, and the latencies are recorded in a histogram. Stages are timed by the total time
+    spent in them, so overlapping stages (as in the streaming pipeline) may add up to more than
+    the wall time of the run.
+    """
+
+    def __init__(self: "Metrics") -> None:
+        """Initialize empty metrics, starting the clock of the run."""
+        self.counters: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        self.latency_buckets: defaultdict[str, list[int]] = defaultdict(
+            lambda: [0] * (len(LATENCY_BUCKETS) + 1)
+        )
+        self.latency_sum: defaultdict[str, float] = defaultdict(float)
+        self.latency_max: dict[str, float] = {}
+        self.stages: defaultdict[str, float] = defaultdict(float)
+        self._started_at = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record_call(
+        self: "Metrics",
+        endpoint: str,
+        seconds: float,
+        n_bytes: int = 0,
+        status: int | None = None,
+    ) -> None:
+        """Record a single API call, with its latency, response size and error status (if any)."""
+        bucket = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS)
+        )
+        with self._lock:
+            counters = self.counters[endpoint]
+            counters["calls"] += 1
+            counters["bytes_received"] += n_bytes
+            if status is not None:
+                counters["rate_limited" if status == 429 else "errors"] += 1  # noqa: PLR2004
+            self.latency_buckets[endpoint][bucket] += 1
+            self.latency_sum[endpoint] += seconds
+            self.latency_max[endpoint] = max(self.latency_max.get(endpoint, 0.0), seconds)
+
+    def record_retry(self: "Metrics", endpoint: str) -> None:
+        """Record that a call to an endpoint is retried."""
+        with self._lock:
+            self.counters[endpoint]["retries"] += 1
+
+    def record_cache(self: "Metrics", hits: Counter[str], misses: Counter[str]) -> None:
+        """Record the cache hits and misses per endpoint (e.g. of a `ResponseCache`)."""
+        with self._lock:
+            for endpoint in hits | misses:
+                self.counters[endpoint]["cache_hits"] += hits[endpoint]
+                self.counters[endpoint]["cache_misses"] += misses[endpoint]
+
+    @contextlib.contextmanager
+    def stage(self: "Metrics", name: str) -> Iterator[None]:
+        """Add the time spent in the context to the wall time of a stage."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[name] += time.perf_counter() - started_at
+
+    def time_iter(self: "Metrics", name: str, items: Iterable[Any]) -> Iterator[Any]:
+        """Yield the items, adding the time spent producing them to the wall time of a stage."""
+        iterator = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def time_consumer(self: "Metrics", name: str, items: Iterable[Any]) -> Iterator[Any]:
+        """Yield the items, adding the time spent consuming them to the wall time of a stage."""
+        for item in items:
+            with self.stage(name):
+                yield item
+
+    def summary(self: "Metrics") -> dict[str, Any]:
+        """Summarize the metrics of the run."""
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    **{counter: self.counters[endpoint][counter] for counter in ENDPOINT_COUNTERS},
+                    "latency": self._summarize_latency(endpoint),
+                }
+                for endpoint in sorted(self.counters)
+            }
+            return {
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "seconds": time.perf_counter() - self._started_at,
+                "calls": sum(counters["calls"] for counters in self.counters.values()),
+                "stages": dict(self.stages),
+                "endpoints": endpoints,
+            }
+
+    def _summarize_latency(self: "Metrics", endpoint: str) -> dict[str, Any]:
+        """Summarize the latencies of an endpoint, with the cumulative counts of the histogram."""
+        buckets = self.latency_buckets[endpoint]
+        n_calls = sum(buckets)
+        cumulative = [sum(buckets[: i + 1]) for i in range(len(buckets))]
+        return {
+            "mean": self.latency_sum[endpoint] / n_calls if n_calls else None,
+            "max": self.latency_max.get(endpoint),
+            "sum": self.latency_sum[endpoint],
+            "buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], cumulative, strict=True)),
+        }
+
+    def report(self: "Metrics") -> str:
+        """Summarize the calls and wall time per stage in a single line."""
+        summary = self.summary()
+        stages = ", ".join(
+            f"{stage} {seconds:.1f}s" for stage, seconds in summary["stages"].items()
+        )
+        return f"{summary['calls']} API calls in {summary['seconds']:.1f}s ({stages})."
+
+    def write_json(self: "Metrics", path: str | Path = METRICS_PATH) -> None:
+        """Write the summary of the run as JSON."""
+        write_atomic(path, json.dumps(self.summary(), indent=2))
+
+    def write_prometheus(self: "Metrics", path: str | Path = PROMETHEUS_PATH) -> None:
+        """Write the metrics of the run in the Prometheus text format."""
+        write_atomic(path, format_prometheus(self.summary()))
+
+
+def format_prometheus(summary: dict[str, Any]) -> str:
+    """Format the summary of a run in the Prometheus text exposition format."""
+    lines = [
+        "# HELP spotify_run_seconds Wall time of the run.",
+        "# TYPE spotify_run_seconds gauge",
+        f"spotify_run_seconds {summary['seconds']}",
+        "# HELP spotify_stage_seconds Time spent per stage of the run.",
+        "# TYPE spotify_stage_seconds gauge",
+        *(
+            f'spotify_stage_seconds{{stage="{stage}"}} {seconds}'
+            for stage, seconds in summary["stages"].items()
+        ),
+    ]
+    endpoints = summary["endpoints"]
+    for counter in ENDPOINT_COUNTERS:
+        lines += [
+            f"# HELP spotify_api_{counter}_total Number of {counter.replace('_', ' ')} per endpoint.",
+            f"# TYPE spotify_api_{counter}_total counter",
+            *(
+                f'spotify_api_{counter}_total{{endpoint="{endpoint}"}} {metrics[counter]}'
+                for endpoint, metrics in endpoints.items()
+            ),
+        ]
+    lines += [
+        "# HELP spotify_api_latency_seconds Latency of the calls per endpoint.",
+        "# TYPE spotify_api_latency_seconds histogram",
+    ]
+    for endpoint, metrics in endpoints.items():
+        latency = metrics["latency"]
+        lines += [
+            *(
+                f'spotify_api_latency_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}'
+                for bound, count in latency["buckets"].items()
+            ),
+            f'spotify_api_latency_seconds_sum{{endpoint="{endpoint}"}} {latency["sum"]}',
+            f'spotify_api_latency_seconds_count{{endpoint="{endpoint}"}} {metrics["calls"]}',
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def write_atomic(path: str | Path, text: str) -> None:
+    """Write a file at once, so a collector never reads a partially written file."""
+    path = Path(path)
+    path_tmp = path.with_suffix(f"{path.suffix}.tmp")
+    path_tmp.write_text(text)
+    path_tmp.replace(path)
+
+
+class InstrumentedSpotify:
+    """Wrapper around the Spotify client that records the metrics of every API call.
+
+    The size of a response is measured as the size of its JSON encoding, since the client only
+    returns the decoded response.
+    """
+
+    def __init__(self: "InstrumentedSpotify", sp: Spotify, metrics: Metrics) -> None:
+        """Initialize the wrapper."""
+        self.sp = sp
+        self.metrics = metrics
+
+    def __getattr__(self: "InstrumentedSpotify", name: str) -> Any:  # noqa: ANN401
+        """Wrap the API methods of the Spotify client."""
+        attribute = getattr(self.sp, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def call(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            """Call the API method, recording its latency, response size and errors."""
+            started_at = time.perf_counter()
+            try:
+                response = attribute(*args, **kwargs)
+            except SpotifyException as e:
+                self.metrics.record_call(
+                    name, time.perf_counter() - started_at, status=e.http_status
+                )
+                raise
+            except Exception:
+                self.metrics.record_call(name, time.perf_counter() - started_at, status=-1)
+                raise
+            seconds = time.perf_counter() - started_at
+            self.metrics.record_call(name, seconds, len(json.dumps(response).encode()))
+            return response
+
+        return call
@@ -0,0 +1,126 @@
+"""Streaming pipeline that fetches, parses, and enriches a playlist page by page."""
+
+import logging
+import queue
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from typing import TYPE_CHECKING, Any
+
+from metrics import Metrics
+from spotipy.client import Spotify
+from utils import (
+    PLAYLIST_TRACK_FIELDS,
+    BatchMapper,
+    enrich_playlist_stats,
+    initialize_playlist_stats,
+    iter_playlist_pages,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from journal import EnrichmentJournal
+    from store import TrackStore
+
+# Maximum number of pages waiting between two stages of the pipeline
+QUEUE_DEPTH = 2
+# Seconds a stage waits on a full queue before checking whether the consumer has stopped
+PUT_TIMEOUT = 0.1
+
+
+class _EndOfStream:
+    """Marker put on a queue once a stage is done, carrying its exception (if any)."""
+
+    def __init__(self: "_EndOfStream", error: BaseException | None = None) -> None:
+        self.error = error
+
+
+def _put(stage_queue: "queue.Queue[Any]", item: Any, stopped: threading.Event) -> bool:  # noqa: ANN401
+    """Put an item on the queue, blocking while the queue is full, unless the stage is stopped."""
+    while not stopped.is_set():
+        try:
+            stage_queue.put(item, timeout=PUT_TIMEOUT)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+def run_stage(source: Callable[[], Iterable[Any]], queue_depth: int = QUEUE_DEPTH) -> Iterator[Any]:
+    """Run a pipeline stage in a background thread, yielding its output via a bounded queue.
+
+    If the consumer stops early (on an exception, or by abandoning the generator), the stage is
+    stopped as well, so its thread exits and releases the items it holds.
+    """
+    stage_queue: queue.Queue[Any] = queue.Queue(maxsize=queue_depth)
+    stopped = threading.Event()
+
+    def produce() -> None:
+        """Put the output of the stage on the queue, until exhausted or stopped."""
+        try:
+            for item in source():
+                if not _put(stage_queue, item, stopped):
+                    return
+        except BaseException as e:  # noqa: BLE001
+            _put(stage_queue, _EndOfStream(e), stopped)
+        else:
+            _put(stage_queue, _EndOfStream(), stopped)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while not isinstance(item := stage_queue.get(), _EndOfStream):
+            yield item
+    finally:
+        stopped.set()
+    # Propagate exceptions of the stage to the consumer
+    if item.error:
+        raise item.error
+
+
+def stream_playlist_stats(  # noqa: PLR0913
+    sp: Spotify,
+    playlist_uri: str,
+    queue_depth: int = QUEUE_DEPTH,
+    map_batches: BatchMapper = map,
+    metrics: Metrics | None = None,
+    journal: "EnrichmentJournal | None" = None,
+    store: "TrackStore | None" = None,
+) -> "Iterator[pd.DataFrame]":
+    """Yield enriched playlist stats page by page, overlapping fetching, parsing and enriching.
+
+    Pages are fetched and parsed in background threads while the previous page is being enriched,
+    so at most `queue_depth` pages are waiting between two stages at any time. The pages, and the
+    batches of artists and audio features of a page, are fetched with `map_batches`. The time
+    spent in each stage is recorded in `metrics`, if given. With a `journal`, pages resume from
+    the tracks journaled by an interrupted run, and are journaled as soon as they are enriched.
+    With a `store`, pages are also updated with the enrichment of the tracks in the store.
+    """
+    logger = logging.getLogger("spotify")
+    metrics = Metrics() if metrics is None else metrics
+    enrich = enrich_playlist_stats if journal is None else journal.enrich
+    # Stage 1: fetch pages of playlist tracks
+    pages = run_stage(
+        lambda: metrics.time_iter(
+            "fetch", iter_playlist_pages(sp, playlist_uri, PLAYLIST_TRACK_FIELDS, map_batches)
+        ),
+        queue_depth,
+    )
+
+    def parse_pages() -> "Iterator[pd.DataFrame]":
+        """Parse pages and update them with the enrichment of the tracks in the store."""
+        for page in pages:
+            with metrics.stage("parse"):
+                df_page = initialize_playlist_stats(page)
+            if store is not None:
+                with metrics.stage("merge"):
+                    df_page = store.merge(df_page)
+            yield df_page
+
+    # Stage 2: parse pages and update them with the enrichment of the tracks in the store
+    frames = run_stage(parse_pages, queue_depth)
+    # Stage 3: enrich pages, sharing the fetched artists across pages
+    artists: dict[str, dict[str, Any]] = {}
+    for i, df_page in enumerate(frames, 1):
+        logger.info(f"Enriching page {i} ({len(df_page)} tracks)...")
+        with metrics.stage("enrich"):
+            df_enriched = enrich(sp, df_page, artists, map_batches)
+        yield df_enriched
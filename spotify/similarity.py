@@ -0,0 +1,175 @@
+"""Nearest-neighbour index of tracks over their audio features."""
+
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Self
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+# Location of the persisted similarity index
+SIMILARITY_INDEX_PATH = "./data/similarity_index.npz"
+# Audio features that describe the sound of a track (leaving out key, mode and time signature)
+SIMILARITY_FEATURES = [
+    "danceability",
+    "energy",
+    "loudness",
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "valence",
+    "tempo",
+]
+# Attributes of the tracks that are returned along with their similarity
+TRACK_ATTRIBUTES = ["track_id", "name", "artist", "added_by"]
+# Number of queries whose similarities are computed at once, bounding the memory use
+QUERY_BATCH_SIZE = 128
+
+
+class SimilarityIndex:
+    """Index of tracks as normalized float32 feature vectors, queried by cosine similarity.
+
+    Features are standardized and the vectors scaled to unit length, so the similarities of a
+    batch of queries to all tracks are a single matrix product.
+    """
+
+    def __init__(
+        self: "SimilarityIndex",
+        features: npt.NDArray[np.float32],
+        tracks: pd.DataFrame,
+        mean: npt.NDArray[np.float32],
+        std: npt.NDArray[np.float32],
+    ) -> None:
+        """Initialize the index from its normalized feature matrix and track attributes."""
+        self.features = features
+        self.tracks = tracks.reset_index(drop=True)
+        self.mean = mean
+        self.std = std
+        self._positions = {track_id: i for i, track_id in enumerate(self.tracks["track_id"])}
+
+    def __len__(self: "SimilarityIndex") -> int:
+        """Return the number of tracks in the index."""
+        return len(self.tracks)
+
+    @classmethod
+    def from_playlist_stats(cls: type[Self], frames: pd.DataFrame | Iterable[pd.DataFrame]) -> Self:
+        """Build the index from the enriched stats of one or more playlists."""
+        frames = [frames] if isinstance(frames, pd.DataFrame) else list(frames)
+        df_stats = pd.concat(frames, ignore_index=True)
+        if "added_by" not in df_stats:
+            df_stats["added_by"] = df_stats.get("added_by_id")
+        # Skip tracks without audio features, and tracks that are in multiple playlists
+        df_stats = df_stats.dropna(subset=SIMILARITY_FEATURES).drop_duplicates(subset=["track_id"])
+        features = df_stats[SIMILARITY_FEATURES].to_numpy(dtype=np.float32)
+        mean = features.mean(axis=0)
+        std = features.std(axis=0)
+        std[std == 0] = 1
+        return cls(normalize(features, mean, std), df_stats[TRACK_ATTRIBUTES], mean, std)
+
+    def save(self: "SimilarityIndex", path: str | Path = SIMILARITY_INDEX_PATH) -> None:
+        """Persist the index, so it does not have to be rebuilt."""
+        np.savez(
+            path,
+            features=self.features,
+            mean=self.mean,
+            std=self.std,
+            **{column: self.tracks[column].to_numpy(dtype=str) for column in TRACK_ATTRIBUTES},
+        )
+
+    @classmethod
+    def load(cls: type[Self], path: str | Path = SIMILARITY_INDEX_PATH) -> Self:
+        """Load a persisted index."""
+        with np.load(path) as index:
+            tracks = pd.DataFrame({column: index[column] for column in TRACK_ATTRIBUTES})
+            return cls(index["features"], tracks, index["mean"], index["std"])
+
+    def query(
+        self: "SimilarityIndex",
+        track_ids: str | list[str],
+        k: int = 10,
+        other_contributor: bool = False,
+    ) -> pd.DataFrame:
+        """Find the `k` most similar tracks of each queried track, in a batched, vectorized search.
+
+        With `other_contributor`, only tracks added by someone other than whoever added the
+        queried track are returned. Returns one row per queried track and neighbour.
+        """
+        track_ids = [track_ids] if isinstance(track_ids, str) else track_ids
+        positions = np.array([self._positions[track_id] for track_id in track_ids], dtype=np.int64)
+        added_by = self.tracks["added_by"].to_numpy()
+        results = []
+        for batch in np.array_split(positions, -(-len(positions) // QUERY_BATCH_SIZE) or 1):
+            similarities = self.features[batch] @ self.features.T
+            # Exclude the queried tracks themselves (and tracks added by the same contributor)
+            similarities[np.arange(len(batch)), batch] = -np.inf
+            if other_contributor:
+                similarities[added_by[batch][:, None] == added_by[None, :]] = -np.inf
+            results.append(top_k(similarities, k, batch))
+        return self._format_results(np.concatenate(results))
+
+    def query_features(
+        self: "SimilarityIndex", df_stats: pd.DataFrame, k: int = 10
+    ) -> pd.DataFrame:
+        """Find the `k` most similar indexed tracks of tracks that need not be in the index."""
+        queries = normalize(
+            df_stats[SIMILARITY_FEATURES].to_numpy(dtype=np.float32), self.mean, self.std
+        )
+        results = []
+        for start in range(0, len(queries), QUERY_BATCH_SIZE):
+            batch = np.arange(start, min(start + QUERY_BATCH_SIZE, len(queries)))
+            results.append(top_k(queries[batch] @ self.features.T, k, batch))
+        df_results = self._format_results(np.concatenate(results), query_positions=False)
+        query_track_ids = df_stats["track_id"].to_numpy()
+        return df_results.assign(query_track_id=query_track_ids[df_results["query_track_id"]])
+
+    def _format_results(
+        self: "SimilarityIndex", results: npt.NDArray[np.float64], query_positions: bool = True
+    ) -> pd.DataFrame:
+        """Format the (query, rank, neighbour, similarity) rows of a search as a dataframe."""
+        queries = results[:, 0].astype(np.int64)
+        neighbours = results[:, 2].astype(np.int64)
+        df_results = self.tracks.iloc[neighbours].reset_index(drop=True)
+        df_results.insert(
+            0,
+            "query_track_id",
+            self.tracks["track_id"].to_numpy()[queries] if query_positions else queries,
+        )
+        df_results.insert(1, "rank", results[:, 1].astype(np.int64))
+        df_results["similarity"] = results[:, 3]
+        # Drop neighbours that were excluded, when fewer than `k` tracks were left
+        return df_results[np.isfinite(df_results["similarity"])].reset_index(drop=True)
+
+
+def normalize(
+    features: npt.NDArray[np.float32], mean: npt.NDArray[np.float32], std: npt.NDArray[np.float32]
+) -> npt.NDArray[np.float32]:
+    """Standardize the features, and scale the feature vector of each track to unit length."""
+    standardized = (features - mean) / std
+    norms = np.linalg.norm(standardized, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    normalized: npt.NDArray[np.float32] = (standardized / norms).astype(np.float32)
+    return normalized
+
+
+def top_k(
+    similarities: npt.NDArray[np.float32], k: int, queries: npt.NDArray[np.int64]
+) -> npt.NDArray[np.float64]:
+    """Select the `k` most similar tracks per row, as (query, rank, neighbour, similarity) rows."""
+    k = min(k, similarities.shape[1])
+    # Partially sort each row to find the top k, then sort only those
+    neighbours = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    top_similarities = np.take_along_axis(similarities, neighbours, axis=1)
+    order = np.argsort(-top_similarities, axis=1, kind="stable")
+    neighbours = np.take_along_axis(neighbours, order, axis=1)
+    top_similarities = np.take_along_axis(top_similarities, order, axis=1)
+    ranks = np.broadcast_to(np.arange(1, k + 1), neighbours.shape)
+    return np.column_stack(
+        [
+            np.repeat(queries, k),
+            ranks.ravel(),
+            neighbours.ravel(),
+            top_similarities.ravel(),
+        ]
+    ).astype(np.float64)
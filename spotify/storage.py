@@ -0,0 +1,199 @@
+"""Storage of playlist stats as Parquet (Arrow) files, with native list columns.
+
+Run from the root of the repository to convert the existing CSV exports in `data/` to Parquet:
+
+    python spotify/storage.py
+"""
+
+import ast
+import functools
+import logging
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
+
+from utils import (
+    AUDIO_FEATURES,
+    PLAYLIST_STATS_COLUMNS,
+    LazyModule,
+    create_logger,
+    drop_duplicate_tracks,
+    export_playlist_stats,
+    get_extra_columns,
+    load_playlist_stats,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+else:
+    pd = LazyModule("pandas")
+    pa = LazyModule("pyarrow")
+    pq = LazyModule("pyarrow.parquet")
+
+# Formats in which playlist stats can be stored
+FileFormat = Literal["parquet", "csv"]
+# Default format in which playlist stats are stored
+FILE_FORMAT: FileFormat = "parquet"
+# Columns holding a list (of lists) per track, stored as their string representation in CSV
+LIST_COLUMNS = ["artist_uris", "artist_names", "artists_genres", "artists_popularities"]
+
+
+@functools.cache
+def playlist_stats_schema() -> "pa.Schema":
+    """Get the Arrow schema of the playlist stats."""
+    return pa.schema(
+        [
+            ("name", pa.string()),
+            ("artist", pa.string()),
+            ("album", pa.string()),
+            ("album_type", pa.string()),
+            ("release_date", pa.string()),
+            ("duration", pa.string()),
+            ("duration_ms", pa.int64()),
+            ("added_at", pa.timestamp("ns", tz="UTC")),
+            ("added_by_id", pa.string()),
+            ("track_popularity", pa.int64()),
+            ("track_id", pa.string()),
+            ("track_uri", pa.string()),
+            ("isrc", pa.string()),
+            ("artist_uris", pa.list_(pa.string())),
+            ("artist_names", pa.list_(pa.string())),
+            ("enriched", pa.bool_()),
+            *[(audio_feature, pa.float64()) for audio_feature in AUDIO_FEATURES],
+            ("artists_genres", pa.list_(pa.list_(pa.string()))),
+            ("artists_popularities", pa.list_(pa.int64())),
+            ("artists_avg_popularity", pa.float64()),
+        ]
+    )
+
+
+def parse_list_columns(df_stats: "pd.DataFrame") -> "pd.DataFrame":
+    """Parse the string representation of list columns (as loaded from CSV) to lists."""
+    df_stats = df_stats.copy()
+    for column in LIST_COLUMNS:
+        if column in df_stats:
+            df_stats[column] = df_stats[column].apply(
+                lambda x: ast.literal_eval(x) if isinstance(x, str) else x
+            )
+    return df_stats
+
+
+def to_arrow(df_stats: "pd.DataFrame") -> "pa.Table":
+    """Convert playlist stats to an Arrow table, keeping columns beyond the known schema."""
+    df_stats = parse_list_columns(df_stats)
+    # Coerce columns whose dtype may have been inferred otherwise when loaded from CSV (e.g. IDs)
+    for field in playlist_stats_schema():
+        if field.type == pa.string() and field.name in df_stats:
+            df_stats[field.name] = df_stats[field.name].astype("string")
+    df_stats["added_at"] = pd.to_datetime(df_stats["added_at"], utc=True)
+    df_stats["enriched"] = df_stats["enriched"].isin([True])
+    table = pa.Table.from_pandas(
+        df_stats.reindex(columns=PLAYLIST_STATS_COLUMNS),
+        schema=playlist_stats_schema(),
+        preserve_index=False,
+    )
+    for column in get_extra_columns(df_stats):
+        array = pa.array(df_stats[column], from_pandas=True)
+        # Store extra columns without any values as strings, rather than as nulls
+        table = table.append_column(
+            column, array.cast(pa.string()) if array.null_count == len(array) else array
+        )
+    return table
+
+
+def read_playlist_stats(
+    file_name: str, columns: list[str] | None = None, file_format: FileFormat = FILE_FORMAT
+) -> "pd.DataFrame | None":
+    """Load previously exported playlist stats, if any, reading only the given columns.
+
+    Parquet exports are read with native list columns. Without a Parquet export (or when
+    `file_format` is "csv"), the CSV export is read and its list columns are parsed.
+    """
+    path = Path(f"./data/{file_name}.parquet")
+    if file_format == "parquet" and path.exists():
+        table = pq.read_table(path, columns=columns)
+        df_stats = table.to_pandas()
+        # Convert list columns to Python lists (instead of NumPy arrays), as parsed from CSV
+        for column in LIST_COLUMNS:
+            if column in df_stats:
+                df_stats[column] = table.column(column).to_pylist()
+        if "track_id" in df_stats:
+            df_stats = df_stats.drop_duplicates(subset=["track_id"])
+        return df_stats
+    df_stats = load_playlist_stats(file_name)
+    if df_stats is None:
+        return None
+    return parse_list_columns(df_stats if columns is None else df_stats[columns])
+
+
+def write_playlist_stats(
+    frames: "Iterable[pd.DataFrame]", file_name: str, file_format: FileFormat = FILE_FORMAT
+) -> int:
+    """Export playlist stats chunk by chunk, replacing the previous export when done."""
+    if file_format == "csv":
+        return int(export_playlist_stats(frames, file_name))
+    path = Path(f"./data/{file_name}.parquet")
+    path_tmp = path.with_suffix(".parquet.tmp")
+    n_tracks = 0
+    columns = PLAYLIST_STATS_COLUMNS
+    writer = None
+    try:
+        for i, df_chunk in enumerate(frames):
+            # Align columns with the first chunk, since chunks may lack columns (e.g. when no track
+            # was enriched), keeping its extra columns
+            if i == 0:
+                columns = [*PLAYLIST_STATS_COLUMNS, *get_extra_columns(df_chunk)]
+            table = to_arrow(df_chunk.reindex(columns=columns))
+            if writer is None:
+                writer = pq.ParquetWriter(path_tmp, table.schema.remove_metadata())
+            writer.write_table(table.cast(writer.schema))
+            n_tracks += len(df_chunk)
+        if writer is None:
+            writer = pq.ParquetWriter(path_tmp, playlist_stats_schema())
+    finally:
+        if writer is not None:
+            writer.close()
+    # Flush the export to disk before it replaces the previous export
+    with path_tmp.open("rb") as f:
+        os.fsync(f.fileno())
+    path_tmp.replace(path)
+    return n_tracks
+
+
+def write_deduplicated_playlist_stats(
+    file_name: str, deduplicated_file_name: str, file_format: FileFormat = FILE_FORMAT
+) -> int:
+    """Export the playlist stats without duplicate tracks (see `drop_duplicate_tracks`)."""
+    df_stats = read_playlist_stats(file_name, file_format=file_format)
+    if df_stats is None:
+        return 0
+    return write_playlist_stats(
+        [drop_duplicate_tracks(df_stats)], deduplicated_file_name, file_format
+    )
+
+
+def convert_csv_to_parquet(path: Path) -> None:
+    """Convert a CSV export of playlist stats to Parquet, next to the CSV file."""
+    df_stats = pd.read_csv(path)
+    pq.write_table(to_arrow(df_stats), path.with_suffix(".parquet"))
+
+
+def main() -> None:
+    """Convert all CSV exports of playlist stats in `data/` to Parquet."""
+    logger = logging.getLogger("spotify")
+    for path in sorted(Path("./data").glob("playlist_stats*.csv")):
+        try:
+            convert_csv_to_parquet(path)
+        except KeyError as e:
+            logger.warning(f"Skipped {path}, since it is not an export of playlist stats: {e}")
+            continue
+        logger.info(f"Converted {path} to {path.with_suffix('.parquet')}")
+
+
+if __name__ == "__main__":
+    create_logger("spotify")
+    main()
@@ -0,0 +1,262 @@
+"""Local store of playlist stats keyed by track ID, serving the datasets of multiple playlists.
+
+The exports (CSV or Parquet) are views of the store. Run from the root of the repository to
+import the existing exports in `data/` into the store:
+
+    python spotify/store.py
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from storage import read_playlist_stats
+from utils import (
+    ARTIST_DETAILS,
+    AUDIO_FEATURES,
+    PLAYLIST_STATS_COLUMNS,
+    TRACK_COLUMNS,
+    LazyModule,
+    apply_enrichment,
+    create_logger,
+    get_extra_columns,
+    split_batches,
+    to_json_records,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+else:
+    pd = LazyModule("pandas")
+
+# Location of the store database
+STORE_PATH = "./data/tracks.sqlite"
+# Columns of the playlist stats that are stored per track, and shared by all datasets
+ENRICHMENT_COLUMNS = [*AUDIO_FEATURES, *ARTIST_DETAILS]
+# Columns of the playlist stats that are stored per track of a dataset, besides any extra columns
+# of the dataset (e.g. `added_by`)
+DATASET_TRACK_COLUMNS = [column for column in TRACK_COLUMNS if column != "enriched"]
+# Maximum number of track IDs per lookup
+LOOKUP_BATCH_SIZE = 500
+
+
+class TrackStore:
+    """SQLite store of playlist stats, with upserts keyed by (dataset and) track ID.
+
+    The enrichment of a track (audio features and artist details) is stored once, and shared by
+    all datasets (i.e. playlists) holding the track. Extra columns of a dataset (e.g. `added_by`)
+    are kept with its tracks, also when the tracks are updated without them. The order of the
+    tracks of a dataset is set with `retain`. Each row carries the time at which it was last
+    changed.
+    """
+
+    def __init__(self: "TrackStore", path: str | Path = STORE_PATH) -> None:
+        """Open (or create) the store database."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tracks (
+                track_id TEXT PRIMARY KEY,
+                enrichment TEXT NOT NULL,
+                enriched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dataset_tracks (
+                dataset TEXT NOT NULL,
+                track_id TEXT NOT NULL,
+                position INTEGER,
+                track TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (dataset, track_id)
+            );
+            CREATE INDEX IF NOT EXISTS dataset_tracks_position
+                ON dataset_tracks (dataset, position);
+            CREATE TEMP TABLE retained (track_id TEXT PRIMARY KEY, position INTEGER NOT NULL);
+            """
+        )
+        self._lock = threading.Lock()
+
+    def datasets(self: "TrackStore") -> list[str]:
+        """List the datasets in the store."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT DISTINCT dataset FROM dataset_tracks ORDER BY dataset"
+            ).fetchall()
+        return [dataset for (dataset,) in rows]
+
+    def has_dataset(self: "TrackStore", dataset: str) -> bool:
+        """Check whether the store holds tracks of a dataset."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM dataset_tracks WHERE dataset = ? LIMIT 1", [dataset]
+            ).fetchone()
+        return row is not None
+
+    def track_ids(self: "TrackStore", dataset: str) -> list[str]:
+        """Get the track IDs of a dataset, in order."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT track_id FROM dataset_tracks WHERE dataset = ? ORDER BY position",
+                [dataset],
+            ).fetchall()
+        return [track_id for (track_id,) in rows]
+
+    def upsert(self: "TrackStore", dataset: str, df_playlist: "pd.DataFrame") -> None:
+        """Insert or update the tracks of a dataset, and the enrichment of the enriched tracks."""
+        now = time.time()
+        df_playlist = df_playlist.drop_duplicates(subset=["track_id"])
+        df_playlist = df_playlist.assign(
+            track_id=df_playlist["track_id"].astype(str),
+            added_at=pd.to_datetime(df_playlist["added_at"], utc=True).astype(str),
+        )
+        tracks = to_json_records(
+            df_playlist, [*DATASET_TRACK_COLUMNS, *get_extra_columns(df_playlist)]
+        )
+        is_enriched = df_playlist["enriched"].isin([True]).tolist()
+        enrichments = to_json_records(df_playlist, ENRICHMENT_COLUMNS)
+        with self._lock:
+            # Patch the stored tracks, keeping the columns that are not updated, and only update the
+            # time of rows that changed
+            self._connection.executemany(
+                """
+                INSERT INTO dataset_tracks (dataset, track_id, track, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (dataset, track_id) DO UPDATE
+                SET track = json_patch(track, excluded.track), updated_at = excluded.updated_at
+                WHERE json(track) IS NOT json_patch(track, excluded.track)
+                """,
+                [(dataset, track.pop("track_id"), json.dumps(track), now) for track in tracks],
+            )
+            self._connection.executemany(
+                """
+                INSERT INTO tracks VALUES (?, ?, ?)
+                ON CONFLICT (track_id) DO UPDATE
+                SET enrichment = excluded.enrichment, enriched_at = excluded.enriched_at
+                WHERE enrichment IS NOT excluded.enrichment
+                """,
+                [
+                    (track_id, json.dumps(enrichment, allow_nan=False), now)
+                    for track_id, enrichment, enriched in zip(
+                        df_playlist["track_id"], enrichments, is_enriched, strict=True
+                    )
+                    if enriched
+                ],
+            )
+            self._connection.commit()
+
+    def retain(self: "TrackStore", dataset: str, track_ids: Iterable[str]) -> None:
+        """Keep only the given tracks of a dataset, in the given order."""
+        with self._lock:
+            self._connection.execute("DELETE FROM retained")
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO retained VALUES (?, ?)",
+                [(track_id, position) for position, track_id in enumerate(track_ids)],
+            )
+            self._connection.execute(
+                "DELETE FROM dataset_tracks "
+                "WHERE dataset = ? AND track_id NOT IN (SELECT track_id FROM retained)",
+                [dataset],
+            )
+            self._connection.execute(
+                """
+                UPDATE dataset_tracks SET position = retained.position
+                FROM retained
+                WHERE dataset_tracks.dataset = ? AND dataset_tracks.track_id = retained.track_id
+                """,
+                [dataset],
+            )
+            self._connection.commit()
+
+    def replace(self: "TrackStore", dataset: str, df_playlist: "pd.DataFrame") -> None:
+        """Replace the tracks of a dataset by the given playlist stats."""
+        self.upsert(dataset, df_playlist)
+        self.retain(dataset, df_playlist["track_id"].astype(str))
+
+    def merge(self: "TrackStore", df_playlist: "pd.DataFrame") -> "pd.DataFrame":
+        """Update the tracks that are not yet enriched with their stored enrichment, if any."""
+        is_pending = ~df_playlist["enriched"].isin([True])
+        track_ids = df_playlist.loc[is_pending, "track_id"].drop_duplicates().tolist()
+        records: list[dict[str, Any]] = []
+        with self._lock:
+            for batch in split_batches(track_ids, LOOKUP_BATCH_SIZE):
+                placeholders = ", ".join("?" * len(batch))
+                rows = self._connection.execute(
+                    "SELECT track_id, enrichment FROM tracks "  # noqa: S608
+                    f"WHERE track_id IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                records.extend(
+                    {"track_id": track_id, "enriched": True, **json.loads(enrichment)}
+                    for track_id, enrichment in rows
+                )
+        if not records:
+            return df_playlist
+        return apply_enrichment(df_playlist, pd.DataFrame(records))
+
+    def read(self: "TrackStore", dataset: str) -> "pd.DataFrame | None":
+        """Read the playlist stats of a dataset, in order, if any."""
+        df_stats = self._select(dataset)
+        return None if df_stats.empty else df_stats
+
+    def pending(self: "TrackStore", dataset: str) -> "pd.DataFrame":
+        """Read the tracks of a dataset that still need to be enriched, in order."""
+        return self._select(dataset, pending=True)
+
+    def _select(self: "TrackStore", dataset: str, pending: bool = False) -> "pd.DataFrame":
+        """Select the playlist stats of (the tracks that are not yet enriched of) a dataset."""
+        query = (
+            "SELECT dataset_tracks.track_id, track, enrichment FROM dataset_tracks "
+            "LEFT JOIN tracks ON tracks.track_id = dataset_tracks.track_id "
+            "WHERE dataset = ?"
+        )
+        if pending:
+            query += " AND enrichment IS NULL"
+        with self._lock:
+            rows = self._connection.execute(f"{query} ORDER BY position", [dataset]).fetchall()
+        records = [
+            {
+                **json.loads(track),
+                "track_id": track_id,
+                "enriched": enrichment is not None,
+                **(json.loads(enrichment) if enrichment is not None else {}),
+            }
+            for track_id, track, enrichment in rows
+        ]
+        # Keep the extra columns of the dataset, in the order in which they were stored
+        known_columns = set(PLAYLIST_STATS_COLUMNS)
+        extra_columns = dict.fromkeys(
+            column for record in records for column in record if column not in known_columns
+        )
+        df_stats = pd.DataFrame(records, columns=[*PLAYLIST_STATS_COLUMNS, *extra_columns])
+        df_stats["added_at"] = pd.to_datetime(df_stats["added_at"], utc=True)
+        return df_stats
+
+    def close(self: "TrackStore") -> None:
+        """Close the store database."""
+        self._connection.close()
+
+
+def main() -> None:
+    """Import all exports of playlist stats in `data/` into the store, as one dataset each."""
+    logger = logging.getLogger("spotify")
+    store = TrackStore()
+    for path in sorted(Path("./data").glob("playlist_stats*.csv")):
+        try:
+            df_stats = read_playlist_stats(path.stem, file_format="csv")
+            if df_stats is not None:
+                store.replace(path.stem, df_stats)
+        except KeyError as e:
+            logger.warning(f"Skipped {path}, since it is not an export of playlist stats: {e}")
+            continue
+        logger.info(f"Imported {path} into {STORE_PATH}")
+    store.close()
+
+
+if __name__ == "__main__":
+    create_logger("spotify")
+    main()
@@ -0,0 +1,262 @@
+"""Incremental synchronization of playlist stats, based on the snapshot ID of the playlist."""
+
+import json
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from journal import EnrichmentJournal
+from metrics import Metrics
+from pipeline import stream_playlist_stats
+from spotipy.client import Spotify
+from storage import FILE_FORMAT, FileFormat, read_playlist_stats, write_playlist_stats
+from store import TrackStore
+from utils import (
+    PLAYLIST_PAGE_SIZE,
+    PLAYLIST_TRACK_FIELDS,
+    BatchMapper,
+    LazyModule,
+    initialize_playlist_stats,
+    iter_playlist_pages,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+else:
+    pd = LazyModule("pandas")
+
+# Attributes of the playlist tracks that are needed to detect new and removed tracks
+PLAYLIST_TRACK_ID_FIELDS = "total,items(added_at,track(id))"
+
+
+def load_sync_state(file_name: str) -> dict[str, Any] | None:
+    """Load the snapshot ID and `added_at` high-water mark of the previous export, if any."""
+    path = Path(f"./data/{file_name}.sync.json")
+    if not path.exists():
+        return None
+    with path.open() as f:
+        return dict(json.load(f))
+
+
+def save_sync_state(
+    file_name: str, snapshot_id: str, file_format: FileFormat = FILE_FORMAT
+) -> None:
+    """Store the snapshot ID and `added_at` high-water mark of an export next to it."""
+    df_stats = read_playlist_stats(file_name, columns=["added_at"], file_format=file_format)
+    added_at = None if df_stats is None else pd.to_datetime(df_stats["added_at"], utc=True).max()
+    state = {"snapshot_id": snapshot_id, "added_at": None if pd.isna(added_at) else str(added_at)}
+    with Path(f"./data/{file_name}.sync.json").open("w") as f:
+        json.dump(state, f)
+
+
+def fetch_snapshot_id(sp: Spotify, playlist_uri: str) -> str:
+    """Fetch the snapshot ID of a playlist, which changes whenever the playlist changes."""
+    return str(sp.playlist(playlist_uri, fields="snapshot_id")["snapshot_id"])
+
+
+def fetch_playlist_changes(  # noqa: PLR0913
+    sp: Spotify,
+    playlist_uri: str,
+    known_track_ids: set[str],
+    sync_state: dict[str, Any],
+    map_batches: BatchMapper = map,
+    metrics: Metrics | None = None,
+) -> "tuple[list[str], pd.DataFrame]":
+    """List the track IDs of a playlist, and fetch the details of its new and re-added tracks.
+
+    Only the track IDs of the playlist are listed. The full details are fetched only for the
+    pages holding tracks that are not known or were added after the `added_at` high-water mark.
+    Returns the track IDs in playlist order and the (parsed) new tracks.
+    """
+    logger = logging.getLogger("spotify")
+    metrics = Metrics() if metrics is None else metrics
+    high_water_mark = pd.Timestamp(sync_state["added_at"])
+    # List the track ID and `added_at` of every position in the playlist
+    with metrics.stage("fetch"):
+        listing = [
+            (item["track"]["id"] if item["track"] else None, pd.Timestamp(item["added_at"]))
+            for page in iter_playlist_pages(sp, playlist_uri, PLAYLIST_TRACK_ID_FIELDS, map_batches)
+            for item in page
+        ]
+    # Find the positions of new tracks, and the pages holding them
+    new_positions = [
+        position
+        for position, (track_id, added_at) in enumerate(listing)
+        if track_id and (track_id not in known_track_ids or added_at > high_water_mark)
+    ]
+    pages = sorted({position // PLAYLIST_PAGE_SIZE for position in new_positions})
+
+    def fetch_page(page: int) -> list[dict[str, Any]]:
+        """Fetch the full details of a single page of tracks."""
+        response = sp.playlist_tracks(
+            playlist_uri,
+            fields=PLAYLIST_TRACK_FIELDS,
+            limit=PLAYLIST_PAGE_SIZE,
+            offset=page * PLAYLIST_PAGE_SIZE,
+        )
+        return list(response["items"])
+
+    with metrics.stage("fetch"):
+        items = {
+            page * PLAYLIST_PAGE_SIZE + i: item
+            for page, page_items in zip(pages, map_batches(fetch_page, pages), strict=True)
+            for i, item in enumerate(page_items)
+        }
+    with metrics.stage("parse"):
+        df_new = initialize_playlist_stats([items[position] for position in new_positions])
+    logger.info(
+        f"Playlist changed: {len(df_new)} new or re-added tracks (fetched {len(pages)} pages)."
+    )
+    return [track_id for track_id, _ in listing if track_id], df_new
+
+
+def enrich_playlist_stats_by_page(
+    sp: Spotify,
+    df_playlist: "pd.DataFrame",
+    journal: EnrichmentJournal,
+    map_batches: BatchMapper = map,
+) -> "pd.DataFrame":
+    """Enrich playlist stats page by page, journaling each page as soon as it is enriched."""
+    artists: dict[str, dict[str, Any]] = {}
+    frames = [
+        journal.enrich(sp, df_playlist.iloc[i : i + PLAYLIST_PAGE_SIZE], artists, map_batches)
+        for i in range(0, len(df_playlist), PLAYLIST_PAGE_SIZE)
+    ]
+    if not frames:
+        return df_playlist
+    return pd.concat(frames, ignore_index=True)
+
+
+def sync_playlist(  # noqa: PLR0913
+    sp: Spotify,
+    playlist_uri: str,
+    file_name: str,
+    file_format: FileFormat = FILE_FORMAT,
+    map_batches: BatchMapper = map,
+    metrics: Metrics | None = None,
+    store: TrackStore | None = None,
+) -> int | None:
+    """Fetch, update and enrich the stats of a playlist in the store, and export them.
+
+    The playlist stats are kept in the `store` as the dataset `file_name` (a store in `data/` if
+    not given), into which a previous export is imported once. Returns the number of exported
+    tracks, or None when the playlist is unchanged since the previous export. The time spent in
+    each stage is recorded in `metrics`, if given.
+    """
+    logger = logging.getLogger("spotify")
+    metrics = Metrics() if metrics is None else metrics
+    # Skip the playlist when it has not changed since the previous export
+    sync_state = load_sync_state(file_name)
+    with metrics.stage("fetch"):
+        snapshot_id = fetch_snapshot_id(sp, playlist_uri)
+    if sync_state is not None and sync_state["snapshot_id"] == snapshot_id:
+        logger.info(f"{file_name}: unchanged since the previous export (snapshot {snapshot_id}).")
+        return None
+
+    track_store = TrackStore() if store is None else store
+    try:
+        # Import previously exported (enriched) data into the store, once
+        with metrics.stage("load"):
+            if not track_store.has_dataset(file_name):
+                logger.info(f"{file_name}: importing previously exported data into the store...")
+                df_outdated = read_playlist_stats(file_name, file_format=file_format)
+                if df_outdated is not None:
+                    track_store.replace(file_name, df_outdated)
+        # Journal enriched tracks as they complete, so an interrupted run resumes where it stopped
+        with EnrichmentJournal(file_name) as journal:
+            if sync_state is None or not track_store.has_dataset(file_name):
+                stream_dataset(
+                    sp, playlist_uri, file_name, track_store, journal, map_batches, metrics
+                )
+            else:
+                sync_dataset(
+                    sp,
+                    playlist_uri,
+                    file_name,
+                    sync_state,
+                    track_store,
+                    journal,
+                    map_batches,
+                    metrics,
+                )
+            # Export the dataset as a view of the store, replacing the previous export atomically,
+            # after which the journaled tracks are part of the export
+            with metrics.stage("export"):
+                df_stats = track_store.read(file_name)
+                frames = [] if df_stats is None else [df_stats]
+                n_tracks = int(write_playlist_stats(frames, file_name, file_format))
+            journal.discard()
+    finally:
+        if store is None:
+            track_store.close()
+    logger.info(f"{file_name}: exported {n_tracks} tracks to ./data/{file_name}.{file_format}")
+    with metrics.stage("export"):
+        save_sync_state(file_name, snapshot_id, file_format)
+    return n_tracks
+
+
+def stream_dataset(  # noqa: PLR0913
+    sp: Spotify,
+    playlist_uri: str,
+    dataset: str,
+    store: TrackStore,
+    journal: EnrichmentJournal,
+    map_batches: BatchMapper = map,
+    metrics: Metrics | None = None,
+) -> None:
+    """Fetch, parse and enrich all tracks of a playlist page by page, replacing its dataset.
+
+    Tracks are updated with their enrichment in the store, and each page is upserted into the
+    store as soon as it is enriched.
+    """
+    logger = logging.getLogger("spotify")
+    metrics = Metrics() if metrics is None else metrics
+    logger.info(f"{dataset}: streaming playlist tracks through the pipeline...")
+    frames = stream_playlist_stats(
+        sp, playlist_uri, map_batches=map_batches, metrics=metrics, journal=journal, store=store
+    )
+    track_ids: list[str] = []
+    for df_page in metrics.time_consumer("export", frames):
+        store.upsert(dataset, df_page)
+        track_ids.extend(df_page["track_id"])
+    # Drop the tracks that are no longer in the playlist, and order the others as listed
+    with metrics.stage("export"):
+        store.retain(dataset, track_ids)
+
+
+def sync_dataset(  # noqa: PLR0913
+    sp: Spotify,
+    playlist_uri: str,
+    dataset: str,
+    sync_state: dict[str, Any],
+    store: TrackStore,
+    journal: EnrichmentJournal,
+    map_batches: BatchMapper = map,
+    metrics: Metrics | None = None,
+) -> None:
+    """Apply the tracks that were added to or removed from a playlist to its dataset in the store.
+
+    Only the new and re-added tracks are fetched (see `fetch_playlist_changes`) and upserted, and
+    only the tracks of the dataset that are not yet enriched are enriched.
+    """
+    logger = logging.getLogger("spotify")
+    metrics = Metrics() if metrics is None else metrics
+    logger.info(f"{dataset}: syncing playlist tracks with the store...")
+    with metrics.stage("load"):
+        known_track_ids = set(store.track_ids(dataset))
+    track_ids, df_new = fetch_playlist_changes(
+        sp, playlist_uri, known_track_ids, sync_state, map_batches, metrics
+    )
+    logger.info(f"Playlist changed: {len(known_track_ids - set(track_ids))} removed tracks.")
+    with metrics.stage("merge"):
+        store.upsert(dataset, store.merge(df_new))
+        store.retain(dataset, track_ids)
+    with metrics.stage("enrich"):
+        df_pending = store.pending(dataset)
+        df_enriched = enrich_playlist_stats_by_page(sp, df_pending, journal, map_batches)
+    with metrics.stage("export"):
+        store.upsert(dataset, df_enriched)
+        # Drop the tracks of which the artist details could not be found
+        dropped = set(df_pending["track_id"]) - set(df_enriched["track_id"])
+        if dropped:
+            store.retain(dataset, [track_id for track_id in track_ids if track_id not in dropped])
@@ -1,17 +1,122 @@
 """Utility functions for the Spotipy API."""
 
+import difflib
+import importlib
+import itertools
 import json
 import logging
+import os
+import re
 import sys
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
 from configparser import ConfigParser
 from pathlib import Path
-from typing import Any
+from types import ModuleType
+from typing import TYPE_CHECKING, Any, Literal
 
-import numpy as np
-import pandas as pd
 from spotipy.client import Spotify
 
 
+class LazyModule(ModuleType):
+    """Module that is imported on first attribute access, keeping heavy imports off the CLI path."""
+
+    def __getattr__(self: "LazyModule", name: str) -> Any:  # noqa: ANN401
+        """Import the module, and look up the attribute in it."""
+        module = importlib.import_module(self.__name__)
+        # Copy the attributes of the module, so they are no longer looked up through here
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+    import pandas as pd
+    from scipy import sparse
+    from scipy.sparse import csgraph
+else:
+    np = LazyModule("numpy")
+    pd = LazyModule("pandas")
+    sparse = LazyModule("scipy.sparse")
+    csgraph = LazyModule("scipy.sparse.csgraph")
+
+# Maps a fetch function over batches of IDs (or pages), e.g. the builtin `map` or a concurrent map
+BatchMapper = Callable[[Callable[[Any], Any], Iterable[Any]], Iterable[Any]]
+# Maximum number of tracks per page of playlist tracks
+PLAYLIST_PAGE_SIZE = 100
+# Attributes of the playlist tracks that are used by `initialize_playlist_stats`
+PLAYLIST_TRACK_FIELDS = (
+    "total,items(added_at,added_by.id,track(name,id,uri,duration_ms,popularity,external_ids(isrc),"
+    "artists(name,uri),album(name,album_type,release_date)))"
+)
+# Attributes of the playlist tracks that are used by `get_playlist_track_uris`
+PLAYLIST_TRACK_URI_FIELDS = "total,items(track(uri))"
+# Columns of the playlist stats, as parsed from the playlist tracks
+TRACK_COLUMNS = [
+    "name",
+    "artist",
+    "album",
+    "album_type",
+    "release_date",
+    "duration",
+    "duration_ms",
+    "added_at",
+    "added_by_id",
+    "track_popularity",
+    "track_id",
+    "track_uri",
+    "isrc",
+    "artist_uris",
+    "artist_names",
+    "enriched",
+]
+# Artist details added to each track during enrichment
+ARTIST_DETAILS = ["artists_genres", "artists_popularities", "artists_avg_popularity"]
+# Maximum number of IDs per request to the multi-artist endpoint
+ARTISTS_BATCH_SIZE = 50
+# Maximum number of IDs per request to the multi-track audio features endpoint
+AUDIO_FEATURES_BATCH_SIZE = 100
+# Audio features added to each track during enrichment
+AUDIO_FEATURES = [
+    "danceability",
+    "energy",
+    "key",
+    "loudness",
+    "mode",
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "valence",
+    "tempo",
+    "time_signature",
+]
+# Columns of the exported playlist stats
+PLAYLIST_STATS_COLUMNS = [*TRACK_COLUMNS, *AUDIO_FEATURES, *ARTIST_DETAILS]
+# Methods to calculate the overlap of playlists: exact, or approximated with MinHash signatures
+OverlapMethod = Literal["exact", "minhash"]
+# Number of hash functions of the MinHash signatures of playlists
+MINHASH_PERMUTATIONS = 128
+# Section of config.ini holding the aliases for the user IDs or display names of the people
+# adding tracks to the playlists, e.g. `user_id = Display name`
+ALIASES_SECTION = "aliases"
+# Parts of track names that differ between releases of the same recording (featured artists,
+# remasters), removed from the names before comparing them
+TRACK_NAME_SUFFIXES = [
+    r"[(\[]\s*(?:feat|ft|featuring|with)\b[^)\]]*[)\]]",  # "(feat. Artist)", "[with Artist]"
+    r"\s(?:feat|ft|featuring)\b.*$",  # "feat. Artist"
+    r"[(\[][^)\]]*\bremaster[^)\]]*[)\]]",  # "(Remastered 2009)"
+    r"\s-\s[^-]*\bremaster.*$",  # " - 2013 Remaster"
+]
+# Minimum similarity of the normalized names of tracks by the same artist to be near-duplicates
+DUPLICATE_NAME_SIMILARITY = 0.9
+# Maximum difference in duration of near-duplicate tracks
+DUPLICATE_MAX_DURATION_DIFFERENCE_MS = 10_000
+# Numbers (including Roman numerals) in normalized names, which must match for near-duplicates
+NUMBER_PATTERN = r"\b(?:\d+|[ivx]+)\b"
+
+
 def load_credentials(database: str) -> dict[str, str]:
     """Load credentials from config.ini file."""
     config_path = Path("./config.ini")
@@ -29,16 +134,25 @@ def load_credentials(database: str) -> dict[str, str]:
     }
 
 
-def get_playlist_track_uris(sp: Spotify, playlist_uri: str) -> list[str]:
+def load_user_aliases(section: str = ALIASES_SECTION) -> dict[str, str]:
+    """Load the aliases for user IDs or display names from config.ini, if any."""
+    config_path = Path("./config.ini")
+    config = ConfigParser()
+    # Keep the case of user IDs and display names
+    config.optionxform = str  # type: ignore[assignment,method-assign]
+    config.read(config_path)
+    if not config.has_section(section):
+        return {}
+    return dict(config[section])
+
+
+def get_playlist_track_uris(
+    sp: Spotify, playlist_uri: str, map_pages: BatchMapper = map
+) -> list[str]:
     """Retrieve all track IDs from a Spotify playlist, handling pagination."""
     track_uris = []
-    response = sp.playlist_tracks(playlist_uri)
-    while response:
-        track_uris += [item["track"]["uri"] for item in response["items"] if item["track"]]
-        if response["next"]:
-            response = sp.next(response)
-        else:
-            break
+    for page in iter_playlist_pages(sp, playlist_uri, PLAYLIST_TRACK_URI_FIELDS, map_pages):
+        track_uris += [item["track"]["uri"] for item in page if item["track"]]
     return track_uris
 
 
@@ -55,27 +169,79 @@ def transform_track_duration(track_duration_ms: float) -> str:
     return f"{duration_min}:{duration_sec:02}"  # 2 digits for seconds
 
 
-def fetch_playlist_tracks(sp: Spotify, playlist_uri: str) -> list[dict[str, Any] | None]:
+def transform_track_durations(track_durations_ms: "pd.Series") -> "pd.Series":
+    """Transform track durations from ms to minutes:seconds, for a whole column at once."""
+    duration_min = (track_durations_ms // 60000).astype("int64").astype(str)
+    duration_sec = (track_durations_ms % 60000 // 1000).astype("int64").astype(str)
+    return duration_min + ":" + duration_sec.str.zfill(2)  # 2 digits for seconds
+
+
+def iter_playlist_pages(
+    sp: Spotify, playlist_uri: str, fields: str | None = None, map_pages: BatchMapper = map
+) -> Iterator[list[dict[str, Any]]]:
+    """Yield the tracks in a playlist page by page, handling pagination.
+
+    The first page reports the total number of tracks, after which the remaining pages are
+    fetched by offset with `map_pages` (e.g. concurrently with `EnrichmentEngine.map`) and yielded
+    in playlist order. `map_pages` should be lazy, so that only a bounded number of pages is in
+    flight ahead of the consumer. Use `fields` to request only a subset of the attributes of each
+    track.
+    """
+
+    def fetch_page(offset: int) -> list[dict[str, Any]]:
+        """Fetch a single page of tracks, starting at the offset."""
+        response = sp.playlist_tracks(
+            playlist_uri, fields=fields, limit=PLAYLIST_PAGE_SIZE, offset=offset
+        )
+        return [track for track in response["items"] if track]
+
+    response = sp.playlist_tracks(playlist_uri, fields=fields, limit=PLAYLIST_PAGE_SIZE)
+    yield [track for track in response["items"] if track]
+    offsets = range(PLAYLIST_PAGE_SIZE, response["total"], PLAYLIST_PAGE_SIZE)
+    yield from map_pages(fetch_page, offsets)
+
+
+def fetch_playlist_tracks(
+    sp: Spotify, playlist_uri: str, fields: str | None = None, map_pages: BatchMapper = map
+) -> list[dict[str, Any] | None]:
     """Fetch all tracks in a playlist."""
-    tracks = []
-    response = sp.playlist_tracks(playlist_uri)
+    tracks: list[dict[str, Any] | None] = []
     # Iterate tracks in playlist, handling pagination
-    while response:
-        tracks.extend([track for track in response["items"] if track])
-        response = sp.next(response) if response["next"] else None
+    for page in iter_playlist_pages(sp, playlist_uri, fields, map_pages):
+        tracks.extend(page)
     return tracks
 
 
-def initialize_playlist_stats(tracks: list[dict[str, Any]]) -> pd.DataFrame:
-    """Parse all tracks in a playlist as a dataframe."""
-    # Initialize pandas dataframe
-    df_playlist = pd.DataFrame()
-    # Iterate tracks in playlist and add to dataframe
-    for track in tracks:
-        track_details = parse_track_details(track)
-        df_playlist = pd.concat([df_playlist, pd.Series(track_details)], axis=1)
-    # Transpose, drop index column, and reset index
-    return df_playlist.T.reset_index().drop(["index"], axis=1)
+def initialize_playlist_stats(tracks: list[dict[str, Any]]) -> "pd.DataFrame":
+    """Parse all tracks in a playlist as a dataframe, building it column by column."""
+    # Collect the track details as plain per-column lists
+    columns: dict[str, list[Any]] = defaultdict(list)
+    for item in tracks:
+        track = item["track"]
+        if not track:
+            continue
+        columns["name"].append(track["name"])
+        columns["artist"].append(", ".join(artist["name"] for artist in track["artists"]))
+        columns["album"].append(track["album"]["name"])
+        columns["album_type"].append(track["album"]["album_type"])
+        columns["release_date"].append(track["album"]["release_date"])
+        columns["duration_ms"].append(track["duration_ms"])
+        columns["added_at"].append(item["added_at"])
+        columns["added_by_id"].append(item["added_by"]["id"])
+        columns["track_popularity"].append(track["popularity"])
+        columns["track_id"].append(track["id"])
+        columns["track_uri"].append(track["uri"])
+        columns["isrc"].append((track.get("external_ids") or {}).get("isrc"))
+        columns["artist_uris"].append([artist["uri"] for artist in track["artists"]])
+        columns["artist_names"].append([artist["name"] for artist in track["artists"]])
+    # Build the dataframe in a single call, with proper dtypes
+    df_playlist = pd.DataFrame(columns, columns=TRACK_COLUMNS)
+    df_playlist["duration_ms"] = df_playlist["duration_ms"].astype("int64")
+    df_playlist["duration"] = transform_track_durations(df_playlist["duration_ms"])
+    df_playlist["added_at"] = pd.to_datetime(df_playlist["added_at"], utc=True)
+    df_playlist["track_popularity"] = df_playlist["track_popularity"].astype("int64")
+    df_playlist["enriched"] = False
+    return df_playlist
 
 
 def parse_track_details(track: dict[Any, Any]) -> dict[str, Any]:
@@ -98,119 +264,388 @@ def parse_track_details(track: dict[Any, Any]) -> dict[str, Any]:
         "track_popularity": track["track"]["popularity"],
         "track_id": track["track"]["id"],
         "track_uri": track["track"]["uri"],
+        "isrc": (track["track"].get("external_ids") or {}).get("isrc"),
         "artist_uris": artists_uris,
         "artist_names": artists_names,
         "enriched": False,
     }
 
 
-def fetch_user_names(sp: Spotify, df_stats: pd.DataFrame) -> pd.DataFrame:
-    """Fetch user display names from id."""
-    user_ids = df_stats["added_by_id"].unique().tolist()
-    # Iterate unique users in dataset
-    for user_id in user_ids:
-        user_details = sp.user(user_id)
-        # Update user display name
-        df_stats.loc[df_stats["added_by_id"] == user_id, "added_by"] = user_details["display_name"]
-    return df_stats
+def fetch_user_names(
+    sp: Spotify,
+    df_stats: "pd.DataFrame",
+    users: dict[Any, str] | None = None,
+    aliases: dict[str, str] | None = None,
+    map_batches: BatchMapper = map,
+) -> "pd.DataFrame":
+    """Fetch user display names from id, renaming users that have an alias.
+
+    Only users missing from `users` (display names by user ID, shared across calls) are fetched,
+    with `map_batches` (e.g. concurrently with `EnrichmentEngine.map`). Wrap the client in
+    `CachedSpotify` to remember the display names between runs. Aliases map user IDs or display
+    names to the name used in the dataset.
+    """
+    users = {} if users is None else users
+    aliases = {} if aliases is None else aliases
+    # Fetch the display names of unseen users, falling back to the user ID
+    user_ids = [
+        user_id for user_id in df_stats["added_by_id"].dropna().unique() if user_id not in users
+    ]
+
+    def fetch_user_name(user_id: Any) -> str:  # noqa: ANN401
+        """Fetch the display name of a single user."""
+        user_details = sp.user(str(user_id))
+        return str((user_details or {}).get("display_name") or user_id)
+
+    users.update(zip(user_ids, map_batches(fetch_user_name, user_ids), strict=True))
+    # Update user display names in a single pass
+    names = {
+        user_id: aliases.get(str(user_id), aliases.get(name, name))
+        for user_id, name in users.items()
+    }
+    return df_stats.assign(added_by=df_stats["added_by_id"].map(names))
 
 
-def fetch_artist_details(sp: Spotify, track: pd.Series) -> dict[str, Any]:
-    """Fetch artist details by iterating the dataset. Skip tracks that have been previously fetched."""
-    # Build list of nested dictionaries with artist details
-    artists_nested = []
-    # Transform string representation of artist URIs to list of URIs
+def parse_artist_uris(artist_uris: str | list[str]) -> list[str]:
+    """Transform (string representation of) artist URIs to list of URIs."""
     try:
         # first try to JSON requires double quotes
-        artist_uris = json.loads(track["artist_uris"].replace("'", '"'))
+        return list(json.loads(artist_uris.replace("'", '"')))  # type: ignore[union-attr]
     except AttributeError:
-        artist_uris = track["artist_uris"]
-    for artist_uri in artist_uris:
-        artist = {
-            "genres": sp.artist(artist_uri)["genres"],
-            "popularity": sp.artist(artist_uri)["popularity"],
+        return list(artist_uris)
+
+
+def split_batches(ids: list[str], batch_size: int) -> list[list[str]]:
+    """Split a list of IDs into batches of at most `batch_size` IDs."""
+    return [ids[i : i + batch_size] for i in range(0, len(ids), batch_size)]
+
+
+def fetch_artists(
+    sp: Spotify,
+    artist_uris: list[str],
+    artists: dict[str, dict[str, Any]] | None = None,
+    map_batches: BatchMapper = map,
+) -> dict[str, dict[str, Any]]:
+    """Fetch the genres and popularity of the given artists, in batches of 50 artists.
+
+    Artists that are already present in `artists` (mapping artist URI to artist details) are not
+    fetched again, and newly fetched artists are added to it. The batches are fetched with
+    `map_batches`, which can be replaced by a concurrent map (e.g. `EnrichmentEngine.map`).
+    """
+    logger = logging.getLogger("spotify")
+    artists = {} if artists is None else artists
+    # Collect unique artist URIs (preserving order)
+    unique_artist_uris = list(dict.fromkeys(artist_uris))
+    # Fetch artists in batches, mapping artist URI to artist details
+    artist_uris_to_fetch = [uri for uri in unique_artist_uris if uri not in artists]
+
+    def fetch_batch(batch: list[str]) -> list[dict[str, Any] | None]:
+        """Fetch a single batch of artists."""
+        try:
+            return list(sp.artists(batch)["artists"])
+        except TimeoutError as e:
+            msg = f"Error fetching artists {batch[0]}-{batch[-1]}: {e}"
+            logger.exception(msg)
+            return [None] * len(batch)
+
+    batches = split_batches(artist_uris_to_fetch, ARTISTS_BATCH_SIZE)
+    for batch, response in zip(batches, map_batches(fetch_batch, batches), strict=True):
+        for artist_uri, artist in zip(batch, response, strict=True):
+            if artist:
+                artists[artist_uri] = {
+                    "genres": artist["genres"],
+                    "popularity": artist["popularity"],
+                }
+    logger.info(f"Fetched {len(artist_uris_to_fetch)}/{len(unique_artist_uris)} unique artists.")
+    return artists
+
+
+def fetch_artist_details(
+    sp: Spotify,
+    df_playlist: "pd.DataFrame",
+    artists: dict[str, dict[str, Any]] | None = None,
+    map_batches: BatchMapper = map,
+) -> "pd.DataFrame":
+    """Fetch artist details for all unique artists in the dataset, in batches of 50 artists.
+
+    Artists are fetched with `fetch_artists` (see there for `artists` and `map_batches`), and
+    their details joined onto each track.
+    """
+    artist_uris = df_playlist["artist_uris"].apply(parse_artist_uris)
+    artists = fetch_artists(sp, [uri for uris in artist_uris for uri in uris], artists, map_batches)
+
+    def join_artist_details(uris: list[str]) -> dict[str, Any]:
+        """Join the fetched artist details onto a single track."""
+        # Leave track empty if any of its artists could not be fetched
+        if not all(uri in artists for uri in uris):
+            return {}
+        return {
+            "artists_genres": [artists[uri]["genres"] for uri in uris],
+            "artists_popularities": [artists[uri]["popularity"] for uri in uris],
+            "artists_avg_popularity": np.mean([artists[uri]["popularity"] for uri in uris]),
         }
-        # Append artist to list of dictionaries
-        artists_nested.append(artist)
-    return {
-        "artists_genres": [artist["genres"] for artist in artists_nested],
-        "artists_popularities": [artist["popularity"] for artist in artists_nested],
-        "artists_avg_popularity": np.mean([artist["popularity"] for artist in artists_nested]),
-    }
+
+    return pd.DataFrame(
+        artist_uris.apply(join_artist_details).tolist(),
+        index=df_playlist.index,
+        columns=ARTIST_DETAILS,
+    )
 
 
-def enrich_playlist_stats(sp: Spotify, df_playlist: pd.DataFrame) -> pd.DataFrame:
-    """Iterate dataframe to enrich dataset with artist details and audio features."""
+def enrich_playlist_stats(
+    sp: Spotify,
+    df_playlist: "pd.DataFrame",
+    artists: dict[str, dict[str, Any]] | None = None,
+    map_batches: BatchMapper = map,
+) -> "pd.DataFrame":
+    """Enrich dataset with artist details and audio features, in batches."""
     logger = logging.getLogger("spotify")
     if len(df_playlist) == sum(df_playlist["enriched"]):
         logger.info("All tracks have been enriched.")
         return df_playlist
-    # Initialize empty list to store enriched rows
-    df_enriched = pd.DataFrame()
-    # Iterate dataframe
-    for _, track in df_playlist.iterrows():
-        # If song is already enriched, add to dataframe and continue
-        if track["enriched"] is True:
-            df_enriched = pd.concat([df_enriched, pd.Series(track)], axis=1)
-            continue
+    # Select tracks that have not yet been enriched
+    to_enrich = ~df_playlist["enriched"].isin([True])
+    df_to_enrich = df_playlist[to_enrich]
+    logger.info(f"Enriching {len(df_to_enrich)}/{len(df_playlist)} tracks...")
+    # Fetch artist details and audio features of all tracks at once
+    df_artist_details = fetch_artist_details(sp, df_to_enrich, artists, map_batches)
+    df_audio_features = fetch_audio_features(sp, df_to_enrich, map_batches)
+    # Skip tracks of which the artist details could not be fetched
+    artists_found = df_artist_details.notna().any(axis=1)
+    for _, track in df_to_enrich[~artists_found].iterrows():
+        logger.info(f"Artist details not found for: {track['name']} - {track['artist']}")
+    # Join audio features and artist details, and add an `enriched` tag
+    df_enriched = (
+        df_to_enrich[artists_found]
+        .drop(columns=[*df_audio_features.columns, *df_artist_details.columns], errors="ignore")
+        .join(df_audio_features)
+        .join(df_artist_details)
+        .assign(enriched=True)
+    )
+    # Combine with the previously enriched tracks, preserving the playlist order
+    df_frames = [df for df in (df_playlist[~to_enrich], df_enriched) if not df.empty]
+    if not df_frames:
+        # None of the tracks could be enriched, e.g. when all artist lookups failed
+        return df_enriched.reset_index(drop=True)
+    return pd.concat(df_frames).sort_index().reset_index(drop=True)
+
+
+def fetch_audio_features(
+    sp: Spotify, df_playlist: "pd.DataFrame", map_batches: BatchMapper = map
+) -> "pd.DataFrame":
+    """Fetch audio features for all tracks in the dataset, in batches of 100 tracks."""
+    logger = logging.getLogger("spotify")
+    unique_track_ids = df_playlist["track_id"].drop_duplicates().tolist()
+
+    def fetch_batch(batch: list[str]) -> list[dict[str, Any] | None]:
+        """Fetch the audio features of a single batch of tracks."""
         try:
-            logger.debug(f"Fetching details for: {track['name']} - {track['artist']}")
-            # Fetch artist details, audio features, and add an `enriched` tag
-            artist_details = fetch_artist_details(sp, track)
-            audio_features = fetch_audio_features(sp, track)
-            enriched_row = {
-                # "track_id": track["track_id"],
-                **track,
-                **audio_features,
-                **artist_details,
-                "enriched": True,
-            }
-            # Concatenate the enriched row to the dataframe
-            df_enriched = pd.concat([df_enriched, pd.Series(enriched_row)], axis=1)
-        except TimeoutError as e:
-            msg = f"Error processing track {track['name']} - {track['artist']}: {e}"
-            logger.exception(msg)
-            continue
-    return df_enriched.T.reset_index().drop(["index"], axis=1)
+            return list(sp.audio_features(batch))
+        except Exception as e:  # noqa: BLE001
+            logger.warning(f"Response error for tracks {batch[0]}-{batch[-1]}: {e}")
+            return [None] * len(batch)
+
+    # Fetch audio features in batches, mapping track ID to audio features
+    audio_features: dict[str, dict[str, Any]] = {}
+    batches = split_batches(unique_track_ids, AUDIO_FEATURES_BATCH_SIZE)
+    for batch, response in zip(batches, map_batches(fetch_batch, batches), strict=True):
+        for track_id, track_audio_features in zip(batch, response, strict=True):
+            if track_audio_features:
+                audio_features[track_id] = track_audio_features
+    logger.info(f"Fetched audio features for {len(audio_features)}/{len(unique_track_ids)} tracks.")
+    # Tracks without audio features are filled with nulls
+    return pd.DataFrame(
+        [audio_features.get(track_id, {}) for track_id in df_playlist["track_id"]],
+        index=df_playlist.index,
+        columns=AUDIO_FEATURES,
+    )
 
 
-def fetch_audio_features(sp: Spotify, track: pd.Series) -> dict[str, Any]:
-    """Fetch audio features by iterating the dataset."""
-    logger = logging.getLogger("spotify")
-    try:
-        audio_features = sp.audio_features(track["track_uri"])[0]
-    except Exception as e:  # noqa: BLE001
-        logger.info(f"Response error for: {track['name']} - {track['artist']} - {e}")
-        return {}
-    if not audio_features:
-        logger.info(f"Audio features not found for: {track['name']} - {track['artist']}")
-    return {
-        "danceability": audio_features["danceability"] if audio_features else None,
-        "energy": audio_features["energy"] if audio_features else None,
-        "key": audio_features["key"] if audio_features else None,
-        "loudness": audio_features["loudness"] if audio_features else None,
-        "mode": audio_features["mode"] if audio_features else None,
-        "speechiness": audio_features["speechiness"] if audio_features else None,
-        "acousticness": audio_features["acousticness"] if audio_features else None,
-        "instrumentalness": audio_features["instrumentalness"] if audio_features else None,
-        "liveness": audio_features["liveness"] if audio_features else None,
-        "valence": audio_features["valence"] if audio_features else None,
-        "tempo": audio_features["tempo"] if audio_features else None,
-        "time_signature": audio_features["time_signature"] if audio_features else None,
+def encode_playlists(
+    playlists: dict[str, list[str]],
+) -> "tuple[sparse.csr_matrix, npt.NDArray[np.int64]]":
+    """Encode playlists as a sparse (playlist x track) incidence matrix, with integer track IDs.
+
+    Returns the incidence matrix and the number of tracks per playlist (including duplicates).
+    """
+    track_uris = [uri for uris in playlists.values() for uri in uris]
+    # Encode track URIs to integer IDs
+    track_ids, _ = pd.factorize(pd.Series(track_uris, dtype="object"))
+    n_tracks = np.array([len(uris) for uris in playlists.values()])
+    playlist_ids = np.repeat(np.arange(len(playlists)), n_tracks)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(track_ids), dtype=np.int64), (playlist_ids, track_ids)),
+        shape=(len(playlists), track_ids.max(initial=-1) + 1),
+    )
+    # Count tracks that are in a playlist multiple times once
+    incidence.data[:] = 1
+    return incidence, n_tracks
+
+
+def estimate_common_tracks(
+    incidence: "sparse.csr_matrix", n_permutations: int = MINHASH_PERMUTATIONS
+) -> "npt.NDArray[np.float64]":
+    """Estimate the number of common tracks of all pairs of playlists with MinHash signatures."""
+    rng = np.random.default_rng(0)
+    # Hash the track IDs of every playlist with `n_permutations` randomly seeded hash functions
+    seeds = rng.integers(0, np.iinfo(np.uint64).max, size=n_permutations, dtype=np.uint64)
+    hashes = np.bitwise_xor.outer(incidence.indices.astype(np.uint64), seeds)
+    # Mix the bits of the seeded track IDs (the finalizer of SplitMix64)
+    hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    hashes ^= hashes >> np.uint64(31)
+    # Signature of each playlist: the minimum hash of its tracks, per hash function
+    n_unique = np.diff(incidence.indptr)
+    signatures = np.zeros((incidence.shape[0], n_permutations), dtype=np.uint64)
+    is_filled = n_unique > 0
+    signatures[is_filled] = np.minimum.reduceat(hashes, incidence.indptr[:-1][is_filled])
+    # Estimate the Jaccard similarity by the fraction of matching signatures
+    jaccard = np.vstack([(signatures == signature).mean(axis=1) for signature in signatures])
+    jaccard[~is_filled] = 0
+    jaccard[:, ~is_filled] = 0
+    # |A ∩ B| = J * (|A| + |B|) / (1 + J)
+    common_tracks: npt.NDArray[np.float64] = (
+        jaccard * np.add.outer(n_unique, n_unique) / (1 + jaccard)
+    )
+    return common_tracks
+
+
+def calculate_playlist_overlaps(
+    playlists: dict[str, list[str]], method: OverlapMethod = "exact"
+) -> "tuple[pd.DataFrame, pd.DataFrame]":
+    """Calculate the overlap and Jaccard similarity of all pairs of playlists.
+
+    The overlap of row `i` and column `j` is the percentage of tracks from playlist `i` that are
+    also present in playlist `j`, as in `calculate_playlist_overlap`. With `method="minhash"`, the
+    number of common tracks is approximated, which scales to very large playlist collections.
+    """
+    incidence, n_tracks = encode_playlists(playlists)
+    n_unique = np.diff(incidence.indptr)
+    if method == "minhash":
+        common_tracks = estimate_common_tracks(incidence)
+    else:
+        # Count the common tracks of all pairs of playlists in a single sparse product
+        common_tracks = (incidence @ incidence.T).toarray().astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        overlap = common_tracks / n_tracks[:, None] * 100
+        jaccard = common_tracks / (np.add.outer(n_unique, n_unique) - common_tracks)
+    names = list(playlists)
+    return (
+        pd.DataFrame(overlap, index=names, columns=names),
+        pd.DataFrame(jaccard, index=names, columns=names),
+    )
+
+
+def fetch_playlist_overlaps(
+    sp: Spotify,
+    playlist_uris: dict[str, str],
+    method: OverlapMethod = "exact",
+    map_pages: BatchMapper = map,
+) -> "tuple[pd.DataFrame, pd.DataFrame]":
+    """Fetch each playlist once, and calculate the overlap and Jaccard similarity of all pairs."""
+    playlists = {
+        name: get_playlist_track_uris(sp, playlist_uri, map_pages)
+        for name, playlist_uri in playlist_uris.items()
     }
+    return calculate_playlist_overlaps(playlists, method)
 
 
 def calculate_playlist_overlap(
     sp: Spotify, first_playlist_uri: str, second_playlist_uri: str
 ) -> float:
     """Calculate the percentage of tracks from the first playlist that are also present in the second playlist."""
-    first_playlist_track_ids = get_playlist_track_uris(sp, first_playlist_uri)
-    second_playlist_track_ids = get_playlist_track_uris(sp, second_playlist_uri)
-    common_tracks = set(first_playlist_track_ids).intersection(second_playlist_track_ids)
-    # Calculate the total number of unique tracks in the first playlist also present in the second
-    first_playlist_unique_tracks = len(first_playlist_track_ids)
-    # Calculate the overlap percentage: common tracks / total unique tracks in first playlist
-    return len(common_tracks) / first_playlist_unique_tracks * 100
+    df_overlap, _ = fetch_playlist_overlaps(
+        sp, {"first": first_playlist_uri, "second": second_playlist_uri}
+    )
+    return float(df_overlap.loc["first", "second"])
+
+
+def normalize_names(names: "pd.Series", suffixes: list[str] | None = None) -> "pd.Series":
+    """Fold names to lowercase words without accents and punctuation, removing the suffixes."""
+    names = names.fillna("").astype(str).str.lower().str.normalize("NFKD")
+    # Drop the accents, which are separate (combining) characters after normalization
+    names = names.str.replace(r"[\u0300-\u036f]", "", regex=True)
+    if suffixes:
+        names = names.str.replace("|".join(suffixes), "", regex=True)
+    return names.str.replace(r"[\W_]+", " ", regex=True).str.strip()
+
+
+def find_duplicate_tracks(
+    df_stats: "pd.DataFrame", similarity: float = DUPLICATE_NAME_SIMILARITY
+) -> "pd.Series":
+    """Find clusters of duplicate tracks, such as re-releases and remasters under other track IDs.
+
+    Tracks are duplicates when they share their ISRC (when available), or their normalized name
+    and primary artist, which are matched with a hash join. Tracks by the same primary artist are
+    near-duplicates when their names are at least `similarity` similar, with the same numbers and
+    a similar duration, which is compared within blocks of names with the same initial rather
+    than for all pairs of tracks. Returns the position of the first track of the cluster of each
+    track, which is its own position for tracks without duplicates.
+    """
+    n_tracks = len(df_stats)
+    positions = np.arange(n_tracks)
+    names = normalize_names(df_stats["name"], TRACK_NAME_SUFFIXES)
+    artists = normalize_names(df_stats["artist"].fillna("").astype(str).str.split(", ").str[0])
+    keys = [(names + " / " + artists).where(names != "")]
+    if "isrc" in df_stats:
+        keys.append(df_stats["isrc"])
+    # Hash join: link each track to the first track with the same key
+    rows, columns = [], []
+    for key in keys:
+        codes, _ = pd.factorize(key)
+        is_keyed = codes >= 0
+        first_positions = positions[is_keyed][np.unique(codes[is_keyed], return_index=True)[1]]
+        rows.append(positions[is_keyed])
+        columns.append(first_positions[codes[is_keyed]])
+    # Blocked fuzzy comparison of the distinct names of each artist
+    blocks: dict[tuple[str, str], list[int]] = defaultdict(list)
+    name_keys = names.tolist()
+    artist_keys = artists.tolist()
+    # One track per distinct name and primary artist, i.e. the first track of each key
+    for position in rows[0][columns[0] == rows[0]].tolist():
+        blocks[(artist_keys[position], name_keys[position][0])].append(position)
+    durations = df_stats["duration_ms"].to_numpy(dtype=float)
+    fuzzy_pairs = [
+        (first, second)
+        for block in blocks.values()
+        for first, second in itertools.combinations(block, 2)
+        if not abs(durations[first] - durations[second]) > DUPLICATE_MAX_DURATION_DIFFERENCE_MS
+        and is_near_duplicate(name_keys[first], name_keys[second], similarity)
+    ]
+    rows.append(np.array([first for first, _ in fuzzy_pairs], dtype=np.int64))
+    columns.append(np.array([second for _, second in fuzzy_pairs], dtype=np.int64))
+    # Clusters of duplicates are the connected components of the linked tracks
+    links = np.concatenate(rows), np.concatenate(columns)
+    graph = sparse.csr_matrix((np.ones(len(links[0])), links), shape=(n_tracks, n_tracks))
+    _, labels = csgraph.connected_components(graph, directed=False)
+    first_positions = pd.Series(positions).groupby(labels).transform("min")
+    return pd.Series(first_positions.to_numpy(), index=df_stats.index, name="duplicate_of")
+
+
+def is_near_duplicate(first_name: str, second_name: str, similarity: float) -> bool:
+    """Determine whether two normalized names are near-duplicates, with the same numbers.
+
+    Numbers include Roman numerals, which tell apart e.g. the parts of a suite.
+    """
+    if re.findall(NUMBER_PATTERN, first_name) != re.findall(NUMBER_PATTERN, second_name):
+        return False
+    # Compare the upper bounds of the similarity first, which are cheaper to calculate
+    matcher = difflib.SequenceMatcher(None, first_name, second_name)
+    return (
+        matcher.real_quick_ratio() >= similarity
+        and matcher.quick_ratio() >= similarity
+        and matcher.ratio() >= similarity
+    )
+
+
+def drop_duplicate_tracks(
+    df_stats: "pd.DataFrame", similarity: float = DUPLICATE_NAME_SIMILARITY
+) -> "pd.DataFrame":
+    """Drop duplicate tracks (see `find_duplicate_tracks`), keeping the first of each cluster."""
+    logger = logging.getLogger("spotify")
+    is_first = find_duplicate_tracks(df_stats, similarity).to_numpy() == np.arange(len(df_stats))
+    logger.info(f"Dropped {len(df_stats) - is_first.sum()}/{len(df_stats)} duplicate tracks.")
+    return df_stats[is_first]
 
 
 def create_logger(name: str, level: int = logging.DEBUG) -> logging.Logger:
@@ -232,38 +667,93 @@ def create_logger(name: str, level: int = logging.DEBUG) -> logging.Logger:
     return logger
 
 
-def update_playlist_stats(df_playlist: pd.DataFrame, file_name: str) -> pd.DataFrame:
-    """Update playlist stats with existing data."""
+def load_playlist_stats(file_name: str) -> "pd.DataFrame | None":
+    """Load previously exported playlist stats, if any."""
     logger = logging.getLogger("spotify")
     try:
         # Load previously exported (enriched) data
         df_outdated = pd.read_csv(f"./data/{file_name}.csv")
-        # Drop duplicate rows
-        df_outdated = df_outdated.drop_duplicates(subset=["track_id"])
-        try:
-            # Drop rows that have not yet been enriched
-            df_enriched_outdated = df_outdated.dropna(subset=["enriched"])
-            logger.info(
-                f"Previously enriched tracks: {len(df_enriched_outdated)}/{len(df_playlist)}"
-            )
-            # Update playlist stats with the existing enriched data
-            df_playlist = df_playlist.merge(
-                df_outdated,
-                how="left",
-                on=["track_id"],
-                suffixes=("", "_outdated"),
-            )
-            # Drop/rename enriched columns
-            df_playlist = df_playlist.drop(["enriched"], axis=1).rename(
-                columns={"enriched_outdated": "enriched"}
-            )
-            # Drop outdated columns
-            return df_playlist[
-                [col for col in df_playlist.columns if not col.endswith("_outdated")]
-            ]
-        except KeyError:
-            logger.info("No previously enriched data found.")
-            return df_playlist
     except FileNotFoundError:
         logger.info("No previously exported data found.")
+        return None
+    # Drop duplicate rows
+    return df_outdated.drop_duplicates(subset=["track_id"])
+
+
+def merge_playlist_stats(
+    df_playlist: "pd.DataFrame", df_outdated: "pd.DataFrame | None"
+) -> "pd.DataFrame":
+    """Update playlist stats with previously exported data."""
+    logger = logging.getLogger("spotify")
+    if df_outdated is None:
+        return df_playlist
+    try:
+        # Drop rows that have not yet been enriched
+        df_enriched_outdated = df_outdated.dropna(subset=["enriched"])
+        logger.info(f"Previously enriched tracks: {len(df_enriched_outdated)}/{len(df_playlist)}")
+        # Update playlist stats with the existing enriched data
+        df_playlist = df_playlist.merge(
+            df_outdated,
+            how="left",
+            on=["track_id"],
+            suffixes=("", "_outdated"),
+        )
+        # Drop/rename enriched columns
+        df_playlist = df_playlist.drop(["enriched"], axis=1).rename(
+            columns={"enriched_outdated": "enriched"}
+        )
+        # Drop outdated columns
+        return df_playlist[[col for col in df_playlist.columns if not col.endswith("_outdated")]]
+    except KeyError:
+        logger.info("No previously enriched data found.")
+        return df_playlist
+
+
+def apply_enrichment(df_playlist: "pd.DataFrame", df_enrichment: "pd.DataFrame") -> "pd.DataFrame":
+    """Update the tracks that are not yet enriched with the enrichment of the same tracks.
+
+    `df_enrichment` holds the `track_id`, `enriched` tag, audio features and artist details of
+    previously enriched tracks (e.g. as journaled or stored).
+    """
+    is_enriched = ~df_playlist["enriched"].isin([True]) & df_playlist["track_id"].isin(
+        df_enrichment["track_id"]
+    )
+    if not is_enriched.any():
         return df_playlist
+    df_updated = merge_playlist_stats(
+        df_playlist[is_enriched].drop(columns=[*AUDIO_FEATURES, *ARTIST_DETAILS], errors="ignore"),
+        df_enrichment.drop_duplicates(subset=["track_id"]),
+    ).set_axis(df_playlist.index[is_enriched])
+    return pd.concat([df_playlist[~is_enriched], df_updated]).sort_index()
+
+
+def get_extra_columns(df_stats: "pd.DataFrame") -> list[str]:
+    """Get the columns of playlist stats beyond the known columns (e.g. `added_by`), in order."""
+    return [column for column in df_stats if column not in PLAYLIST_STATS_COLUMNS]
+
+
+def to_json_records(df_stats: "pd.DataFrame", columns: list[str]) -> list[dict[str, Any]]:
+    """Convert the given columns of playlist stats to records, with nulls as None."""
+    df_records = df_stats.reindex(columns=columns).astype(object)
+    return list(df_records.where(df_records.notna(), None).to_dict(orient="records"))
+
+
+def export_playlist_stats(frames: "Iterable[pd.DataFrame]", file_name: str) -> int:
+    """Export playlist stats to CSV chunk by chunk, replacing the previous export when done."""
+    path = Path(f"./data/{file_name}.csv")
+    path_tmp = path.with_suffix(".csv.tmp")
+    n_tracks = 0
+    columns = PLAYLIST_STATS_COLUMNS
+    with path_tmp.open("w", newline="") as f:
+        for i, df_chunk in enumerate(frames):
+            # Align columns with the first chunk, since chunks may lack columns (e.g. when no track
+            # was enriched), keeping its extra columns
+            if i == 0:
+                columns = [*PLAYLIST_STATS_COLUMNS, *get_extra_columns(df_chunk)]
+            df_chunk.reindex(columns=columns).to_csv(f, index=False, header=i == 0)
+            n_tracks += len(df_chunk)
+        # Flush the export to disk before it replaces the previous export
+        f.flush()
+        os.fsync(f.fileno())
+    path_tmp.replace(path)
+    return n_tracks
@@ -18,3 +18,21 @@ sys.modules["databricks.sdk"] = MagicMock()
 sys.modules["databricks.sdk.runtime"] = MagicMock()
 sys.modules["databricks.sdk.runtime.dbutils"] = MagicMock()
 """
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Make the modules in the spotify folder importable the same way `main.py` imports them
+sys.path.insert(0, str(Path(__file__).parent.parent / "spotify"))
+# Make the modules in the notebooks folder importable the same way `dashboard.py` imports them
+sys.path.insert(1, str(Path(__file__).parent.parent / "notebooks"))
+
+
+@pytest.fixture()
+def data_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Run the test in a temporary directory with a `data` folder."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    return tmp_path / "data"
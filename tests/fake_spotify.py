@@ -0,0 +1,217 @@
+"""Offline stand-in for the Spotify client, serving playlists built from the fixtures in `data/json`."""
+
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from spotipy.exceptions import SpotifyException
+from utils import ARTISTS_BATCH_SIZE, AUDIO_FEATURES_BATCH_SIZE
+
+# Location of the API responses that are served by the stand-in
+FIXTURES_PATH = Path(__file__).parent.parent / "data" / "json"
+# Number of unique artists per track in the playlists exported so far
+ARTISTS_PER_TRACK = 0.4
+# Users that add the tracks of the synthetic playlists
+USER_IDS = ["svdpal", "hvdpal58", "115458813"]
+
+
+def load_fixture(name: str) -> Any:  # noqa: ANN401
+    """Load an API response from `data/json`."""
+    with (FIXTURES_PATH / f"{name}.json").open() as f:
+        return json.load(f)
+
+
+def fixture_for(id_: str, fixtures: list[dict[str, Any]]) -> dict[str, Any]:
+    """Pick one of the `fixtures` by the last character of an ID, the same one for every call."""
+    return fixtures[ord(id_[-1]) % len(fixtures)]
+
+
+def create_tracks(n_tracks: int, n_artists: int) -> list[dict[str, Any]]:
+    """Create playlist tracks based on `data/json/track.json`, sharing a limited set of artists."""
+    template = load_fixture("track")
+    tracks = []
+    for i in range(n_tracks):
+        track = copy.deepcopy(template)
+        track["track"]["id"] = str(i)
+        track["track"]["uri"] = f"spotify:track:{i}"
+        track["track"]["artists"] = track["track"]["artists"][:1]
+        track["track"]["artists"][0]["uri"] = f"spotify:artist:{i % n_artists}"
+        tracks.append(track)
+    return tracks
+
+
+def create_synthetic_tracks(n_tracks: int, n_artists: int | None = None) -> list[dict[str, Any]]:
+    """Create a realistic playlist of unique tracks, added by multiple users.
+
+    Tracks have unique IDs, names and ISRCs, and share `n_artists` artists (by default as many as
+    in the playlists exported so far). Attributes that are equal for all tracks are shared, so
+    that large playlists can be created quickly.
+    """
+    n_artists = n_artists or max(1, int(n_tracks * ARTISTS_PER_TRACK))
+    item = load_fixture("track")
+    artist = item["track"]["artists"][0]
+    tracks = []
+    for i in range(n_tracks):
+        track_id = f"track{i:017d}"
+        artist_id = f"artist{i % n_artists:016d}"
+        tracks.append(
+            {
+                **item,
+                "added_by": {**item["added_by"], "id": USER_IDS[i % len(USER_IDS)]},
+                "track": {
+                    **item["track"],
+                    "id": track_id,
+                    "uri": f"spotify:track:{track_id}",
+                    "name": f"track {i}",
+                    "external_ids": {"isrc": f"NLA00{i:07d}"},
+                    "artists": [
+                        {
+                            **artist,
+                            "id": artist_id,
+                            "uri": f"spotify:artist:{artist_id}",
+                            "name": f"artist {i % n_artists}",
+                        }
+                    ],
+                },
+            }
+        )
+    return tracks
+
+
+class FakeSpotify:
+    """Offline stand-in for the Spotify client, serving a playlist of `tracks`.
+
+    Artists and audio features are served from the fixtures in `data/json` under the requested
+    IDs: artists are picked from `artists.json` by the last character of their ID, and tracks of
+    which the ID starts with `unknown` have no audio features. Users are made up from their IDs,
+    and users of which the ID starts with `unknown` do not exist. Every
+    call sleeps for `latency` seconds, and every `rate_limit_every`-th call is answered with a 429
+    response that asks to retry after `retry_after` seconds, so clients can be benchmarked and
+    tested without a network. Calls are counted per endpoint, including rate limited calls.
+    """
+
+    def __init__(
+        self: "FakeSpotify",
+        tracks: list[dict[str, Any]] | None = None,
+        latency: float = 0.0,
+        rate_limit_every: int = 0,
+        retry_after: float = 0.0,
+    ) -> None:
+        """Initialize the playlist tracks and the call counters."""
+        self.tracks = tracks or []
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.fields: str | None = None
+        self.artist_fixtures: list[dict[str, Any]] = load_fixture("artists")
+        self.audio_features_fixture: dict[str, Any] = load_fixture("audio_features")
+        self.calls: Counter[str] = Counter()
+        self.n_rate_limited = 0
+        self._lock = threading.Lock()
+
+    @property
+    def n_tracks(self: "FakeSpotify") -> int:
+        """Number of tracks in the playlist."""
+        return len(self.tracks)
+
+    @property
+    def n_calls(self: "FakeSpotify") -> int:
+        """Total number of API calls."""
+        return sum(self.calls.values())
+
+    def _request(self: "FakeSpotify", endpoint: str) -> None:
+        """Count a call, wait for the response and raise a 429 response when rate limited."""
+        with self._lock:
+            self.calls[endpoint] += 1
+            n_calls = self.n_calls
+        time.sleep(self.latency)
+        if self.rate_limit_every and n_calls % self.rate_limit_every == 0:
+            with self._lock:
+                self.n_rate_limited += 1
+            raise SpotifyException(
+                429,
+                -1,
+                f"{endpoint}: API rate limit exceeded",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+    def playlist(
+        self: "FakeSpotify", _playlist_id: str, fields: str | None = None
+    ) -> dict[str, Any]:
+        """Return the snapshot ID of the playlist, which changes with its tracks."""
+        self._request("playlist")
+        self.fields = fields
+        items = [(item["added_at"], item["track"] and item["track"]["id"]) for item in self.tracks]
+        snapshot_id = hashlib.sha256(json.dumps(items).encode()).hexdigest()
+        return {"snapshot_id": snapshot_id, "tracks": {"total": self.n_tracks}}
+
+    def playlist_tracks(
+        self: "FakeSpotify",
+        _playlist_id: str,
+        fields: str | None = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> dict[str, Any]:
+        """Return a page of playlist tracks."""
+        self._request("playlist_tracks")
+        self.fields = fields
+        has_next = offset + limit < self.n_tracks
+        return {
+            "items": self.tracks[offset : offset + limit],
+            "offset": offset,
+            "limit": limit,
+            "next": f"offset={offset + limit}" if has_next else None,
+            "total": self.n_tracks,
+        }
+
+    def track(self: "FakeSpotify", track_id: str) -> dict[str, Any]:
+        """Return the details of a track."""
+        self._request("track")
+        return {**load_fixture("track")["track"], "id": track_id.split(":")[-1]}
+
+    def artists(self: "FakeSpotify", artists: list[str]) -> dict[str, Any]:
+        """Return the details of multiple artists."""
+        self._request("artists")
+        assert len(artists) <= ARTISTS_BATCH_SIZE
+        return {
+            "artists": [
+                {
+                    **copy.deepcopy(fixture_for(artist_id, self.artist_fixtures)),
+                    "id": artist_id,
+                    "uri": f"spotify:artist:{artist_id}",
+                }
+                for artist_id in (artist.split(":")[-1] for artist in artists)
+            ]
+        }
+
+    def audio_features(self: "FakeSpotify", tracks: list[str]) -> list[dict[str, Any] | None]:
+        """Return the audio features of multiple tracks, or None for unknown tracks."""
+        self._request("audio_features")
+        assert len(tracks) <= AUDIO_FEATURES_BATCH_SIZE
+        return [
+            None
+            if track_id.startswith("unknown")
+            else {
+                **self.audio_features_fixture,
+                "id": track_id,
+                "uri": f"spotify:track:{track_id}",
+            }
+            for track_id in (track.split(":")[-1] for track in tracks)
+        ]
+
+    def audio_analysis(self: "FakeSpotify", _track_id: str) -> dict[str, Any]:
+        """Return the audio analysis of a track."""
+        self._request("audio_analysis")
+        return dict(load_fixture("audio_analysis"))
+
+    def user(self: "FakeSpotify", user: str) -> dict[str, Any]:
+        """Return the profile of a user, raising a 404 response for unknown users."""
+        self._request("user")
+        if user.startswith("unknown"):
+            raise SpotifyException(404, -1, f"user/{user}: Not found.")
+        return {"id": user, "display_name": user.upper()}
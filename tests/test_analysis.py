@@ -0,0 +1,77 @@
+"""Tests for the audio analysis store."""
+
+import copy
+import json
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from analysis import (
+    SEGMENT_DIMENSIONS,
+    SEGMENT_FIELDS,
+    AudioAnalysisStore,
+    ingest_audio_analyses,
+    iter_audio_analysis_files,
+)
+
+from tests.fake_spotify import FakeSpotify
+
+AUDIO_ANALYSIS_PATH = Path(__file__).parent.parent / "data" / "json" / "audio_analysis.json"
+
+
+class AnalysisFakeSpotify(FakeSpotify):
+    """Fake Spotify client that returns audio analyses with a varying number of segments."""
+
+    def audio_analysis(self: "AnalysisFakeSpotify", track_id: str) -> dict[str, Any]:
+        """Return the audio analysis of a track, keeping the first `track_id` segments."""
+        self.calls["audio_analysis"] += 1
+        with AUDIO_ANALYSIS_PATH.open() as f:
+            audio_analysis = json.load(f)
+        audio_analysis["segments"] = audio_analysis["segments"][: int(track_id)]
+        return dict(audio_analysis)
+
+
+def test_store_round_trip(tmp_path: Path) -> None:
+    """Test that segments are stored contiguously and read back as memory-mapped slices."""
+    store = AudioAnalysisStore(tmp_path / "audio_analysis")
+    assert store.append(iter_audio_analysis_files([AUDIO_ANALYSIS_PATH])) == 1
+    with AUDIO_ANALYSIS_PATH.open() as f:
+        segments = json.load(f)["segments"]
+    # Re-open the store from disk
+    store = AudioAnalysisStore(tmp_path / "audio_analysis")
+    timbre = store.get("audio_analysis")
+    assert isinstance(timbre.base, np.memmap)
+    assert timbre.dtype == np.float32
+    assert timbre.shape == (len(segments), SEGMENT_DIMENSIONS)
+    np.testing.assert_allclose(timbre[5], segments[5]["timbre"], rtol=1e-6)
+    np.testing.assert_allclose(store.get("audio_analysis", "pitches")[-1], segments[-1]["pitches"])
+    assert store.get("audio_analysis", "segments")[
+        3, SEGMENT_FIELDS.index("duration")
+    ] == np.float32(segments[3]["duration"])
+
+
+def test_ingest_audio_analyses(tmp_path: Path) -> None:
+    """Test that only missing tracks are fetched, and the offsets index every track."""
+    sp = AnalysisFakeSpotify()
+    store = AudioAnalysisStore(tmp_path / "audio_analysis")
+    assert ingest_audio_analyses(sp, store, ["3", "5"]) == 2  # noqa: PLR2004
+    assert ingest_audio_analyses(sp, store, ["5", "2", "2"]) == 1
+    assert sp.calls["audio_analysis"] == 3  # noqa: PLR2004
+    assert store.offsets().tolist() == [0, 3, 8, 10]
+    assert store.array("timbre").shape == (10, SEGMENT_DIMENSIONS)
+    np.testing.assert_array_equal(store.get("2"), store.array("timbre")[8:10])
+
+
+def test_append_recovers_from_partial_writes(tmp_path: Path) -> None:
+    """Test that segments written without an index update (e.g. by a crash) are dropped."""
+    store = AudioAnalysisStore(tmp_path / "audio_analysis")
+    with AUDIO_ANALYSIS_PATH.open() as f:
+        audio_analysis = json.load(f)
+    store.append([("a", audio_analysis)])
+    with (tmp_path / "audio_analysis" / "timbre.f32").open("ab") as f:
+        f.write(b"\0" * 100)
+    store.append([("b", copy.deepcopy(audio_analysis))])
+    np.testing.assert_array_equal(store.get("a"), store.get("b"))
+    assert (tmp_path / "audio_analysis" / "timbre.f32").stat().st_size == store.array(
+        "timbre"
+    ).nbytes
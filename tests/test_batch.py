@@ -0,0 +1,75 @@
+"""Tests for the multi-playlist batch runner."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pytest
+from batch import load_manifest, sync_playlists
+from storage import read_playlist_stats
+
+from tests.fake_spotify import FakeSpotify, create_tracks
+
+
+class PlaylistsFakeSpotify(FakeSpotify):
+    """Fake Spotify client that holds multiple playlists."""
+
+    def __init__(self: "PlaylistsFakeSpotify", playlists: dict[str, list[dict[str, Any]]]) -> None:
+        """Initialize the playlists and the call counter."""
+        super().__init__()
+        self.playlists = playlists
+
+    def playlist(
+        self: "PlaylistsFakeSpotify", playlist_id: str, fields: str | None = None
+    ) -> dict[str, Any]:
+        """Return the snapshot ID of a playlist."""
+        self.calls["playlist"] += 1
+        return FakeSpotify(self.playlists[playlist_id]).playlist(playlist_id, fields)
+
+    def playlist_tracks(
+        self: "PlaylistsFakeSpotify",
+        playlist_id: str,
+        fields: str | None = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> dict[str, Any]:
+        """Return a page of tracks of a playlist."""
+        self.calls["playlist_tracks"] += 1
+        return FakeSpotify(self.playlists[playlist_id]).playlist_tracks(
+            playlist_id, fields, limit, offset
+        )
+
+
+def test_sync_playlists_shares_working_set(data_path: Path) -> None:
+    """Test that each unique artist and track is fetched once across overlapping playlists."""
+    tracks = create_tracks(n_tracks=300, n_artists=60)
+    sp = PlaylistsFakeSpotify({"a": tracks[:200], "b": tracks[100:]})
+    manifest = [
+        {"playlist_uri": "a", "file_name": "playlist_stats_a"},
+        {"playlist_uri": "b", "file_name": "playlist_stats_b"},
+    ]
+    (data_path.parent / "playlists.json").write_text(json.dumps(manifest))
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        summaries = sync_playlists(sp, load_manifest(), map_batches=executor.map)
+    assert [summary["n_tracks"] for summary in summaries] == [200, 200]
+    # Every unique artist and track is fetched once, the overlap is served by the working set
+    assert sum(summary["n_fetched"] for summary in summaries) == 60 + 300
+    assert sum(summary["n_shared"] for summary in summaries) >= 100  # noqa: PLR2004
+    # Only batches of which all IDs are shared save an API call
+    n_calls = sp.calls["artists"] + sp.calls["audio_features"]
+    assert sum(summary["n_calls"] for summary in summaries) == n_calls
+    assert sum(summary["n_calls_saved"] for summary in summaries) < sum(
+        summary["n_shared"] for summary in summaries
+    )
+    for file_name in ("playlist_stats_a", "playlist_stats_b"):
+        df_stats = read_playlist_stats(file_name)
+        assert df_stats is not None
+        assert df_stats["enriched"].all()
+
+
+def test_load_manifest_validates_playlists(data_path: Path) -> None:
+    """Test that playlists without a file name are rejected."""
+    (data_path / "playlists.json").write_text(json.dumps([{"playlist_uri": "a"}]))
+    with pytest.raises(ValueError, match="file_name"):
+        load_manifest(data_path / "playlists.json")
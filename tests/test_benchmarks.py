@@ -0,0 +1,147 @@
+"""Benchmarks of the pipeline against the offline stand-in for the Spotify client.
+
+Each benchmark reports the API calls per track in its `extra_info` (written by `--benchmark-json`),
+and fails when a change sends more calls than expected. The benchmarks are skipped by default (see
+`addopts` in `pyproject.toml`), run only the benchmarks with:
+
+    pytest tests/test_benchmarks.py --benchmark-only --benchmark-json=benchmarks.json
+"""
+
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TypeVar, cast
+
+import pandas as pd
+import pytest
+from engine import EnrichmentEngine
+from store import TrackStore
+from utils import (
+    ARTISTS_BATCH_SIZE,
+    AUDIO_FEATURES_BATCH_SIZE,
+    PLAYLIST_PAGE_SIZE,
+    enrich_playlist_stats,
+    fetch_playlist_tracks,
+    find_duplicate_tracks,
+    initialize_playlist_stats,
+)
+
+from tests.fake_spotify import FakeSpotify, create_synthetic_tracks
+
+if TYPE_CHECKING:
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+# Number of tracks in the benchmarked playlists
+SIZES = [100, 2_000, 20_000]
+# Number of times each benchmark is run
+ROUNDS = 3
+
+T = TypeVar("T")
+
+
+def n_batches(n: int, batch_size: int) -> int:
+    """Calculate the number of batches needed to send `n` IDs."""
+    return -(-n // batch_size)
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda size: f"{size}_tracks")
+def sp(request: pytest.FixtureRequest) -> FakeSpotify:
+    """Create a fake Spotify client serving a playlist of each benchmarked size."""
+    return FakeSpotify(create_synthetic_tracks(n_tracks=request.param))
+
+
+def run_benchmark(
+    benchmark: "BenchmarkFixture",
+    sp: FakeSpotify,
+    fn: Callable[..., T],
+    *args: Any,  # noqa: ANN401
+) -> T:
+    """Benchmark `fn` for a number of rounds, resetting the API calls of `sp` before each round."""
+    result = benchmark.pedantic(  # type: ignore[no-untyped-call]
+        fn, args=args, setup=sp.calls.clear, rounds=ROUNDS
+    )
+    return cast(T, result)
+
+
+def benchmark_calls(benchmark: "BenchmarkFixture", sp: FakeSpotify, n_calls: int) -> None:
+    """Report the API calls per track of the last round, and check that no calls were added."""
+    benchmark.extra_info["api_calls"] = dict(sp.calls)
+    benchmark.extra_info["api_calls_per_track"] = sp.n_calls / sp.n_tracks
+    assert sp.n_calls == n_calls
+
+
+def test_benchmark_fetch_playlist_tracks(benchmark: "BenchmarkFixture", sp: FakeSpotify) -> None:
+    """Benchmark fetching all tracks of a playlist, one page at a time."""
+    tracks = run_benchmark(benchmark, sp, fetch_playlist_tracks, sp, "playlist")
+    assert len(tracks) == sp.n_tracks
+    benchmark_calls(benchmark, sp, n_batches(sp.n_tracks, PLAYLIST_PAGE_SIZE))
+
+
+def test_benchmark_initialize_playlist_stats(
+    benchmark: "BenchmarkFixture", sp: FakeSpotify
+) -> None:
+    """Benchmark parsing the tracks of a playlist."""
+    df_playlist = run_benchmark(benchmark, sp, initialize_playlist_stats, sp.tracks)
+    assert len(df_playlist) == sp.n_tracks
+    benchmark_calls(benchmark, sp, 0)
+
+
+def test_benchmark_enrich_playlist_stats(benchmark: "BenchmarkFixture", sp: FakeSpotify) -> None:
+    """Benchmark enriching all tracks with artist details and audio features."""
+    df_playlist = initialize_playlist_stats(sp.tracks)
+    df_enriched = run_benchmark(benchmark, sp, enrich_playlist_stats, sp, df_playlist)
+    assert df_enriched["enriched"].all()
+    assert df_enriched["danceability"].notna().all()
+    benchmark_calls(
+        benchmark,
+        sp,
+        n_batches(df_playlist["artist_uris"].explode().nunique(), ARTISTS_BATCH_SIZE)
+        + n_batches(sp.n_tracks, AUDIO_FEATURES_BATCH_SIZE),
+    )
+
+
+def test_benchmark_upsert_playlist_stats(
+    benchmark: "BenchmarkFixture", sp: FakeSpotify, data_path: Path
+) -> None:
+    """Benchmark upserting a playlist into its dataset in the store, of which half is enriched."""
+    df_playlist = initialize_playlist_stats(sp.tracks)
+    store = TrackStore(data_path / "tracks.sqlite")
+    store.replace("playlist_stats", enrich_playlist_stats(sp, df_playlist[: sp.n_tracks // 2]))
+
+    def upsert_playlist_stats() -> pd.DataFrame:
+        """Upsert the playlist with its stored enrichment, and read the tracks to enrich."""
+        store.upsert("playlist_stats", store.merge(df_playlist))
+        store.retain("playlist_stats", df_playlist["track_id"])
+        return store.pending("playlist_stats")
+
+    df_pending = run_benchmark(benchmark, sp, upsert_playlist_stats)
+    store.close()
+    assert len(df_pending) == sp.n_tracks - sp.n_tracks // 2
+    benchmark_calls(benchmark, sp, 0)
+
+
+def test_benchmark_find_duplicate_tracks(benchmark: "BenchmarkFixture", sp: FakeSpotify) -> None:
+    """Benchmark finding the duplicates of a playlist, of which 1 in 10 tracks is re-released."""
+    df_playlist = initialize_playlist_stats(sp.tracks)
+    # Re-release every 10th track as a remaster, without an ISRC and with another track ID
+    df_rereleases = df_playlist[::10].assign(
+        name=lambda df: df["name"] + " - 2011 Remaster",
+        track_id=lambda df: df["track_id"] + "-remaster",
+        isrc=None,
+    )
+    df_playlist = pd.concat([df_playlist, df_rereleases], ignore_index=True)
+    duplicate_of = run_benchmark(benchmark, sp, find_duplicate_tracks, df_playlist)
+    assert (duplicate_of != duplicate_of.index).sum() == len(df_rereleases)
+    benchmark_calls(benchmark, sp, 0)
+
+
+def test_fake_spotify_rate_limits() -> None:
+    """Test that rate limited calls are retried by the engine, after the `Retry-After` period."""
+    tracks = create_synthetic_tracks(n_tracks=250)
+    sp = FakeSpotify(tracks, latency=0.001, rate_limit_every=3, retry_after=0.01)
+    with EnrichmentEngine(sp, requests_per_second=1_000) as engine:
+        df_playlist = initialize_playlist_stats(fetch_playlist_tracks(engine.client, "playlist"))
+        df_enriched = engine.enrich_playlist_stats(df_playlist)
+    assert df_enriched["track_id"].tolist() == [item["track"]["id"] for item in sp.tracks]
+    assert df_enriched["danceability"].notna().all()
+    assert engine.client.n_rate_limited == sp.n_rate_limited > 0
+    assert sp.n_calls == engine.client.n_requests
@@ -0,0 +1,86 @@
+"""Tests for the API response cache."""
+
+from pathlib import Path
+
+from cache import CachedSpotify, ResponseCache
+from utils import enrich_playlist_stats, initialize_playlist_stats
+
+from tests.fake_spotify import FakeSpotify, create_tracks, load_fixture
+
+
+def test_warm_run_makes_no_calls(tmp_path: Path) -> None:
+    """Test that a warm re-run is served from the cache, with the same result."""
+    sp = FakeSpotify()
+    df_playlist = initialize_playlist_stats(create_tracks(n_tracks=200, n_artists=80))
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+    df_cold = enrich_playlist_stats(CachedSpotify(sp, cache), df_playlist)
+    assert sp.calls["artists"] > 0
+    assert cache.hits.total() == 0
+    cache.close()
+    # Re-open the cache from disk
+    sp.calls.clear()
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+    df_warm = enrich_playlist_stats(CachedSpotify(sp, cache), df_playlist)
+    assert sp.calls.total() == 0
+    assert cache.misses.total() == 0
+    assert df_cold.equals(df_warm)
+
+
+def test_negative_entries(tmp_path: Path) -> None:
+    """Test that IDs for which nothing was returned are cached as negative entries."""
+    sp = FakeSpotify()
+    client = CachedSpotify(sp, ResponseCache(tmp_path / "cache.sqlite"))
+    assert client.audio_features(["unknown", "1"])[0] is None
+    assert client.audio_features(["unknown", "1"])[0] is None
+    assert sp.calls["audio_features"] == 1
+
+
+def test_negative_entries_for_missing_users(tmp_path: Path) -> None:
+    """Test that users for which the API responds with a 404 are cached as negative entries."""
+    sp = FakeSpotify()
+    client = CachedSpotify(sp, ResponseCache(tmp_path / "cache.sqlite"))
+    assert client.user("unknown") is None
+    assert client.user("spotify:user:unknown") is None
+    assert sp.calls["user"] == 1
+
+
+def test_eviction_across_reopens(tmp_path: Path) -> None:
+    """Test that the number of cached responses is tracked across writes and re-opened caches."""
+    cache = ResponseCache(tmp_path / "cache.sqlite", max_entries=3)
+    cache.put_many("user", {"a": {}, "b": {}})
+    cache.put_many("user", {"a": {}, "b": {}})  # replaced, not added
+    cache.close()
+    cache = ResponseCache(tmp_path / "cache.sqlite", max_entries=3)
+    cache.put_many("user", {"c": {}, "d": {}})
+    assert len(cache.get_many("user", ["a", "b", "c", "d"])) == 3  # noqa: PLR2004
+
+
+def test_artist_popularity_expires_apart_from_genres(tmp_path: Path) -> None:
+    """Test that artists are refetched once their popularity expires, but genres are not."""
+    sp = FakeSpotify()
+    cache = ResponseCache(
+        tmp_path / "cache.sqlite", ttls={"artists": None, "artist_popularity": -1}
+    )
+    client = CachedSpotify(sp, cache)
+    genres = load_fixture("artists")[1]["genres"]
+    artist = client.artists(["spotify:artist:1"])["artists"][0]
+    assert artist["genres"] == genres
+    assert artist["popularity"] == 75  # noqa: PLR2004
+    assert client.artist_genres(["spotify:artist:1"]) == [genres]
+    assert sp.calls["artists"] == 1
+    # The popularity expired, so it is fetched again
+    assert client.artist("1") == artist
+    assert sp.calls["artists"] == 2  # noqa: PLR2004
+
+
+def test_ttl_and_eviction(tmp_path: Path) -> None:
+    """Test that expired responses are refetched and least recently used responses are evicted."""
+    sp = FakeSpotify()
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttls={"user": -1}, max_entries=2)
+    client = CachedSpotify(sp, cache)
+    # Users expire immediately, and are therefore fetched twice
+    assert client.user("spotify:user:a") == {"id": "a", "display_name": "A"}
+    assert client.user("a") == {"id": "a", "display_name": "A"}
+    assert sp.calls["user"] == 2  # noqa: PLR2004
+    client.audio_features(["1", "2", "3"])
+    assert len(cache.get_many("audio_features", ["1", "2", "3"])) == 2  # noqa: PLR2004
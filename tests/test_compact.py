@@ -0,0 +1,69 @@
+"""Tests for the dictionary-encoded, compact model of playlist stats."""
+
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from compact import CompactPlaylistStats
+from storage import parse_list_columns
+from utils import enrich_playlist_stats, initialize_playlist_stats
+
+from tests.fake_spotify import FakeSpotify, create_synthetic_tracks, create_tracks
+
+# Playlist stats exported so far, in which artists appear with different popularities and genres
+EXPORT_PATH = Path(__file__).parent.parent / "data" / "playlist_stats_2023_albums.csv"
+
+
+class MissingArtistFakeSpotify(FakeSpotify):
+    """Fake Spotify client that does not find the artists of which the URI ends with a 7."""
+
+    def artists(self: "MissingArtistFakeSpotify", artists: list[str]) -> dict[str, Any]:
+        """Return artist details, or None for missing artists."""
+        response = super().artists(artists)
+        response["artists"] = [
+            None if artist["uri"].endswith("7") else artist for artist in response["artists"]
+        ]
+        return response
+
+
+def test_round_trip() -> None:
+    """Test that the compact model converts back to the same playlist stats, in less memory."""
+    sp = FakeSpotify(create_synthetic_tracks(n_tracks=300))
+    df_stats = enrich_playlist_stats(sp, initialize_playlist_stats(sp.tracks))
+    compact = CompactPlaylistStats.from_playlist_stats(df_stats)
+    pd.testing.assert_frame_equal(compact.to_playlist_stats(), df_stats)
+    assert len(compact) == len(df_stats)
+    assert len(compact.artists) == df_stats["artist_uris"].explode().nunique()
+    assert compact.memory_usage() < df_stats.memory_usage(deep=True).sum()
+    # Only the requested columns are decoded
+    df_genres = compact.to_playlist_stats(["track_id", "artists_genres"])
+    pd.testing.assert_frame_equal(df_genres, df_stats[["track_id", "artists_genres"]])
+
+
+def test_round_trip_export() -> None:
+    """Test that exported playlist stats convert back unchanged, keeping the details per track."""
+    df_stats = parse_list_columns(pd.read_csv(EXPORT_PATH))
+    df_popularities = df_stats[["artist_uris", "artists_popularities"]].explode(
+        ["artist_uris", "artists_popularities"]
+    )
+    assert df_popularities.drop_duplicates()["artist_uris"].duplicated().any()
+    compact = CompactPlaylistStats.from_playlist_stats(df_stats)
+    pd.testing.assert_frame_equal(compact.to_playlist_stats(), df_stats)
+
+
+def test_enrich_matches_dataframe() -> None:
+    """Test that enriching the compact model matches enriching the playlist stats dataframe."""
+    tracks = create_tracks(n_tracks=300, n_artists=40)
+    df_enriched = enrich_playlist_stats(FakeSpotify(), initialize_playlist_stats(tracks[:100]))
+    df_playlist = pd.concat(
+        [df_enriched, initialize_playlist_stats(tracks[100:])], ignore_index=True
+    )
+    sp = MissingArtistFakeSpotify()
+    df_expected = enrich_playlist_stats(sp, df_playlist)
+    n_calls = sp.calls.copy()
+    sp.calls.clear()
+    compact = CompactPlaylistStats.from_playlist_stats(df_playlist).enrich(sp)
+    pd.testing.assert_frame_equal(compact.to_playlist_stats(), df_expected)
+    assert sp.calls == n_calls
+    # The 20 tracks to enrich of which the artist could not be found are dropped
+    assert len(compact) == 280  # noqa: PLR2004
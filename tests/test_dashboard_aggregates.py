@@ -0,0 +1,31 @@
+"""Tests for the precomputed dashboard aggregates."""
+
+import shutil
+from pathlib import Path
+
+import pandas as pd
+from dashboard_aggregates import BOXPLOT_COLUMNS, file_hash, load_aggregates
+
+SOURCE_PATH = Path(__file__).parent.parent / "data" / "playlist_stats_clean.csv"
+
+
+def test_load_aggregates_recomputes_on_change(tmp_path: Path) -> None:
+    """Test that the artifact is reused until the source data changes."""
+    source_path = tmp_path / "playlist_stats_clean.csv"
+    artifact_path = tmp_path / "dashboard_aggregates.pkl"
+    shutil.copy(SOURCE_PATH, source_path)
+    aggregates = load_aggregates(source_path, artifact_path)
+    assert artifact_path.exists()
+    assert aggregates["source_hash"] == file_hash(source_path)
+    assert aggregates["n_tracks"] == len(pd.read_csv(SOURCE_PATH))
+    assert set(aggregates["averages"]) == set(BOXPLOT_COLUMNS)
+    assert aggregates["artists"]["total_items_by"].sum() >= aggregates["artists"]["total_items"]
+    # The artifact is reused as long as the source data is unchanged
+    modified_at = artifact_path.stat().st_mtime_ns
+    load_aggregates(source_path, artifact_path)
+    assert artifact_path.stat().st_mtime_ns == modified_at
+    # The aggregates are recomputed once the source data changed
+    pd.read_csv(SOURCE_PATH).head(10).to_csv(source_path, index=False)
+    aggregates = load_aggregates(source_path, artifact_path)
+    assert aggregates["n_tracks"] == 10  # noqa: PLR2004
+    assert aggregates["source_hash"] == file_hash(source_path)
@@ -0,0 +1,128 @@
+"""Tests for the concurrent enrichment engine."""
+
+import time
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from engine import EnrichmentEngine, RateLimiter, create_clients
+from pipeline import stream_playlist_stats
+from spotipy.exceptions import SpotifyException
+from utils import enrich_playlist_stats, initialize_playlist_stats
+
+from tests.fake_spotify import FakeSpotify, create_synthetic_tracks, create_tracks
+
+
+class RateLimitedFakeSpotify(FakeSpotify):
+    """Fake Spotify client that responds with a 429 to the first request for artists."""
+
+    def artists(self: "RateLimitedFakeSpotify", artists: list[str]) -> dict[str, Any]:
+        """Return artist details, after responding with a 429 once."""
+        if not self.calls["rate_limited"]:
+            self.calls["rate_limited"] += 1
+            raise SpotifyException(429, -1, "Too many requests", headers={"Retry-After": "0.1"})
+        return super().artists(artists)
+
+
+def test_engine_matches_serial_path() -> None:
+    """Test that concurrent enrichment produces the same result as the serial path."""
+    sp = FakeSpotify()
+    df_playlist = initialize_playlist_stats(create_tracks(n_tracks=500, n_artists=300))
+    df_serial = enrich_playlist_stats(sp, df_playlist)
+    sp.calls.clear()
+    with EnrichmentEngine(sp, max_workers=4, requests_per_second=1000) as engine:
+        df_concurrent = engine.enrich_playlist_stats(df_playlist)
+    pd.testing.assert_frame_equal(df_serial, df_concurrent)
+    assert engine.client.n_requests == sp.calls.total()
+    assert engine.requests_per_second > 0
+
+
+def test_engine_honors_retry_after() -> None:
+    """Test that a 429 response pauses the engine and the request is retried."""
+    sp = RateLimitedFakeSpotify()
+    df_playlist = initialize_playlist_stats(create_tracks(n_tracks=10, n_artists=5))
+    start = time.monotonic()
+    with EnrichmentEngine(sp, max_workers=2, requests_per_second=1000) as engine:
+        df_enriched = engine.enrich_playlist_stats(df_playlist)
+    assert time.monotonic() - start >= 0.1  # noqa: PLR2004
+    assert engine.client.n_rate_limited == 1
+    assert df_enriched["enriched"].all()
+
+
+def test_rate_limiter() -> None:
+    """Test that the rate limiter spreads requests at the configured rate."""
+    limiter = RateLimiter(rate=100, burst=1)
+    start = time.monotonic()
+    for _ in range(11):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.1  # noqa: PLR2004
+
+
+def test_engine_streams_pages_concurrently() -> None:
+    """Test that the pipeline produces the same pages when fetching them concurrently."""
+    sp = FakeSpotify(create_tracks(n_tracks=450, n_artists=100))
+    df_serial = pd.concat(stream_playlist_stats(sp, "playlist"))
+    with EnrichmentEngine(sp, max_workers=4, requests_per_second=1000) as engine:
+        frames = stream_playlist_stats(engine.client, "playlist", map_batches=engine.map)
+        df_concurrent = pd.concat(frames)
+    pd.testing.assert_frame_equal(df_serial, df_concurrent)
+
+
+def test_engine_bounds_pages_in_flight() -> None:
+    """Test that a stalled consumer does not cause all pages of the playlist to be fetched."""
+    sp = FakeSpotify(create_tracks(n_tracks=3000, n_artists=100))
+    with EnrichmentEngine(sp, max_workers=2, requests_per_second=1000) as engine:
+        frames = stream_playlist_stats(
+            engine.client, "playlist", queue_depth=1, map_batches=engine.map
+        )
+        next(frames)
+        time.sleep(0.2)
+        # The first page, the pages in flight, and the pages waiting in (or for) the queues
+        assert sp.calls["playlist_tracks"] <= 1 + engine.max_workers + 6
+        frames.close()
+
+
+def test_credential_pool_quarantines_rate_limited_client() -> None:
+    """Test that a rate limited client is quarantined while the other clients carry the load."""
+    clients = [
+        FakeSpotify(create_synthetic_tracks(n_tracks=500), rate_limit_every=1, retry_after=10),
+        FakeSpotify(create_synthetic_tracks(n_tracks=500)),
+        FakeSpotify(create_synthetic_tracks(n_tracks=500)),
+    ]
+    df_playlist = initialize_playlist_stats(clients[1].tracks)
+    start = time.monotonic()
+    with EnrichmentEngine(clients, max_workers=2, requests_per_second=1000) as engine:
+        df_enriched = engine.enrich_playlist_stats(df_playlist)
+    assert time.monotonic() - start < clients[0].retry_after
+    assert df_enriched["danceability"].notna().all()
+    # The first client only received the requests sent before it was quarantined
+    assert clients[0].n_rate_limited == engine.pool.n_rate_limited[0] == clients[0].n_calls > 0
+    assert clients[1].n_calls > 0
+    assert clients[2].n_calls > 0
+
+
+def test_credential_pool_spreads_requests() -> None:
+    """Test that requests are spread evenly across the clients, so their rate limits add up."""
+    n_clients = 3
+    tracks = create_synthetic_tracks(n_tracks=2000)
+    clients = [FakeSpotify(tracks) for _ in range(n_clients)]
+    df_playlist = initialize_playlist_stats(tracks)
+    with EnrichmentEngine(clients, max_workers=1) as engine:
+        engine.enrich_playlist_stats(df_playlist)
+    n_calls = [client.n_calls for client in clients]
+    assert engine.pool.n_requests == n_calls
+    assert max(n_calls) - min(n_calls) <= 1
+
+
+def test_clients_leave_429_to_rate_limiter(data_path: Path) -> None:
+    """Test that the HTTP session of the clients retries server errors, but not 429 responses."""
+    (data_path.parent / "config.ini").write_text(
+        "[spotify]\n"
+        "SPOTIPY_CLIENT_ID = client-id\n"
+        "SPOTIPY_CLIENT_SECRET = client-secret\n"
+        "SPOTIPY_REDIRECT_URI = http://localhost\n"
+    )
+    (client,) = create_clients(["spotify"], data_path.parent / ".cache" / "tokens")
+    retry = client._session.get_adapter("https://api.spotify.com").max_retries  # noqa: SLF001
+    assert not retry.is_retry("GET", 429, has_retry_after=True)
+    assert retry.is_retry("GET", 503)
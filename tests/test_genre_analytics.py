@@ -0,0 +1,56 @@
+"""Tests for the sparse genre and artist co-occurrence analytics."""
+
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from genre_analytics import GenreAnalytics, dataset_hash, load_genre_analytics, parse_list
+
+SOURCE_PATH = Path(__file__).parent.parent / "data" / "playlist_stats_clean.csv"
+
+
+def test_analytics_match_brute_force() -> None:
+    """Test that the sparse products match counting the genres of each track directly."""
+    df_stats = pd.read_csv(SOURCE_PATH)
+    analytics = GenreAnalytics.from_playlist_stats(df_stats)
+    # Genres of each track, as the union of the genres of its artists
+    track_genres = [
+        set().union(*parse_list(genres)) if isinstance(genres, str) else set()
+        for genres in df_stats["artists_genres"]
+    ]
+    pairs = pd.Series(
+        [pair for genres in track_genres for pair in combinations(sorted(genres), 2)]
+    ).value_counts()
+    df_pairs = analytics.top_genre_pairs(5)
+    assert df_pairs["tracks"].tolist() == pairs.head(5).tolist()
+    for first, second, n_tracks in df_pairs.itertuples(index=False):
+        assert pairs[(first, second)] == n_tracks
+    assert analytics.genre_counts()["rock"] == sum("rock" in genres for genres in track_genres)
+    # Genre profile of each contributor
+    profiles = analytics.contributor_genre_profiles()
+    for name, df_added in df_stats.groupby("added_by"):
+        genres = [track_genres[i] for i in df_added.index]
+        assert profiles.loc[name, "indie rock"] == sum("indie rock" in g for g in genres)
+    # Taste similarity is the cosine similarity of the genre profiles
+    similarity = analytics.contributor_similarity()
+    assert np.allclose(np.diag(similarity), 1)
+    hans, thomas = profiles.loc["Hans"].to_numpy(), profiles.loc["Thomas"].to_numpy()
+    cosine = hans @ thomas / np.linalg.norm(hans) / np.linalg.norm(thomas)
+    assert np.isclose(similarity.loc["Hans", "Thomas"], cosine)
+
+
+def test_load_genre_analytics_is_cached_per_dataset(tmp_path: Path) -> None:
+    """Test that the analytics are cached per dataset hash, and rebuilt for a changed dataset."""
+    df_stats = pd.read_csv(SOURCE_PATH)
+    analytics = load_genre_analytics(df_stats, tmp_path)
+    artifact_path = tmp_path / f"{dataset_hash(df_stats)}.pkl"
+    modified_at = artifact_path.stat().st_mtime_ns
+    # The same dataset is loaded from the cache
+    cached = load_genre_analytics(df_stats.copy(), tmp_path)
+    assert artifact_path.stat().st_mtime_ns == modified_at
+    pd.testing.assert_frame_equal(cached.top_genre_pairs(), analytics.top_genre_pairs())
+    # A merged dataset has its own hash, and its analytics are built anew
+    merged = load_genre_analytics([df_stats, df_stats.head(10)], tmp_path)
+    assert len(list(tmp_path.glob("*.pkl"))) == 2  # noqa: PLR2004
+    assert merged.track_artists.shape[0] == len(df_stats) + 10
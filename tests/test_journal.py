@@ -0,0 +1,73 @@
+"""Tests for the crash-safe journal of enriched tracks."""
+
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+from journal import EnrichmentJournal
+from storage import read_playlist_stats
+from sync import sync_playlist
+from utils import enrich_playlist_stats, initialize_playlist_stats
+
+from tests.fake_spotify import FakeSpotify, create_tracks
+
+
+class CrashingFakeSpotify(FakeSpotify):
+    """Fake Spotify client that crashes on a given call to fetch artists."""
+
+    def __init__(self: "CrashingFakeSpotify", tracks: list[dict[str, Any]], crash_at: int) -> None:
+        """Initialize the playlist tracks, crashing on call `crash_at` to fetch artists."""
+        super().__init__(tracks)
+        self.crash_at = crash_at
+
+    def artists(self: "CrashingFakeSpotify", artists: list[str]) -> dict[str, Any]:
+        """Return artist details, or crash."""
+        if self.calls["artists"] + 1 == self.crash_at:
+            msg = "Connection reset"
+            raise RuntimeError(msg)
+        return super().artists(artists)
+
+
+@pytest.mark.usefixtures("data_path")
+def test_interrupted_run_resumes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a run resumes from the tracks journaled before a crash, to the same export."""
+    # Every page of 100 tracks has 100 new artists, fetched in 2 batches
+    tracks = create_tracks(n_tracks=350, n_artists=350)
+    with pytest.raises(RuntimeError):
+        sync_playlist(CrashingFakeSpotify(tracks, crash_at=5), "playlist", "playlist_stats")
+    # The first 2 pages were journaled, but nothing was exported
+    journal_path = Path("./data/playlist_stats.journal.jsonl")
+    assert len(journal_path.read_text().splitlines()) == 200  # noqa: PLR2004
+    assert read_playlist_stats("playlist_stats") is None
+    # The next run only enriches the remaining pages, and discards the journal once exported
+    sp = FakeSpotify(tracks)
+    assert sync_playlist(sp, "playlist", "playlist_stats") == len(tracks)
+    assert sp.calls["audio_features"] == 2  # noqa: PLR2004
+    assert not journal_path.exists()
+    df_resumed = read_playlist_stats("playlist_stats")
+    # Compare with an uninterrupted run
+    (tmp_path / "uninterrupted" / "data").mkdir(parents=True)
+    monkeypatch.chdir(tmp_path / "uninterrupted")
+    sync_playlist(FakeSpotify(tracks), "playlist", "playlist_stats")
+    pd.testing.assert_frame_equal(df_resumed, read_playlist_stats("playlist_stats"))
+
+
+@pytest.mark.usefixtures("data_path")
+def test_journal_drops_partial_line() -> None:
+    """Test that a line cut off by a crash is dropped, and the journal is appended to after it."""
+    tracks = create_tracks(n_tracks=10, n_artists=2)
+    df_enriched = enrich_playlist_stats(FakeSpotify(), initialize_playlist_stats(tracks))
+    with EnrichmentJournal("playlist_stats") as journal:
+        journal.append(df_enriched[:5])
+    with journal.path.open("a") as f:
+        f.write('{"track_id": "5", "enriched": tr')
+    with EnrichmentJournal("playlist_stats") as journal:
+        assert list(journal.records) == ["0", "1", "2", "3", "4"]
+        journal.append(df_enriched[5:])
+    journal = EnrichmentJournal("playlist_stats")
+    assert list(journal.records) == [str(i) for i in range(10)]
+    # Tracks that are not yet enriched take their enrichment from the journal
+    df_resumed = journal.resume(initialize_playlist_stats(tracks))
+    journal.close()
+    pd.testing.assert_frame_equal(df_resumed, df_enriched, check_dtype=False)
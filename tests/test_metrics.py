@@ -0,0 +1,82 @@
+"""Tests for the instrumentation of the API calls and the stages of a run."""
+
+import json
+import logging
+import sqlite3
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+import main
+import pytest
+from cache import ResponseCache
+from engine import EnrichmentEngine
+from metrics import LATENCY_BUCKETS, METRICS_PATH, InstrumentedSpotify, Metrics
+from spotipy.exceptions import SpotifyException
+from store import TrackStore
+from sync import sync_playlist
+
+from tests.fake_spotify import FakeSpotify, create_synthetic_tracks
+
+
+def test_instrumented_spotify() -> None:
+    """Test that calls, 429 responses, retries and response sizes are recorded per endpoint."""
+    sp = FakeSpotify(create_synthetic_tracks(n_tracks=10), rate_limit_every=2)
+    metrics = Metrics()
+    with EnrichmentEngine(InstrumentedSpotify(sp, metrics), metrics=metrics) as engine:
+        engine.client.playlist_tracks("playlist")
+        engine.client.artists(["spotify:artist:1", "spotify:artist:2"])
+    endpoints = metrics.summary()["endpoints"]
+    assert endpoints["playlist_tracks"]["calls"] == 1
+    assert endpoints["artists"]["calls"] == endpoints["artists"]["latency"]["buckets"]["+Inf"]
+    assert endpoints["artists"]["calls"] == 2  # noqa: PLR2004
+    assert endpoints["artists"]["rate_limited"] == endpoints["artists"]["retries"] == 1
+    assert endpoints["artists"]["errors"] == 0
+    assert (
+        endpoints["playlist_tracks"]["bytes_received"] > endpoints["artists"]["bytes_received"] > 0
+    )
+    assert len(endpoints["artists"]["latency"]["buckets"]) == len(LATENCY_BUCKETS) + 1
+
+
+def test_sync_playlist_metrics(data_path: Path) -> None:
+    """Test that the stages of a run are timed, and that the metrics are exported."""
+    sp = FakeSpotify(create_synthetic_tracks(n_tracks=250))
+    metrics = Metrics()
+    sync_playlist(InstrumentedSpotify(sp, metrics), "playlist", "playlist_stats", metrics=metrics)
+    metrics.record_cache(Counter(artists=3), Counter(artists=2, user=1))
+    metrics.write_json(data_path / "metrics.json")
+    metrics.write_prometheus(data_path / "metrics.prom")
+
+    with (data_path / "metrics.json").open() as f:
+        summary = json.load(f)
+    assert set(summary["stages"]) == {"fetch", "load", "parse", "merge", "enrich", "export"}
+    assert summary["calls"] == sp.n_calls
+    assert summary["endpoints"]["artists"]["cache_hits"] == 3  # noqa: PLR2004
+    assert summary["endpoints"]["user"]["cache_misses"] == 1
+    prometheus = (data_path / "metrics.prom").read_text().splitlines()
+    assert 'spotify_api_calls_total{endpoint="playlist_tracks"} 3' in prometheus
+    assert 'spotify_api_latency_seconds_count{endpoint="audio_features"} 3' in prometheus
+    assert any(line.startswith('spotify_stage_seconds{stage="enrich"}') for line in prometheus)
+
+
+def test_main_writes_metrics_on_failure(data_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the cache and store are closed, and the metrics exported, when a run fails."""
+    cache, store = ResponseCache(), TrackStore()
+
+    def fail(*_args: Any, **_kwargs: Any) -> None:  # noqa: ANN401
+        """Fail the run, like an exhausted retry would."""
+        raise SpotifyException(500, -1, "playlist: Internal server error.")
+
+    monkeypatch.setattr(main, "create_clients", lambda _sections: [FakeSpotify()])
+    monkeypatch.setattr(main, "ResponseCache", lambda: cache)
+    monkeypatch.setattr(main, "TrackStore", lambda: store)
+    monkeypatch.setattr(main, "sync_playlist", fail)
+    monkeypatch.setattr(main, "logger", logging.getLogger("spotify"), raising=False)
+    with pytest.raises(SpotifyException):
+        main.main()
+    with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+        cache.get_many("user", ["a"])
+    with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+        store.datasets()
+    assert Path(METRICS_PATH).exists()
+    assert data_path.joinpath("metrics.prom").exists()
@@ -0,0 +1,41 @@
+"""Tests for the notebook functions."""
+
+import pandas as pd
+from notebook_functions import count_all_items, count_items, top_items_added_by
+
+
+def create_stats() -> pd.DataFrame:
+    """Create playlist stats with (nested) list columns, as loaded from CSV."""
+    return pd.DataFrame(
+        {
+            "added_by": ["Sandra", "Hans", "Sandra", "Thomas"],
+            "artist_names": ["['a', 'b']", "['b']", "['a', 'c']", "[]"],
+            "artists_genres": ["[['pop', 'rock'], ['pop']]", "[['pop']]", "[[], ['jazz']]", "[]"],
+        }
+    )
+
+
+def test_count_all_items() -> None:
+    """Test that items in (nested) list columns are counted across all tracks."""
+    df_stats = create_stats()
+    assert count_all_items(df_stats, "artist_names").to_dict() == {"a": 2, "b": 2, "c": 1}
+    assert count_all_items(df_stats, "artists_genres").to_dict() == {"pop": 3, "rock": 1, "jazz": 1}
+
+
+def test_count_items() -> None:
+    """Test that the counts per contributor and the unique totals come from a single pass."""
+    item_counts = count_items(create_stats(), "artists_genres", n=1)
+    assert item_counts["total_items"] == 3  # noqa: PLR2004
+    assert item_counts["counts_by"][("Sandra", "pop")] == 2  # noqa: PLR2004
+    assert item_counts["total_items_by"].to_dict() == {"Hans": 1, "Sandra": 3}
+    assert item_counts["top_items_by"].to_dict() == {("Sandra", "pop"): 2, ("Hans", "pop"): 1}
+
+
+def test_top_items_added_by() -> None:
+    """Test that the top items are listed per contributor, including contributors without items."""
+    contributors_stats = top_items_added_by(create_stats(), "artist_names", n=1)
+    assert list(contributors_stats) == ["Sandra", "Hans", "Thomas"]
+    assert contributors_stats["Sandra"]["total_items"] == 3  # noqa: PLR2004
+    assert contributors_stats["Sandra"]["top_items"].to_dict() == {"a": 2}  # type: ignore[union-attr]
+    assert contributors_stats["Sandra"]["top_items_all"].to_dict() == {"a": 2, "b": 1, "c": 1}  # type: ignore[union-attr]
+    assert contributors_stats["Thomas"]["total_items"] == 0
@@ -0,0 +1,90 @@
+"""Tests for the streaming pipeline."""
+
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from pipeline import PUT_TIMEOUT, run_stage, stream_playlist_stats
+from store import TrackStore
+from utils import (
+    ARTISTS_BATCH_SIZE,
+    PLAYLIST_PAGE_SIZE,
+    PLAYLIST_STATS_COLUMNS,
+    export_playlist_stats,
+    fetch_playlist_tracks,
+)
+
+from tests.fake_spotify import FakeSpotify, create_tracks
+
+
+def test_stream_playlist_stats() -> None:
+    """Test that all pages are enriched in order, fetching each unique artist only once."""
+    n_tracks = 250
+    n_artists = 60
+    sp = FakeSpotify(create_tracks(n_tracks=n_tracks, n_artists=n_artists))
+    frames = list(stream_playlist_stats(sp, "playlist", queue_depth=1))
+    assert [len(df_page) for df_page in frames] == [
+        PLAYLIST_PAGE_SIZE,
+        PLAYLIST_PAGE_SIZE,
+        n_tracks % PLAYLIST_PAGE_SIZE,
+    ]
+    df_playlist = pd.concat(frames, ignore_index=True)
+    assert df_playlist["track_id"].tolist() == [str(i) for i in range(n_tracks)]
+    assert df_playlist["enriched"].all()
+    assert sp.calls["playlist_tracks"] == len(frames)
+    # All unique artists are fetched once, while enriching the first page
+    assert sp.calls["artists"] == -(-n_artists // ARTISTS_BATCH_SIZE)
+    assert len(fetch_playlist_tracks(sp, "playlist")) == n_tracks
+
+
+def test_stream_playlist_stats_reuses_stored_data(tmp_path: Path) -> None:
+    """Test that previously enriched tracks are not enriched again."""
+    sp = FakeSpotify(create_tracks(n_tracks=10, n_artists=5))
+    store = TrackStore(tmp_path / "tracks.sqlite")
+    store.replace("playlist_stats", pd.concat(stream_playlist_stats(sp, "playlist")))
+    sp.calls.clear()
+    df_playlist = pd.concat(stream_playlist_stats(sp, "playlist", store=store))
+    store.close()
+    assert df_playlist["enriched"].all()
+    assert sp.calls["artists"] == sp.calls["audio_features"] == 0
+
+
+def test_stream_playlist_stats_propagates_errors() -> None:
+    """Test that an error in a background stage is raised in the consumer."""
+    sp = FakeSpotify(create_tracks(n_tracks=150, n_artists=5))
+    sp.tracks[120] = {"track": {"name": "malformed"}}  # malformed track on the second page
+    with pytest.raises(KeyError):
+        list(stream_playlist_stats(sp, "playlist"))
+
+
+def test_run_stage_stops_when_consumer_stops() -> None:
+    """Test that a stage exits, rather than blocking on a full queue, once the consumer stops."""
+    finished = threading.Event()
+
+    def source() -> Iterator[int]:
+        """Yield items endlessly, until the stage is stopped."""
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+        finally:
+            finished.set()
+
+    stage = run_stage(source, queue_depth=1)
+    assert next(stage) == 0
+    stage.close()
+    assert finished.wait(timeout=10 * PUT_TIMEOUT)
+
+
+def test_export_playlist_stats(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that chunks are exported with aligned columns."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    sp = FakeSpotify(create_tracks(n_tracks=150, n_artists=5))
+    n_tracks = export_playlist_stats(stream_playlist_stats(sp, "playlist"), "playlist_stats")
+    df_playlist = pd.read_csv("./data/playlist_stats.csv")
+    assert n_tracks == len(df_playlist) == len(sp.tracks)
+    assert list(df_playlist.columns) == PLAYLIST_STATS_COLUMNS
@@ -0,0 +1,61 @@
+"""Tests for the nearest-neighbour index over audio features."""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from similarity import SIMILARITY_FEATURES, SimilarityIndex
+
+
+def create_stats(n_tracks: int) -> pd.DataFrame:
+    """Create enriched playlist stats with random audio features, added by three people."""
+    rng = np.random.default_rng(0)
+    df_stats = pd.DataFrame(rng.normal(size=(n_tracks, len(SIMILARITY_FEATURES))))
+    df_stats.columns = SIMILARITY_FEATURES
+    return df_stats.assign(
+        track_id=[str(i) for i in range(n_tracks)],
+        name=[f"track {i}" for i in range(n_tracks)],
+        artist="artist",
+        added_by=[["Sandra", "Hans", "Thomas"][i % 3] for i in range(n_tracks)],
+    )
+
+
+def test_query_matches_brute_force() -> None:
+    """Test that the batched search returns the same neighbours as a brute-force search."""
+    df_stats = create_stats(n_tracks=300)
+    index = SimilarityIndex.from_playlist_stats(df_stats)
+    df_results = index.query(["0", "7"], k=5)
+    assert df_results["rank"].tolist() == [1, 2, 3, 4, 5] * 2
+    # Brute force: cosine similarity of the standardized features
+    features = df_stats[SIMILARITY_FEATURES].to_numpy()
+    features = (features - features.mean(axis=0)) / features.std(axis=0)
+    features /= np.linalg.norm(features, axis=1, keepdims=True)
+    similarities = features[7] @ features.T
+    similarities[7] = -np.inf
+    expected = [str(i) for i in np.argsort(-similarities)[:5]]
+    assert df_results.loc[df_results["query_track_id"] == "7", "track_id"].tolist() == expected
+    assert df_results.groupby("query_track_id")["similarity"].is_monotonic_decreasing.all()
+    assert (df_results["track_id"] != df_results["query_track_id"]).all()
+
+
+def test_query_other_contributor() -> None:
+    """Test that only tracks added by other contributors are returned, when asked for."""
+    index = SimilarityIndex.from_playlist_stats(create_stats(n_tracks=30))
+    df_results = index.query(index.tracks["track_id"].tolist(), k=3, other_contributor=True)
+    added_by = dict(zip(index.tracks["track_id"], index.tracks["added_by"], strict=True))
+    assert len(df_results) == len(index) * 3
+    assert (df_results["query_track_id"].map(added_by) != df_results["added_by"]).all()
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    """Test that a persisted index answers queries like the original one."""
+    df_stats = create_stats(n_tracks=50)
+    df_stats.loc[3, "energy"] = np.nan
+    index = SimilarityIndex.from_playlist_stats([df_stats.head(30), df_stats.tail(30)])
+    assert len(index) == 50 - 1
+    index.save(tmp_path / "similarity_index.npz")
+    loaded = SimilarityIndex.load(tmp_path / "similarity_index.npz")
+    pd.testing.assert_frame_equal(loaded.query("0"), index.query("0"))
+    pd.testing.assert_frame_equal(
+        loaded.query_features(df_stats.tail(2)), index.query_features(df_stats.tail(2))
+    )
@@ -0,0 +1,72 @@
+"""Tests for the cold start of the command line scripts."""
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from engine import create_clients
+
+from tests.fake_spotify import FakeSpotify, create_synthetic_tracks
+
+# Root of the repository
+ROOT_PATH = Path(__file__).parent.parent
+# Heavy modules that are imported only once a dataframe is built
+HEAVY_MODULES = ["numpy", "pandas", "pyarrow", "scipy"]
+
+
+def run_python(code: str, cwd: Path = ROOT_PATH) -> list[str]:
+    """Run code in a fresh interpreter, returning the heavy modules it imported."""
+    code = (
+        "import sys\n"
+        f"sys.path[:0] = [{str(ROOT_PATH / 'spotify')!r}, {str(ROOT_PATH)!r}]\n"
+        f"{code}\n"
+        f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],  # noqa: S603
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [name for name in result.stdout.strip().split(",") if name]
+
+
+def test_cli_imports_are_lazy() -> None:
+    """Test that the command line scripts do not import heavy modules at startup."""
+    assert run_python("import batch, main") == []
+
+
+def test_unchanged_playlist_skips_heavy_imports(data_path: Path) -> None:
+    """Test that checking an unchanged playlist does not import heavy modules."""
+    snapshot_id = FakeSpotify(create_synthetic_tracks(10)).playlist("playlist")["snapshot_id"]
+    with (data_path / "playlist_stats.sync.json").open("w") as f:
+        json.dump({"snapshot_id": snapshot_id, "added_at": None}, f)
+    code = (
+        "from sync import sync_playlist\n"
+        "from tests.fake_spotify import FakeSpotify, create_synthetic_tracks\n"
+        "sp = FakeSpotify(create_synthetic_tracks(10))\n"
+        "assert sync_playlist(sp, 'playlist', 'playlist_stats') is None"
+    )
+    assert run_python(code, cwd=data_path.parent) == []
+
+
+def test_token_cache(data_path: Path) -> None:
+    """Test that a cached access token is reused by new clients until it expires."""
+    (data_path.parent / "config.ini").write_text(
+        "[spotify]\n"
+        "SPOTIPY_CLIENT_ID = client-id\n"
+        "SPOTIPY_CLIENT_SECRET = client-secret\n"
+        "SPOTIPY_REDIRECT_URI = http://localhost\n"
+    )
+    token_path = data_path.parent / ".cache" / "tokens"
+    (client,) = create_clients(["spotify"], token_path)
+    client.auth_manager.cache_handler.save_token_to_cache(
+        {"access_token": "token", "token_type": "Bearer", "expires_at": int(time.time()) + 3600}
+    )
+    assert (token_path / "client-id.json").stat().st_mode & 0o777 == 0o600  # noqa: PLR2004
+    # A new client (e.g. of the next run) gets the token without a token exchange
+    (client,) = create_clients(["spotify"], token_path)
+    assert client.auth_manager.get_access_token(as_dict=False) == "token"
@@ -0,0 +1,40 @@
+"""Tests for the Parquet storage of playlist stats."""
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from pipeline import stream_playlist_stats
+from storage import convert_csv_to_parquet, read_playlist_stats, write_playlist_stats
+
+from tests.fake_spotify import FakeSpotify, create_tracks
+
+
+@pytest.mark.usefixtures("data_path")
+def test_parquet_round_trip() -> None:
+    """Test that list columns are stored natively and read back as lists."""
+    sp = FakeSpotify(create_tracks(n_tracks=150, n_artists=5))
+    df_playlist = pd.concat(stream_playlist_stats(sp, "playlist"), ignore_index=True)
+    write_playlist_stats(stream_playlist_stats(sp, "playlist"), "playlist_stats")
+    df_stored = read_playlist_stats("playlist_stats")
+    assert df_stored is not None
+    assert df_stored["artists_genres"].tolist() == df_playlist["artists_genres"].tolist()
+    assert df_stored["artist_uris"].tolist() == df_playlist["artist_uris"].tolist()
+    assert df_stored["added_at"].equals(df_playlist["added_at"])
+    df_projected = read_playlist_stats("playlist_stats", columns=["track_id", "artist_names"])
+    assert df_projected is not None
+    assert list(df_projected.columns) == ["track_id", "artist_names"]
+
+
+def test_convert_csv_to_parquet(data_path: Path) -> None:
+    """Test that existing CSV exports are converted, parsing their list columns."""
+    df_csv = pd.read_csv(Path(__file__).parent.parent / "data" / "playlist_stats_clean.csv")
+    df_csv.head(20).to_csv(data_path / "playlist_stats.csv", index=False)
+    df_from_csv = read_playlist_stats("playlist_stats")
+    convert_csv_to_parquet(data_path / "playlist_stats.csv")
+    df_from_parquet = read_playlist_stats("playlist_stats")
+    assert df_from_csv is not None
+    assert df_from_parquet is not None
+    assert isinstance(df_from_parquet.loc[0, "artists_genres"][0], list)
+    assert df_from_parquet["artists_genres"].tolist() == df_from_csv["artists_genres"].tolist()
+    assert df_from_parquet["added_by"].tolist() == df_from_csv["added_by"].tolist()
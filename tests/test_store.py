@@ -0,0 +1,85 @@
+"""Tests for the local track store, of which the exports are views."""
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from storage import FileFormat, read_playlist_stats, write_playlist_stats
+from store import TrackStore
+from sync import sync_playlist
+from utils import PLAYLIST_STATS_COLUMNS
+
+from tests.fake_spotify import FakeSpotify, create_tracks
+
+
+@pytest.mark.usefixtures("data_path")
+def test_sync_playlist_upserts_changes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that only changed tracks are upserted and enriched, to the same export as a full run."""
+    tracks = create_tracks(n_tracks=260, n_artists=5)
+    sp = FakeSpotify(tracks[:250])
+    sync_playlist(sp, "playlist", "playlist_stats")
+    # Remove a track, append new tracks, and move the first track to the end
+    readded = {**tracks[0], "added_at": "2024-01-01T00:00:00Z"}
+    sp.tracks = [track for track in tracks[1:] if track["track"]["id"] != "5"] + [readded]
+    sp.calls.clear()
+    assert sync_playlist(sp, "playlist", "playlist_stats") == len(sp.tracks)
+    # Only the 10 new tracks are enriched
+    assert sp.calls["audio_features"] == 1
+    store = TrackStore()
+    assert store.datasets() == ["playlist_stats"]
+    assert store.pending("playlist_stats").empty
+    assert store.track_ids("playlist_stats") == [track["track"]["id"] for track in sp.tracks]
+    store.close()
+    df_synced = read_playlist_stats("playlist_stats")
+    # Compare with a run from scratch
+    (tmp_path / "scratch" / "data").mkdir(parents=True)
+    monkeypatch.chdir(tmp_path / "scratch")
+    sync_playlist(FakeSpotify(sp.tracks), "playlist", "playlist_stats")
+    pd.testing.assert_frame_equal(df_synced, read_playlist_stats("playlist_stats"))
+
+
+def test_store_serves_multiple_datasets(data_path: Path) -> None:
+    """Test that the enrichment of tracks is shared by datasets, and exports are imported once."""
+    tracks = create_tracks(n_tracks=300, n_artists=60)
+    store = TrackStore(data_path / "tracks.sqlite")
+    sync_playlist(FakeSpotify(tracks[:200]), "a", "playlist_stats_a", store=store)
+    # The tracks that are shared with the first playlist are not enriched again
+    sp = FakeSpotify(tracks[100:])
+    sync_playlist(sp, "b", "playlist_stats_b", store=store)
+    assert sp.calls["audio_features"] == 1
+    # A previous export is imported into the store, so its tracks are not enriched again
+    df_stats = read_playlist_stats("playlist_stats_a")
+    assert df_stats is not None
+    write_playlist_stats([df_stats], "playlist_stats_c", "csv")
+    sp = FakeSpotify([*tracks[:150], *tracks[250:]])
+    store_c = TrackStore(data_path / "c.sqlite")
+    sync_playlist(sp, "c", "playlist_stats_c", "csv", store=store_c)
+    assert sp.calls["audio_features"] == 1
+    store_c.close()
+    assert store.datasets() == ["playlist_stats_a", "playlist_stats_b"]
+    df_b = store.read("playlist_stats_b")
+    assert df_b is not None
+    assert df_b["track_id"].tolist() == [track["track"]["id"] for track in tracks[100:]]
+    assert df_b["enriched"].all()
+    store.close()
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "csv"])
+def test_store_keeps_extra_columns(data_path: Path, file_format: FileFormat) -> None:
+    """Test that extra columns of an export survive its import into the store and re-export."""
+    tracks = create_tracks(n_tracks=150, n_artists=5)
+    sync_playlist(FakeSpotify(tracks[:100]), "playlist", "playlist_stats", file_format)
+    # Add the display names of the users, as `fetch_user_names` does
+    df_stats = read_playlist_stats("playlist_stats", file_format=file_format)
+    assert df_stats is not None
+    df_stats["added_by"] = [f"user {i}" for i in range(len(df_stats))]
+    write_playlist_stats([df_stats], "playlist_stats", file_format)
+    # Import the export into an empty store, and re-export it with new tracks
+    store = TrackStore(data_path / "imported.sqlite")
+    sync_playlist(FakeSpotify(tracks), "playlist", "playlist_stats", file_format, store=store)
+    store.close()
+    df_synced = read_playlist_stats("playlist_stats", file_format=file_format)
+    assert df_synced is not None
+    assert list(df_synced.columns) == [*PLAYLIST_STATS_COLUMNS, "added_by"]
+    assert df_synced["added_by"].iloc[:100].tolist() == df_stats["added_by"].tolist()
+    assert df_synced["added_by"].iloc[100:].isna().all()
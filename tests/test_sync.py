@@ -0,0 +1,93 @@
+"""Tests for the incremental synchronization of playlist stats."""
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from journal import EnrichmentJournal
+from pipeline import stream_playlist_stats
+from storage import read_playlist_stats, write_playlist_stats
+from store import TrackStore
+from sync import fetch_snapshot_id, load_sync_state, save_sync_state, sync_dataset
+from utils import PLAYLIST_PAGE_SIZE
+
+from tests.fake_spotify import FakeSpotify, create_tracks
+
+
+def import_playlist(sp: FakeSpotify, data_path: Path) -> TrackStore:
+    """Export the playlist along with its sync state, and import the export into a store."""
+    store = TrackStore(data_path / "tracks.sqlite")
+    store.replace("playlist_stats", export_playlist(sp))
+    return store
+
+
+def export_playlist(sp: FakeSpotify) -> pd.DataFrame:
+    """Export the playlist along with its sync state, and return the export."""
+    write_playlist_stats(stream_playlist_stats(sp, "playlist"), "playlist_stats")
+    save_sync_state("playlist_stats", fetch_snapshot_id(sp, "playlist"))
+    df_outdated = read_playlist_stats("playlist_stats")
+    assert df_outdated is not None
+    return df_outdated
+
+
+@pytest.mark.usefixtures("data_path")
+def test_sync_state_round_trip() -> None:
+    """Test that the snapshot ID and `added_at` high-water mark are stored next to the export."""
+    tracks = create_tracks(n_tracks=10, n_artists=2)
+    tracks[3]["added_at"] = "2023-06-01T12:00:00Z"
+    sp = FakeSpotify(tracks)
+    assert load_sync_state("playlist_stats") is None
+    export_playlist(sp)
+    sync_state = load_sync_state("playlist_stats")
+    assert sync_state is not None
+    assert sync_state["snapshot_id"] == fetch_snapshot_id(sp, "playlist")
+    assert pd.Timestamp(sync_state["added_at"]) == pd.Timestamp("2023-06-01T12:00:00Z")
+    # The snapshot ID changes along with the tracks
+    sp.tracks = sp.tracks[1:]
+    assert sync_state["snapshot_id"] != fetch_snapshot_id(sp, "playlist")
+
+
+def test_sync_dataset_delta(data_path: Path) -> None:
+    """Test that only the pages holding new tracks are fetched, and removed tracks are dropped."""
+    tracks = create_tracks(n_tracks=260, n_artists=5)
+    sp = FakeSpotify(tracks[:250])
+    store = import_playlist(sp, data_path)
+    sync_state = load_sync_state("playlist_stats")
+    assert sync_state is not None
+    # Remove a track, and append new tracks
+    sp.tracks = [track for track in tracks if track["track"]["id"] != "5"]
+    sp.fields = None
+    sp.calls.clear()
+    with EnrichmentJournal("playlist_stats") as journal:
+        sync_dataset(sp, "playlist", "playlist_stats", sync_state, store, journal)
+    # All pages are listed, but only the last page is fetched in full
+    n_pages = -(-len(sp.tracks) // PLAYLIST_PAGE_SIZE)
+    assert sp.calls["playlist_tracks"] == n_pages + 1
+    # Only the new tracks are enriched
+    assert sp.calls["audio_features"] == 1
+    assert store.track_ids("playlist_stats") == [track["track"]["id"] for track in sp.tracks]
+    assert store.pending("playlist_stats").empty
+    store.close()
+
+
+def test_sync_dataset_readded_track(data_path: Path) -> None:
+    """Test that a track added after the high-water mark is updated, keeping its enrichment."""
+    tracks = create_tracks(n_tracks=20, n_artists=5)
+    sp = FakeSpotify(tracks)
+    store = import_playlist(sp, data_path)
+    sync_state = load_sync_state("playlist_stats")
+    assert sync_state is not None
+    # Move the first track to the end of the playlist, as if it was removed and added again
+    readded = {**tracks[0], "added_at": "2024-01-01T00:00:00Z"}
+    sp.tracks = [*tracks[1:], readded]
+    sp.calls.clear()
+    with EnrichmentJournal("playlist_stats") as journal:
+        sync_dataset(sp, "playlist", "playlist_stats", sync_state, store, journal)
+    df_playlist = store.read("playlist_stats")
+    store.close()
+    assert df_playlist is not None
+    assert len(df_playlist) == len(tracks)
+    assert df_playlist["track_id"].iloc[-1] == "0"
+    assert df_playlist["added_at"].iloc[-1] == pd.Timestamp("2024-01-01T00:00:00Z")
+    assert df_playlist["enriched"].all()
+    assert sp.calls["audio_features"] == 0
@@ -0,0 +1,289 @@
+"""Tests for the utility functions."""
+
+import copy
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+from utils import (
+    ARTIST_DETAILS,
+    ARTISTS_BATCH_SIZE,
+    AUDIO_FEATURES,
+    AUDIO_FEATURES_BATCH_SIZE,
+    PLAYLIST_PAGE_SIZE,
+    PLAYLIST_TRACK_FIELDS,
+    PLAYLIST_TRACK_URI_FIELDS,
+    calculate_playlist_overlap,
+    calculate_playlist_overlaps,
+    drop_duplicate_tracks,
+    enrich_playlist_stats,
+    fetch_artist_details,
+    fetch_audio_features,
+    fetch_playlist_tracks,
+    fetch_user_names,
+    find_duplicate_tracks,
+    get_playlist_track_uris,
+    initialize_playlist_stats,
+    load_user_aliases,
+    parse_track_details,
+    transform_track_duration,
+    transform_track_durations,
+)
+
+from tests.fake_spotify import FakeSpotify, create_tracks, load_fixture
+
+# Artists served by the fake client, picked by the last character of their ID
+ARTISTS = load_fixture("artists")
+
+
+def create_playlist(n_tracks: int, n_artists: int) -> pd.DataFrame:
+    """Create a playlist dataframe in which tracks share a limited set of artists."""
+    return pd.DataFrame(
+        {
+            "name": [f"track {i}" for i in range(n_tracks)],
+            "artist": [f"artist {i % n_artists}" for i in range(n_tracks)],
+            "track_id": [str(i) for i in range(n_tracks)],
+            "track_uri": [f"spotify:track:{i}" for i in range(n_tracks)],
+            "artist_uris": [
+                [f"spotify:artist:{i % n_artists}", f"spotify:artist:{(i + 1) % n_artists}"]
+                for i in range(n_tracks)
+            ],
+            "enriched": False,
+        }
+    )
+
+
+def test_fetch_artist_details_batched() -> None:
+    """Test that unique artists are fetched in batches of 50 and joined onto each track."""
+    sp = FakeSpotify()
+    n_artists = 120
+    df_playlist = create_playlist(n_tracks=300, n_artists=n_artists)
+    df_artist_details = fetch_artist_details(sp, df_playlist)
+    assert sp.calls["artists"] == -(-n_artists // ARTISTS_BATCH_SIZE)
+    assert list(df_artist_details.columns) == [
+        "artists_genres",
+        "artists_popularities",
+        "artists_avg_popularity",
+    ]
+    assert df_artist_details.loc[1, "artists_genres"] == [
+        ARTISTS[1]["genres"],
+        ARTISTS[2]["genres"],
+    ]
+    assert df_artist_details.loc[1, "artists_popularities"] == [75, 65]
+    assert df_artist_details.loc[1, "artists_avg_popularity"] == (75 + 65) / 2
+
+
+def test_fetch_artist_details_string_uris() -> None:
+    """Test that string representations of artist URIs (as loaded from CSV) are parsed."""
+    sp = FakeSpotify()
+    df_playlist = create_playlist(n_tracks=2, n_artists=5)
+    df_playlist["artist_uris"] = df_playlist["artist_uris"].astype(str)
+    df_artist_details = fetch_artist_details(sp, df_playlist)
+    assert df_artist_details.loc[0, "artists_popularities"] == [74, 75]
+
+
+def test_enrich_playlist_stats_skips_enriched() -> None:
+    """Test that only tracks that have not yet been enriched are fetched."""
+    sp = FakeSpotify()
+    df_playlist = create_playlist(n_tracks=4, n_artists=8)
+    df_playlist.loc[[0, 1], "enriched"] = True
+    df_enriched = enrich_playlist_stats(sp, df_playlist)
+    assert len(df_enriched) == len(df_playlist)
+    assert df_enriched["enriched"].all()
+    assert df_enriched.loc[3, "artists_popularities"] == [74, 75]
+    assert df_enriched.loc[3, "danceability"] == 0.81  # noqa: PLR2004
+    assert sp.calls["audio_features"] == 1
+
+
+class MissingArtistsFakeSpotify(FakeSpotify):
+    """Fake Spotify client that does not find any artist."""
+
+    def artists(self: "MissingArtistsFakeSpotify", artists: list[str]) -> dict[str, Any]:
+        """Return None for every artist."""
+        super().artists(artists)
+        return {"artists": [None] * len(artists)}
+
+
+def test_enrich_playlist_stats_no_artists_found() -> None:
+    """Test that tracks are dropped, rather than failing, when none of the artists are found."""
+    df_playlist = create_playlist(n_tracks=4, n_artists=8)
+    df_enriched = enrich_playlist_stats(MissingArtistsFakeSpotify(), df_playlist)
+    assert df_enriched.empty
+    assert set(AUDIO_FEATURES + ARTIST_DETAILS).issubset(df_enriched.columns)
+
+
+def test_fetch_audio_features_batched() -> None:
+    """Test that audio features are fetched in batches of 100 and unknown tracks get nulls."""
+    sp = FakeSpotify()
+    n_tracks = 250
+    df_playlist = create_playlist(n_tracks=n_tracks, n_artists=10)
+    df_playlist.loc[3, "track_id"] = "unknown"
+    df_audio_features = fetch_audio_features(sp, df_playlist)
+    assert sp.calls["audio_features"] == -(-n_tracks // AUDIO_FEATURES_BATCH_SIZE)
+    assert list(df_audio_features.columns) == AUDIO_FEATURES
+    assert df_audio_features.loc[3].isna().all()
+    assert df_audio_features.drop(index=3).notna().all().all()
+
+
+def test_initialize_playlist_stats() -> None:
+    """Test that the columnar builder matches the per-track parser, with proper dtypes."""
+    with (Path(__file__).parent.parent / "data" / "json" / "track.json").open() as f:
+        track = json.load(f)
+    removed_track = {**copy.deepcopy(track), "track": None}
+    df_playlist = initialize_playlist_stats([track, removed_track, track])
+    assert len(df_playlist) == 2  # noqa: PLR2004
+    assert df_playlist["duration_ms"].dtype == "int64"
+    assert df_playlist["track_popularity"].dtype == "int64"
+    assert df_playlist["added_at"].dtype == "datetime64[ns, UTC]"
+    assert df_playlist["enriched"].dtype == "bool"
+    track_details = parse_track_details(track)
+    assert list(df_playlist.columns) == list(track_details)
+    row = df_playlist.iloc[0].to_dict()
+    assert row.pop("added_at") == pd.Timestamp(track_details.pop("added_at"))
+    assert row == track_details
+
+
+def test_transform_track_durations() -> None:
+    """Test that the vectorized duration transformation matches the per-track transformation."""
+    durations_ms = pd.Series([0, 999, 61_000, 146_571, 3_600_000])
+    expected = [transform_track_duration(duration_ms) for duration_ms in durations_ms]
+    assert transform_track_durations(durations_ms).tolist() == expected
+
+
+def test_fetch_playlist_tracks_concurrently() -> None:
+    """Test that pages fetched concurrently by offset are reassembled in playlist order."""
+    n_tracks = 1_050
+    sp = FakeSpotify(create_tracks(n_tracks=n_tracks, n_artists=10))
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        tracks = fetch_playlist_tracks(sp, "playlist", map_pages=executor.map)
+        track_uris = get_playlist_track_uris(sp, "playlist", map_pages=executor.map)
+    assert tracks == sp.tracks
+    assert track_uris == [f"spotify:track:{i}" for i in range(n_tracks)]
+    assert sp.calls["playlist_tracks"] == 2 * -(-n_tracks // PLAYLIST_PAGE_SIZE)
+    assert sp.fields == PLAYLIST_TRACK_URI_FIELDS
+
+
+def test_initialize_playlist_stats_with_fields() -> None:
+    """Test that the tracks can be parsed when only `PLAYLIST_TRACK_FIELDS` are requested."""
+    track = create_tracks(n_tracks=1, n_artists=1)[0]
+    projected_track = {
+        "added_at": track["added_at"],
+        "added_by": {"id": track["added_by"]["id"]},
+        "track": {
+            **{
+                key: track["track"][key]
+                for key in ("name", "id", "uri", "duration_ms", "popularity", "external_ids")
+            },
+            "artists": [{"name": a["name"], "uri": a["uri"]} for a in track["track"]["artists"]],
+            "album": {
+                key: track["track"]["album"][key] for key in ("name", "album_type", "release_date")
+            },
+        },
+    }
+    for field in (
+        "added_at",
+        "added_by.id",
+        "external_ids(isrc)",
+        "artists(name,uri)",
+        "album(name,album_type",
+    ):
+        assert field in PLAYLIST_TRACK_FIELDS
+    pd.testing.assert_frame_equal(
+        initialize_playlist_stats([projected_track]), initialize_playlist_stats([track])
+    )
+
+
+def test_fetch_user_names() -> None:
+    """Test that each unseen user is fetched once, and aliases are applied by ID or name."""
+    sp = FakeSpotify()
+    df_stats = pd.DataFrame({"added_by_id": ["svdpal", "thomas", "anna", "thomas", None]})
+    users: dict[Any, str] = {"anna": "Anna"}
+    aliases = {"svdpal": "Sandra", "THOMAS": "Thomas"}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        df_named = fetch_user_names(sp, df_stats, users, aliases, map_batches=executor.map)
+    assert df_named["added_by"].tolist()[:4] == ["Sandra", "Thomas", "Anna", "Thomas"]
+    assert pd.isna(df_named["added_by"].iloc[-1])
+    assert sp.calls["user"] == 2  # noqa: PLR2004
+    # Users are remembered across calls
+    fetch_user_names(sp, df_stats, users, aliases)
+    assert sp.calls["user"] == 2  # noqa: PLR2004
+
+
+def test_load_user_aliases(data_path: Path) -> None:
+    """Test that aliases are loaded from config.ini, keeping the case of IDs and names."""
+    assert load_user_aliases() == {}
+    (data_path.parent / "config.ini").write_text(
+        "[spotify]\nSPOTIPY_CLIENT_ID = client-id\n\n[aliases]\nsvdpal = Sandra\nThomas B = Thomas\n"
+    )
+    assert load_user_aliases() == {"svdpal": "Sandra", "Thomas B": "Thomas"}
+
+
+def test_calculate_playlist_overlaps() -> None:
+    """Test that the overlap matrix matches the set-based percentage of each pair."""
+    playlists = {
+        "a": ["1", "2", "3", "3"],
+        "b": ["2", "3", "4", "5", "6"],
+        "c": ["7"],
+        "d": [],
+    }
+    df_overlap, df_jaccard = calculate_playlist_overlaps(playlists)
+    for first, first_uris in playlists.items():
+        for second, second_uris in playlists.items():
+            if first_uris:
+                expected = len(set(first_uris) & set(second_uris)) / len(first_uris) * 100
+                assert df_overlap.loc[first, second] == pytest.approx(expected)
+    assert df_jaccard.loc["a", "b"] == pytest.approx(2 / 6)
+    assert df_jaccard.loc["a", "c"] == 0
+    assert df_overlap.loc["d"].isna().all()
+
+
+def test_calculate_playlist_overlaps_minhash() -> None:
+    """Test that MinHash approximates the exact overlap of large playlists."""
+    playlists = {
+        "a": [str(i) for i in range(2_000)],
+        "b": [str(i) for i in range(1_000, 3_000)],
+        "c": [str(i) for i in range(10_000, 11_000)],
+    }
+    df_exact, _ = calculate_playlist_overlaps(playlists)
+    df_minhash, df_jaccard = calculate_playlist_overlaps(playlists, method="minhash")
+    assert (df_minhash - df_exact).abs().max().max() < 10  # noqa: PLR2004
+    assert df_jaccard.loc["a", "c"] == 0
+    assert df_jaccard.loc["a", "a"] == 1
+
+
+def test_calculate_playlist_overlap() -> None:
+    """Test that the overlap of two playlists is the percentage of tracks of the first one."""
+    tracks = create_tracks(n_tracks=10, n_artists=2)
+    sp = FakeSpotify(tracks)
+    assert calculate_playlist_overlap(sp, "first", "second") == 100  # noqa: PLR2004
+    assert sp.calls["playlist_tracks"] == 2  # noqa: PLR2004
+
+
+def test_find_duplicate_tracks() -> None:
+    """Test that re-releases, remasters and near-duplicates are clustered, but other parts not."""
+    df_stats = pd.DataFrame(
+        [
+            ("Hotel California", "Eagles", 391_376, "USEE10001"),
+            ("Escapism.", "RAYE, 070 Shake", 272_373, None),
+            ("Hotel California - 2013 Remaster", "Eagles", 391_376, None),
+            ("Escapism. (feat. 070 Shake)", "RAYE", 272_373, None),
+            ("Ça plane pour moi", "Plastic Bertrand", 180_000, None),
+            ("Ca Plane Pour Moi!", "Plastic Bertrand", 181_000, None),
+            ("Dancing Queen", "ABBA", 230_000, None),
+            ("Dancng Queen", "ABBA", 231_000, None),
+            ("The Unforgiven", "Metallica", 386_493, None),
+            ("The Unforgiven II", "Metallica", 386_000, None),
+            ("Movement I", "Colleen", 89_146, None),
+            ("Movement II", "Colleen", 89_146, None),
+            ("Dancing Queen", "Other Artist", 230_000, None),
+            ("Hotel California (Live)", "Eagles", 434_000, "USEE10001"),
+        ],
+        columns=["name", "artist", "duration_ms", "isrc"],
+    )
+    duplicate_of = find_duplicate_tracks(df_stats)
+    assert duplicate_of.tolist() == [0, 1, 0, 1, 4, 4, 6, 6, 8, 9, 10, 11, 12, 0]
+    df_deduplicated = drop_duplicate_tracks(df_stats)
+    assert df_deduplicated.index.tolist() == [0, 1, 4, 6, 8, 9, 10, 11, 12]